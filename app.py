@@ -1,5 +1,6 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+import json
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, g, has_app_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 import sqlite3
 import hashlib
@@ -9,14 +10,59 @@ from functools import wraps
 import webbrowser
 import threading
 import socket
+import time
+import logging
+import re
 
 # Import scheduling algorithms
-from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.strategies import STRATEGIES
+from scheduling.graph_coloring import iter_initial_schedule
+from scheduling.slot_grid import entry_duration, parse_slot_label, slot_label
 from scheduling.backtracking import resolve_conflicts
+from scheduling.incremental import reschedule
+from scheduling.annealing import improve_schedule
+from scheduling.fingerprint import input_fingerprint
+from scheduling.availability import AvailabilityIndex, merged_rows, validate_interval
+from scheduling.stats import SolverStats
+from scheduling.parallel import plain
+from scheduling.whatif import MODES as WHATIF_MODES, InputCache, apply_overrides, diff_timetables, solve_whatif
+from scheduling.occupancy import OccupancyIndex
+from scheduling.semesters import concurrency_key, generate_semester_schedules, parse_concurrent_semesters, semester_of
+from jobs import JobQueue
+from migrations import apply_migrations, check_query_plans
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'timelybuddy_secret_key_2024')
 DB_PATH = os.path.join(os.path.dirname(__file__), 'database', 'timelybuddy.db')
+# Seconds the conflict resolver may spend repairing shortages
+SOLVER_TIME_BUDGET = float(os.environ.get('SOLVER_TIME_BUDGET', 10))
+# Solver results kept in schedule_cache (oldest dropped first)
+SCHEDULE_CACHE_SIZE = 20
+# Seconds the optimiser may spend improving day spread, gaps and room balance
+OPTIMISER_TIME_BUDGET = float(os.environ.get('OPTIMISER_TIME_BUDGET', 5))
+# Semesters that run at the same time and share teachers and rooms, e.g. "Fall,Summer;Spring"
+CONCURRENT_SEMESTERS = parse_concurrent_semesters(os.environ.get('CONCURRENT_SEMESTERS', ''))
+# Seconds a full what-if solve may spend on conflict repair (kept short: it answers a request)
+WHATIF_TIME_BUDGET = float(os.environ.get('WHATIF_TIME_BUDGET', 2))
+# Lectures written (and committed) per batch when a solve is streamed into the timetable
+TIMETABLE_BATCH_SIZE = 200
+# Timetable generations kept for rollback (oldest dropped first; the active one always stays)
+GENERATIONS_KEPT = 20
+# Longest lecture block (consecutive hours in one room) a subject may ask for
+MAX_BLOCK_LENGTH = 6
+# Run on every new connection. WAL lets readers carry on while a timetable or
+# attendance write is in progress; synchronous=NORMAL is safe under WAL (a
+# power cut can lose the last commits, not corrupt the file)
+SQLITE_PRAGMAS = (
+    'PRAGMA busy_timeout=30000',
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',         # KiB, i.e. 16 MB of page cache
+    'PRAGMA mmap_size=134217728',       # 128 MB
+    'PRAGMA temp_store=MEMORY',
+)
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -40,12 +86,67 @@ def load_user(user_id):
         return User(user['id'], user['username'], user['email'], user['role'], user['full_name'])
     return None
 
-def get_db_connection():
+schema_checked = threading.Event()
+schema_lock = threading.Lock()
+
+def migrate_schema(conn):
+    """Bring the database schema up to date, once per process (on its first connection)."""
+    with schema_lock:
+        if schema_checked.is_set():
+            return
+        apply_migrations(conn)
+        for index, plan in check_query_plans(conn):
+            logger.warning('Index %s is not used by the query it was added for: %s', index, plan)
+        schema_checked.set()
+
+def open_db_connection():
     conn = sqlite3.connect(DB_PATH, timeout=30.0)
     conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA busy_timeout=30000;')
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    if not schema_checked.is_set():
+        migrate_schema(conn)
     return conn
 
+class RequestConnection:
+    """
+    The connection shared by everything one request does. Code keeps
+    pairing get_db_connection() with close(): only the outermost close()
+    counts, and like closing a real connection it drops uncommitted work.
+    The connection itself stays open until the request ends.
+    """
+    
+    def __init__(self, conn):
+        self._conn = conn
+        self._depth = 0
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def close(self):
+        self._depth = max(self._depth - 1, 0)
+        if self._depth == 0 and self._conn.in_transaction:
+            self._conn.rollback()
+
+def get_db_connection():
+    """
+    During a request, the request's connection (opened on first use and
+    closed on teardown); outside one, e.g. in the generation worker, a new
+    connection the caller closes.
+    """
+    if not has_app_context():
+        return open_db_connection()
+    if 'db' not in g:
+        g.db = RequestConnection(open_db_connection())
+    g.db._depth += 1
+    return g.db
+
+@app.teardown_appcontext
+def close_db_connection(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db._conn.close()
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
@@ -246,7 +347,8 @@ def admin_panel():
     
     conn.close()
     return render_template('admin.html', teachers=teachers, classes=classes, 
-                         classrooms=classrooms, subjects=subjects, assignments=assignments)
+                         classrooms=classrooms, subjects=subjects, assignments=assignments,
+                         max_block_length=MAX_BLOCK_LENGTH)
 
 @app.route('/add_teacher', methods=['POST'])
 @login_required
@@ -345,14 +447,18 @@ def add_subject():
     semester = request.form['semester']
     teacher_id = request.form.get('teacher_id')
     class_id = request.form.get('class_id')
+    block_length = request.form.get('block_length', type=int, default=1)
+    if not 1 <= block_length <= MAX_BLOCK_LENGTH:
+        flash(f'Hours per lecture must be between 1 and {MAX_BLOCK_LENGTH}.', 'error')
+        return redirect(url_for('admin_panel'))
     
     conn = get_db_connection()
     try:
         c = conn.cursor()
         c.execute('''
-            INSERT INTO subjects (name, code, credits, num_lectures, semester)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, code, credits, num_lectures, semester))
+            INSERT INTO subjects (name, code, credits, num_lectures, semester, block_length)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (name, code, credits, num_lectures, semester, block_length))
         
         subject_id = c.lastrowid
         
@@ -395,9 +501,11 @@ def assign_teacher_subject():
     except Exception:
         conn.rollback()
         flash('Error in assignment.', 'error')
+        return redirect(url_for('admin_panel'))
     finally:
         conn.close()
     
+    flash_timetable_update(update_timetable_incrementally())
     return redirect(url_for('admin_panel'))
 
 @app.route('/delete_teacher/<int:teacher_id>')
@@ -462,8 +570,12 @@ def delete_classroom(classroom_id):
     except Exception as e:
         conn.rollback()
         flash('Error deleting classroom. Please try again.', 'error')
+        return redirect(url_for('admin_panel'))
     finally:
         conn.close()
+    
+    # Lectures that were in this room get a new one
+    flash_timetable_update(update_timetable_incrementally())
     return redirect(url_for('admin_panel'))
 
 @app.route('/delete_subject/<int:subject_id>')
@@ -487,12 +599,8 @@ def delete_subject(subject_id):
         conn.close()
     return redirect(url_for('admin_panel'))
 
-@app.route('/generate_timetable')
-@login_required
-@role_required('admin')
-def generate_timetable():
-    conn = get_db_connection()
-    
+def load_solver_inputs(conn):
+    """(subjects, teachers, classrooms, classes, teacher_availability) as the solvers take them."""
     # Get subjects with their teacher and class assignments
     subjects = conn.execute('''
         SELECT s.*, tsc.teacher_id, tsc.class_id
@@ -508,33 +616,896 @@ def generate_timetable():
         teacher_availability = conn.execute('SELECT * FROM teacher_availability').fetchall()
     except:
         teacher_availability = []
+    return subjects, teachers, classrooms, classes, teacher_availability
+
+def insert_timetable_entries(conn, schedule, table='timetable'):
+    conn.executemany(f'''
+        INSERT INTO {table} (subject_id, teacher_id, classroom_id, class_id, timeslot, duration, semester)
+        VALUES (?, ?, ?, ?, ?, ?, (SELECT semester FROM subjects WHERE id = ?))
+    ''', [(entry['subject_id'], entry['teacher_id'], entry['classroom_id'],
+           entry['class_id'], entry['timeslot'], entry_duration(entry), entry['subject_id']) for entry in schedule])
+
+def load_timetable_rows(conn, table='timetable'):
+    """Stored timetable rows with their semester (rows saved before it was recorded take the subject's)."""
+    return conn.execute(f'''
+        SELECT t.*, COALESCE(t.semester, s.semester) AS semester
+        FROM {table} t
+        LEFT JOIN subjects s ON t.subject_id = s.id
+    ''').fetchall()
+
+def semester_group(row):
+    return concurrency_key(semester_of(row), CONCURRENT_SEMESTERS)
+
+def write_schedule_stream(conn, events, progress=None):
+    """
+    Write a solver event stream (see iter_initial_schedule) into a fresh
+    timetable_staging table, committing every TIMETABLE_BATCH_SIZE
+    lectures, and call progress(placed) after each batch. The live
+    timetable is untouched until the caller publishes the staging table.
+    A room re-match patches a lecture still waiting in the batch, or
+    updates the written row (a teacher has one lecture per slot, so
+    teacher and slot find it). Returns (placed, shortages).
+    """
+    create_timetable_staging(conn)
+    conn.commit()
+    pending = {}
+    placed = 0
+    shortages = []
+    
+    def flush():
+        insert_timetable_entries(conn, list(pending.values()), table='timetable_staging')
+        conn.commit()
+        pending.clear()
+        if progress:
+            progress(placed)
+    
+    for kind, index, item in events:
+        if kind == 'placed':
+            pending[index] = item
+            placed += 1
+            if len(pending) >= TIMETABLE_BATCH_SIZE:
+                flush()
+        elif kind == 'moved':
+            if index in pending:
+                pending[index] = item
+            else:
+                conn.execute('''
+                    UPDATE timetable_staging SET classroom_id = ? WHERE teacher_id = ? AND timeslot = ?
+                ''', (item['classroom_id'], item['teacher_id'], item['timeslot']))
+        else:
+            shortages.append(item)
+    flush()
+    return placed, shortages
+
+def get_setting(conn, key, default=None):
+    row = conn.execute('SELECT value FROM app_settings WHERE key = ?', (key,)).fetchone()
+    return row['value'] if row else default
+
+def set_setting(conn, key, value):
+    conn.execute('''
+        INSERT OR REPLACE INTO app_settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+    ''', (key, value))
+
+def load_cached_schedule(conn, input_hash):
+    """(schedule, shortages) solved earlier for these inputs, or None."""
+    row = conn.execute('SELECT schedule, shortages FROM schedule_cache WHERE input_hash = ?', (input_hash,)).fetchone()
+    if row is None:
+        return None
+    return json.loads(row['schedule']), json.loads(row['shortages'] or '[]')
+
+def store_cached_schedule(conn, input_hash, strategy, schedule, shortages):
+    conn.execute('''
+        INSERT OR REPLACE INTO schedule_cache (input_hash, strategy, schedule, shortages)
+        VALUES (?, ?, ?, ?)
+    ''', (input_hash, strategy, json.dumps(schedule), json.dumps(shortages)))
+    conn.execute('''
+        DELETE FROM schedule_cache WHERE input_hash NOT IN (
+            SELECT input_hash FROM schedule_cache ORDER BY created_at DESC, rowid DESC LIMIT ?
+        )
+    ''', (SCHEDULE_CACHE_SIZE,))
+
+def create_timetable_staging(conn):
+    """A fresh, empty timetable_staging: same columns and constraints as timetable, ids continuing after its ids."""
+    conn.execute('DROP TABLE IF EXISTS timetable_staging')
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'timetable'").fetchone()[0]
+    conn.execute(re.sub(r'^CREATE TABLE\s+"?timetable"?', 'CREATE TABLE timetable_staging', sql, count=1))
+    conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'timetable_staging', seq FROM sqlite_sequence WHERE name = 'timetable'
+    ''')
+
+def stage_timetable(conn, schedule):
+    """
+    Bulk-insert schedule into a fresh timetable_staging table and commit.
+    The live table is not touched, so nobody waits on the insert.
+    """
+    create_timetable_staging(conn)
+    insert_timetable_entries(conn, schedule, table='timetable_staging')
+    conn.commit()
+
+def publish_staged_timetable(conn, input_hash=None, active_generation=None, loaded_version=None):
+    """
+    Swap timetable_staging in as the timetable in one short transaction:
+    the old table is dropped, the staging one renamed into its place, and
+    the old table's indexes and triggers recreated on it under their own
+    names. Readers see the old timetable or the new one, never part of one.
+    With active_generation, the generation pointer moves in the same
+    transaction.
+
+    loaded_version is the inputs_version a generation job solved from. If
+    inputs were edited since, the staged rows those edits invalidated are
+    re-placed first (as refit_timetable does for an edit) and input_hash
+    is dropped; the summary of that is returned, otherwise None.
+    """
+    update = None
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if loaded_version is not None and get_setting(conn, 'inputs_version') != loaded_version:
+            update = timetable_update(*refit_timetable(conn, 'timetable_staging'))
+            input_hash = None
+        extras = conn.execute('''
+            SELECT sql FROM sqlite_master WHERE tbl_name = 'timetable' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        ''').fetchall()
+        # Rows added to the live table meanwhile must not have their ids reused
+        conn.execute('''
+            UPDATE sqlite_sequence
+            SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'timetable'), 0))
+            WHERE name = 'timetable_staging'
+        ''')
+        conn.execute('DROP TABLE timetable')
+        conn.execute('ALTER TABLE timetable_staging RENAME TO timetable')
+        for row in extras:
+            conn.execute(row['sql'])
+        # The staged rows were inserted without the inputs_version triggers
+        conn.execute("UPDATE app_settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'inputs_version'")
+        set_setting(conn, 'timetable_input_hash', input_hash)
+        if active_generation is not None:
+            set_setting(conn, 'active_generation', active_generation)
+        if loaded_version is not None:
+            set_setting(conn, 'generation_inputs_version', None)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return update
+
+def save_timetable(conn, schedule, input_hash=None, loaded_version=None):
+    """
+    Replace the timetable: stage the new rows, then swap them in at once.
+    input_hash records which inputs it was solved from; None marks it as
+    edited by hand/incrementally. See publish_staged_timetable for
+    loaded_version and the return value.
+    """
+    stage_timetable(conn, schedule)
+    return publish_staged_timetable(conn, input_hash, loaded_version=loaded_version)
+
+GENERATION_COLUMNS = 'subject_id, teacher_id, classroom_id, class_id, timeslot, semester, duration'
+
+def record_generation(job, result):
+    """
+    Snapshot the timetable a finished job published as a new generation
+    (with the job's strategy and solver stats) and point active_generation
+    at it. Only the newest GENERATIONS_KEPT are kept, plus the active one.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        generation_id = conn.execute('''
+            INSERT INTO generations (job_id, strategy, params, input_hash, placed, missing, stats)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (job.id, result.get('strategy'), json.dumps(job.params), get_setting(conn, 'timetable_input_hash'),
+              result.get('placed'), result.get('missing'), json.dumps(result.get('stats')))).lastrowid
+        conn.execute(f'''
+            INSERT INTO generation_entries (generation_id, {GENERATION_COLUMNS})
+            SELECT ?, {GENERATION_COLUMNS} FROM timetable ORDER BY id
+        ''', (generation_id,))
+        set_setting(conn, 'active_generation', generation_id)
+        conn.execute('''
+            DELETE FROM generations WHERE id != ? AND id NOT IN (
+                SELECT id FROM generations ORDER BY id DESC LIMIT ?
+            )
+        ''', (generation_id, GENERATIONS_KEPT))
+        conn.execute('DELETE FROM generation_entries WHERE generation_id NOT IN (SELECT id FROM generations)')
+        conn.commit()
+    finally:
+        conn.close()
+    return generation_id
+
+def activate_generation(conn, generation):
+    """
+    Make an earlier generation the live timetable: its snapshot is copied
+    into the staging table in one statement, then swapped in together
+    with the pointer update. Hand edits made since are discarded.
+    """
+    create_timetable_staging(conn)
+    conn.execute(f'''
+        INSERT INTO timetable_staging ({GENERATION_COLUMNS})
+        SELECT {GENERATION_COLUMNS} FROM generation_entries WHERE generation_id = ? ORDER BY rowid
+    ''', (generation['id'],))
+    conn.commit()
+    publish_staged_timetable(conn, generation['input_hash'], active_generation=generation['id'])
+
+def mark_generation_inputs(conn):
+    """
+    Record the inputs_version a generation job is about to load its inputs
+    at, and return it. Until the job publishes, edits leave their
+    incremental update to it (see update_timetable_incrementally).
+    """
+    version = get_setting(conn, 'inputs_version')
+    set_setting(conn, 'generation_inputs_version', version)
+    conn.commit()
+    return version
+
+def refit_timetable(conn, table='timetable'):
+    """
+    Re-place only the rows of `table` the current inputs invalidated; every
+    other row stays as it is. Returns (dropped, added, shortages) and leaves
+    committing to the caller.
+    """
+    current = load_timetable_rows(conn, table)
+    if not current:
+        return [], [], []
+    dropped, added, shortages = reschedule(current, *load_solver_inputs(conn), group_of=semester_group)
+    conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(entry['id'],) for entry in dropped])
+    insert_timetable_entries(conn, added, table=table)
+    return dropped, added, shortages
+
+def timetable_update(dropped, added, shortages):
+    return {
+        'placed': len(added),
+        'invalidated': len(dropped),
+        'missing': sum(s['needed'] - s['assigned'] for s in shortages),
+        'shortages': [s['subject'] for s in shortages]
+    }
+
+def update_timetable_incrementally():
+    """
+    After an edit, re-place only the lectures it invalidated; every other
+    timetable row stays as it is. Skipped (returns None) when there is no
+    timetable yet, or while a generation job that loaded its inputs before
+    this edit has not published: it refits its own result to the edit when
+    it does. Otherwise returns a summary of what changed.
+    """
+    conn = get_db_connection()
+    try:
+        if generation_jobs.active() and get_setting(conn, 'generation_inputs_version') is not None:
+            return None
+        if not conn.execute('SELECT 1 FROM timetable LIMIT 1').fetchone():
+            return None
+        dropped, added, shortages = refit_timetable(conn)
+        if dropped or added:
+            # No longer the solver's answer for any input; the next Generate re-solves
+            set_setting(conn, 'timetable_input_hash', None)
+            conn.commit()
+    finally:
+        conn.close()
+    
+    if dropped or added:
+        create_notification_for_all('Timetable Updated', 'Some lectures in the timetable have been rescheduled.')
+    return timetable_update(dropped, added, shortages)
+
+def flash_timetable_update(update):
+    if not update:
+        return
+    if update['placed'] or update['invalidated']:
+        flash(f"Timetable updated: {update['placed']} lecture(s) placed, {update['invalidated']} invalidated.", 'success')
+    if update['missing']:
+        flash(f"{update['missing']} lecture(s) could not be placed: " + ', '.join(update['shortages']), 'warning')
+
+def run_semester_generation(job):
+    """
+    Regenerate only the requested semesters with the job's strategy: other
+    semesters' rows are neither rewritten nor locked while solving, and the
+    ones that run concurrently are reserved so no teacher or room is
+    double-booked.
+    """
+    semesters = job.params['semesters']
+    strategy = job.params.get('strategy', 'greedy')
+    stats = SolverStats()
+    
+    job.progress('loading', 5)
+    with stats.phase('load'):
+        conn = get_db_connection()
+        try:
+            loaded_version = mark_generation_inputs(conn)
+            subjects, teachers, classrooms, classes, teacher_availability = load_solver_inputs(conn)
+            stored = load_timetable_rows(conn)
+        finally:
+            conn.close()
+    
+    subjects = [s for s in subjects if semester_of(s) in semesters]
+    replaced = [row['id'] for row in stored if semester_of(row) in semesters]
+    reserved = [row for row in stored if semester_of(row) not in semesters]
+    
+    job.progress('solving', 10)
+    final_schedule, shortages = generate_semester_schedules(
+        subjects, teachers, classrooms, classes, teacher_availability, semesters,
+        reserved=reserved, concurrent=CONCURRENT_SEMESTERS,
+        repair_budget=SOLVER_TIME_BUDGET, optimiser_budget=OPTIMISER_TIME_BUDGET, stats=stats,
+        progress=job.reporter('solving', 10, 90), solver=STRATEGIES[strategy]
+    )
+    
+    job.progress('saving', 90)
+    with stats.phase('persistence'):
+        conn = get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            edited = get_setting(conn, 'inputs_version') != loaded_version
+            conn.executemany('DELETE FROM timetable WHERE id = ?', [(row_id,) for row_id in replaced])
+            insert_timetable_entries(conn, final_schedule)
+            # Inputs edited while solving: re-place what the edits invalidated
+            update = timetable_update(*refit_timetable(conn)) if edited else None
+            set_setting(conn, 'generation_inputs_version', None)
+            # Part of the timetable changed; it no longer matches any full-input fingerprint
+            set_setting(conn, 'timetable_input_hash', None)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    create_notification_for_all('Timetable Updated', f"The {', '.join(semesters)} timetable has been regenerated.")
+    
+    return {
+        'strategy': strategy,
+        'semesters': semesters,
+        'cached': False,
+        'placed': len(final_schedule),
+        'missing': sum(s['needed'] - s['assigned'] for s in shortages),
+        'shortages': [s['subject'] for s in shortages],
+        'timetable_update': update,
+        'stats': stats.as_dict()
+    }
+
+def run_streamed_generation(job):
+    """
+    ?stream=1: greedy placements are written in committed batches as they
+    are made, so progress reports placed out of needed while the solve
+    runs. They go into the staging table and are published in one swap at
+    the end; a cancel or crash leaves the live timetable as it was. There
+    is no repair or optimiser pass.
+    """
+    stats = SolverStats()
+    
+    job.progress('loading', 5)
+    with stats.phase('load'):
+        conn = get_db_connection()
+        try:
+            loaded_version = mark_generation_inputs(conn)
+            subjects, teachers, classrooms, classes, teacher_availability = load_solver_inputs(conn)
+        finally:
+            conn.close()
+    needed = sum(int(s['num_lectures']) for s in subjects)
+    
+    def report(placed):
+        job.progress('streaming', 10 + 85 * placed // max(needed, 1), f'{placed} of {needed} lectures placed')
+    
+    report(0)
+    conn = get_db_connection()
+    try:
+        with stats.phase('stream'):
+            placed, shortages = write_schedule_stream(
+                conn,
+                iter_initial_schedule(subjects, teachers, classrooms, classes, teacher_availability, stats=stats),
+                report
+            )
+        # Last point where a cancel is honoured; the swap below is all or nothing
+        job.progress('saving', 95)
+        with stats.phase('persistence'):
+            update = publish_staged_timetable(conn, loaded_version=loaded_version)
+    finally:
+        conn.close()
+    
+    create_notification_for_all('Timetable Updated', 'New timetable has been generated and is now available.')
+    
+    return {
+        'strategy': 'greedy',
+        'streamed': True,
+        'cached': False,
+        'placed': placed,
+        'missing': sum(s['needed'] - s['assigned'] for s in shortages),
+        'shortages': [s['subject'] for s in shortages],
+        'timetable_update': update,
+        'stats': stats.as_dict()
+    }
+
+def run_generation_job(job):
+    """
+    Background half of /generate_timetable: solve, repair, optimise, save,
+    notify. Semesters that CONCURRENT_SEMESTERS puts in different groups
+    never run at the same time and are solved separately (see
+    generate_semester_schedules), so they may reuse the same teachers,
+    rooms and hours; by default every semester is solved together.
+    """
+    if job.params.get('semesters'):
+        return run_semester_generation(job)
+    if job.params.get('stream'):
+        return run_streamed_generation(job)
+    strategy = job.params.get('strategy', 'greedy')
+    stats = SolverStats()
+    
+    job.progress('loading', 5)
+    with stats.phase('load'):
+        conn = get_db_connection()
+        try:
+            loaded_version = mark_generation_inputs(conn)
+            subjects, teachers, classrooms, classes, teacher_availability = load_solver_inputs(conn)
+            input_hash = input_fingerprint(subjects, teachers, classrooms, classes, teacher_availability, strategy,
+                                           CONCURRENT_SEMESTERS)
+            cached = None if job.params.get('force') else load_cached_schedule(conn, input_hash)
+        finally:
+            conn.close()
+    
+    semesters = sorted(set(semester_of(s) for s in subjects))
+    if cached is not None:
+        final_schedule, shortages = cached
+    elif len(set(concurrency_key(s, CONCURRENT_SEMESTERS) for s in semesters)) > 1:
+        job.progress('solving', 10)
+        final_schedule, shortages = generate_semester_schedules(
+            subjects, teachers, classrooms, classes, teacher_availability, semesters,
+            concurrent=CONCURRENT_SEMESTERS,
+            repair_budget=SOLVER_TIME_BUDGET, optimiser_budget=OPTIMISER_TIME_BUDGET, stats=stats,
+            progress=job.reporter('solving', 10, 90), solver=STRATEGIES[strategy]
+        )
+    else:
+        job.progress('solving', 10)
+        with stats.phase('solve'):
+            initial_schedule, shortages = STRATEGIES[strategy](
+                subjects, teachers, classrooms, classes, teacher_availability, stats=stats,
+                progress=job.reporter('solving', 10, 50)
+            )
+        job.progress('repairing', 50)
+        with stats.phase('conflict_resolution'):
+            final_schedule, shortages = resolve_conflicts(
+                initial_schedule, subjects, teachers, classrooms, classes,
+                teacher_availability=teacher_availability, shortages=shortages,
+                time_budget=SOLVER_TIME_BUDGET, progress=job.reporter('repairing', 50, 70)
+            )
+        job.progress('optimising', 70)
+        with stats.phase('optimise'):
+            final_schedule = improve_schedule(
+                final_schedule, subjects, teachers, classrooms, teacher_availability,
+                time_budget=OPTIMISER_TIME_BUDGET, progress=job.reporter('optimising', 70, 90)
+            )
+    
+    # Last point where a cancel is honoured; the save below is all or nothing
+    job.progress('saving', 90)
+    with stats.phase('persistence'):
+        conn = get_db_connection()
+        try:
+            if cached is None:
+                store_cached_schedule(conn, input_hash, strategy, final_schedule, shortages)
+            update = save_timetable(conn, final_schedule, input_hash, loaded_version)
+        finally:
+            conn.close()
     
-    if not subjects:
+    create_notification_for_all('Timetable Updated', 'New timetable has been generated and is now available.')
+    
+    return {
+        'strategy': strategy,
+        'cached': cached is not None,
+        'placed': len(final_schedule),
+        'missing': sum(s['needed'] - s['assigned'] for s in shortages),
+        'shortages': [s['subject'] for s in shortages],
+        'timetable_update': update,
+        'stats': stats.as_dict()
+    }
+
+def apply_deferred_edits():
+    """
+    A job that stops (cancelled or failed) before publishing never refits
+    to the edits made while it ran; apply them to the live timetable now.
+    """
+    conn = get_db_connection()
+    try:
+        loaded_version = get_setting(conn, 'generation_inputs_version')
+        if loaded_version is None:
+            return
+        set_setting(conn, 'generation_inputs_version', None)
+        conn.commit()
+        edited = get_setting(conn, 'inputs_version') != loaded_version
+    finally:
+        conn.close()
+    if edited:
+        update_timetable_incrementally()
+
+def run_and_record(job):
+    try:
+        result = run_generation_job(job)
+    except Exception:
+        apply_deferred_edits()
+        raise
+    result['generation_id'] = record_generation(job, result)
+    # Rebuild the lookup index now instead of on the first lookup after it
+    current_occupancy()
+    return result
+
+generation_jobs = JobQueue(get_db_connection, run_and_record)
+
+@app.route('/generate_timetable')
+@login_required
+@role_required('admin')
+def generate_timetable():
+    strategy = request.args.get('strategy', 'greedy')
+    if strategy not in STRATEGIES:
+        flash(f'Unknown scheduling strategy: {strategy}', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    force = request.args.get('force') == '1'
+    # ?stream=1 writes greedy placements as they are made (no repair or optimiser pass)
+    stream = request.args.get('stream') == '1'
+    # ?semesters=Fall,Spring regenerates only those semesters
+    semesters = sorted(set(s.strip() for s in request.args.get('semesters', '').split(',') if s.strip()))
+    
+    conn = get_db_connection()
+    inputs = load_solver_inputs(conn)
+    current_hash = get_setting(conn, 'timetable_input_hash')
+    conn.close()
+    
+    if not inputs[0]:
         flash('No subjects with teacher assignments found. Please assign teachers to subjects first.', 'warning')
         return redirect(url_for('admin_panel'))
     
-    initial_schedule, shortages = generate_initial_schedule(
-        subjects, teachers, classrooms, classes, teacher_availability
-    )
-    final_schedule = resolve_conflicts(
-        initial_schedule, subjects, teachers, classrooms, classes
-    )
+    if stream:
+        if strategy != 'greedy' or semesters:
+            flash('Streamed generation only supports the greedy strategy over all semesters.', 'error')
+            return redirect(url_for('admin_panel'))
+        job_id, created = generation_jobs.enqueue({'strategy': strategy, 'stream': True}, current_user.id)
+        if not created:
+            flash('A timetable generation is already in progress.', 'warning')
+        return redirect(url_for('view_timetable', job=job_id))
+    
+    if semesters:
+        if not any(semester_of(s) in semesters for s in inputs[0]):
+            flash('No assigned subjects found for semester(s): ' + ', '.join(semesters), 'warning')
+            return redirect(url_for('admin_panel'))
+        job_id, created = generation_jobs.enqueue({'strategy': strategy, 'semesters': semesters}, current_user.id)
+        if not created:
+            flash('A timetable generation is already in progress.', 'warning')
+        return redirect(url_for('view_timetable', job=job_id))
+    
+    # Nothing changed since the stored timetable was generated: no solve, no rewrite, no notifications
+    if not force and current_hash and current_hash == input_fingerprint(*inputs, strategy, CONCURRENT_SEMESTERS):
+        flash('Nothing has changed since the last generation; the timetable is already up to date.', 'success')
+        return redirect(url_for('view_timetable'))
+    
+    job_id, created = generation_jobs.enqueue({'strategy': strategy, 'force': force}, current_user.id)
+    if not created:
+        flash('A timetable generation is already in progress.', 'warning')
+    return redirect(url_for('view_timetable', job=job_id))
+
+@app.route('/generation_jobs/<int:job_id>')
+@login_required
+@role_required('admin')
+def generation_job_status(job_id):
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/generation_jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+@role_required('admin')
+def cancel_generation_job(job_id):
+    job = generation_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/generation_stats')
+@login_required
+@role_required('admin')
+def generation_stats():
+    """Counters and phase timings of the last successful generation."""
+    job = generation_jobs.last_done()
+    if job is None or not job['result'] or 'stats' not in job['result']:
+        return jsonify({'success': False, 'message': 'No generation run recorded yet'}), 404
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'finished_at': job['finished_at'],
+        'params': job['params'],
+        'stats': job['result']['stats']
+    })
+
+def generation_summary(row, active_id):
+    return {
+        'id': row['id'],
+        'created_at': row['created_at'],
+        'job_id': row['job_id'],
+        'strategy': row['strategy'],
+        'params': json.loads(row['params'] or '{}'),
+        'placed': row['placed'],
+        'missing': row['missing'],
+        'stats': json.loads(row['stats'] or 'null'),
+        'active': row['id'] == active_id,
+    }
+
+def active_generation_id(conn):
+    value = get_setting(conn, 'active_generation')
+    return int(value) if value else None
+
+@app.route('/generations')
+@login_required
+@role_required('admin')
+def list_generations():
+    """Kept timetable generations, newest first, with their solver stats."""
+    conn = get_db_connection()
+    try:
+        active_id = active_generation_id(conn)
+        generations = conn.execute('SELECT * FROM generations ORDER BY id DESC').fetchall()
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'active': active_id,
+                    'generations': [generation_summary(row, active_id) for row in generations]})
+
+@app.route('/generations/<int:generation_id>/activate', methods=['POST'])
+@login_required
+@role_required('admin')
+def activate_generation_route(generation_id):
+    """Roll the live timetable back (or forward) to a kept generation."""
+    if generation_jobs.active():
+        return jsonify({'success': False, 'message': 'A timetable generation is in progress.'}), 400
+    start = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        generation = conn.execute('SELECT * FROM generations WHERE id = ?', (generation_id,)).fetchone()
+        if generation is None:
+            return jsonify({'success': False, 'message': 'Generation not found'}), 404
+        activate_generation(conn, generation)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
     
-    conn.execute('DELETE FROM timetable')
-    for entry in final_schedule:
-        conn.execute('''
-            INSERT INTO timetable (subject_id, teacher_id, classroom_id, class_id, timeslot)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (entry['subject_id'], entry['teacher_id'],
-              entry['classroom_id'], entry['class_id'], entry['timeslot']))
+    create_notification_for_all('Timetable Updated', 'The timetable has been switched to an earlier version.')
+    return jsonify({'success': True, 'active': generation_id, 'elapsed_ms': round(elapsed * 1000, 1)})
+
+@app.route('/generations/diff')
+@login_required
+@role_required('admin')
+def diff_generations():
+    """Lecture-level diff between ?from=<id> and ?to=<id> (to defaults to the active generation)."""
+    conn = get_db_connection()
+    try:
+        old_id = request.args.get('from', type=int)
+        new_id = request.args.get('to', type=int) or active_generation_id(conn)
+        found = set(row['id'] for row in conn.execute(
+            'SELECT id FROM generations WHERE id IN (?, ?)', (old_id, new_id)
+        ))
+        if old_id not in found or new_id not in found:
+            return jsonify({'success': False, 'message': 'Generation not found'}), 404
+        old, new = (
+            conn.execute('SELECT * FROM generation_entries WHERE generation_id = ?', (generation_id,)).fetchall()
+            for generation_id in (old_id, new_id)
+        )
+    finally:
+        conn.close()
     
-    conn.commit()
+    diff = diff_timetables(old, new)
+    return jsonify({
+        'success': True,
+        'from': old_id,
+        'to': new_id,
+        'summary': {
+            'unchanged': diff['unchanged'],
+            'moved': len(diff['moved']),
+            'added': len(diff['added']),
+            'removed': len(diff['removed'])
+        },
+        'moved': diff['moved'],
+        'added': diff['added'],
+        'removed': diff['removed']
+    })
+
+whatif_inputs = InputCache()
+
+def load_whatif_inputs():
+    conn = get_db_connection()
+    try:
+        return tuple(plain(rows) for rows in load_solver_inputs(conn)) + (plain(load_timetable_rows(conn)),)
+    finally:
+        conn.close()
+
+@app.route('/whatif', methods=['POST'])
+@login_required
+@role_required('admin')
+def whatif():
+    """
+    Solve against hypothetical edits (see apply_overrides for the JSON
+    keys, plus "mode": incremental|full) and return the diff with the
+    live timetable. Nothing is written.
+    """
+    overrides = request.get_json(silent=True)
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        return jsonify({'success': False, 'message': 'Body must be a JSON object'}), 400
+    mode = overrides.get('mode', 'incremental')
+    if mode not in WHATIF_MODES:
+        return jsonify({'success': False, 'message': f'Unknown mode: {mode}'}), 400
+    
+    conn = get_db_connection()
+    version = get_setting(conn, 'inputs_version')
     conn.close()
     
-    create_notification_for_all('Timetable Updated', 'New timetable has been generated and is now available.')
+    start = time.perf_counter()
+    inputs, reused = whatif_inputs.get(version, load_whatif_inputs)
+    live = inputs[-1]
+    try:
+        solver_inputs = apply_overrides(*inputs[:-1], overrides)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    proposed, shortages = solve_whatif(*solver_inputs, live, mode=mode, group_of=semester_group,
+                                       time_budget=WHATIF_TIME_BUDGET, concurrent=CONCURRENT_SEMESTERS)
+    diff = diff_timetables(live, proposed)
+    
+    return jsonify({
+        'success': True,
+        'mode': mode,
+        'reused_inputs': reused,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        'summary': {
+            'unchanged': diff['unchanged'],
+            'moved': len(diff['moved']),
+            'added': len(diff['added']),
+            'removed': len(diff['removed']),
+            'unplaced': sum(s['needed'] - s['assigned'] for s in shortages)
+        },
+        'moved': diff['moved'],
+        'added': diff['added'],
+        'removed': diff['removed'],
+        'unplaced': shortages
+    })
+
+occupancy_index = InputCache()
+
+def load_occupancy_index():
+    conn = get_db_connection()
+    try:
+        return OccupancyIndex(
+            load_timetable_rows(conn),
+            conn.execute('SELECT id, name, building, floor, capacity FROM classrooms WHERE is_available = 1').fetchall(),
+            conn.execute('''
+                SELECT te.id, u.full_name AS name, te.department
+                FROM teachers te
+                JOIN users u ON te.user_id = u.id
+            ''').fetchall(),
+            conn.execute('SELECT * FROM teacher_availability').fetchall(),
+            conn.execute('SELECT DISTINCT subject_id, teacher_id FROM teacher_subject_class').fetchall(),
+            group_of=semester_group,
+            subjects=conn.execute('SELECT * FROM subjects').fetchall()
+        )
+    finally:
+        conn.close()
+
+def current_occupancy():
+    """The occupancy index, rebuilt only when the inputs version moved on since it was built."""
+    conn = get_db_connection()
+    version = get_setting(conn, 'inputs_version')
+    conn.close()
+    return occupancy_index.get(version, load_occupancy_index)[0]
+
+def occupancy_lookup(find, **kwargs):
+    """
+    Shared half of the lookup endpoints: ?slot=Wed 2PM (required),
+    ?hours=N (default 1) and ?semester=Fall (only that semester's
+    concurrency group counts as busy; default all of them).
+    """
+    slot = parse_slot_label(request.args.get('slot', ''))
+    hours = request.args.get('hours', 1, type=int)
+    semester = request.args.get('semester')
+    group = concurrency_key(semester, CONCURRENT_SEMESTERS) if semester else None
+    
+    index = current_occupancy()
+    start = time.perf_counter()
+    try:
+        found = find(index, slot, hours, group=group, **kwargs)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'slot': request.args.get('slot'),
+        'hours': hours,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        'results': found
+    })
+
+@app.route('/free_rooms')
+@login_required
+@role_required('admin')
+def free_rooms():
+    """Available rooms free at ?slot= for ?hours=, smallest first; ?min_capacity=N filters by seats."""
+    return occupancy_lookup(OccupancyIndex.free_rooms, min_capacity=request.args.get('min_capacity', 0, type=int))
+
+@app.route('/free_teachers')
+@login_required
+@role_required('admin')
+def free_teachers():
+    """Teachers available and not teaching at ?slot= for ?hours=; ?subject_id= keeps those assigned to it."""
+    return occupancy_lookup(OccupancyIndex.free_teachers, subject_id=request.args.get('subject_id', type=int))
+
+def move_lectures(moves):
+    """
+    Move timetable rows to new (slot, classroom) positions in one
+    transaction, given as [(row id, slot, classroom id)]. The write lock is
+    taken first, so the occupancy check sees every committed edit. Once
+    the commit succeeded the index is patched in place instead of being
+    rebuilt; if it failed, the index still matches the database. Returns
+    the list of problems (nothing is written if there are any).
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        version = get_setting(conn, 'inputs_version')
+        index = occupancy_index.get(version, load_occupancy_index)[0]
+        gone = [row_id for row_id, _, _ in moves if row_id not in index.rows]
+        problems = [f'Lecture {row_id} no longer exists' for row_id in gone] or index.check_moves(moves)
+        if problems:
+            conn.rollback()
+            return problems
+        conn.executemany('UPDATE timetable SET timeslot = ?, classroom_id = ? WHERE id = ?',
+                         [(slot_label(slot), room_id, row_id) for row_id, slot, room_id in moves])
+        # Edited by hand; the next Generate re-solves
+        set_setting(conn, 'timetable_input_hash', None)
+        new_version = get_setting(conn, 'inputs_version')
+        conn.commit()
+    finally:
+        conn.close()
+    occupancy_index.patch(version, new_version, lambda index: index.apply_moves(moves))
     
-    flash('Timetable generated successfully!', 'success')
-    return redirect(url_for('view_timetable'))
+    create_notification_for_all('Timetable Updated', 'A lecture in the timetable has been moved.')
+    return []
+
+def lecture_moves_response(moves):
+    if generation_jobs.active():
+        return jsonify({'success': False, 'message': 'A timetable generation is in progress.'}), 400
+    problems = move_lectures(moves)
+    if problems:
+        return jsonify({'success': False, 'message': 'The move would break the timetable', 'conflicts': problems}), 400
+    return jsonify({'success': True, 'moved': [
+        {'id': row_id, 'timeslot': slot_label(slot), 'classroom_id': room_id} for row_id, slot, room_id in moves
+    ]})
+
+@app.route('/timetable/<int:entry_id>/move', methods=['POST'])
+@login_required
+@role_required('admin')
+def move_lecture(entry_id):
+    """
+    Move one lecture: JSON {"timeslot": "Wed 2PM", "classroom_id": 3}
+    (classroom_id optional, the current room is kept).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Body must be a JSON object'}), 400
+    entry = current_occupancy().rows.get(entry_id)
+    if entry is None:
+        return jsonify({'success': False, 'message': 'Lecture not found'}), 404
+    slot = parse_slot_label(data.get('timeslot'))
+    if slot is None:
+        return jsonify({'success': False, 'message': 'timeslot must be a slot label such as "Wed 2PM"'}), 400
+    try:
+        room_id = int(data.get('classroom_id', entry['classroom_id']))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'classroom_id must be an id'}), 400
+    return lecture_moves_response([(entry_id, slot, room_id)])
+
+@app.route('/timetable/swap', methods=['POST'])
+@login_required
+@role_required('admin')
+def swap_lectures():
+    """Swap the slots and rooms of two lectures: JSON {"a": id, "b": id}."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Body must be a JSON object'}), 400
+    rows = current_occupancy().rows
+    try:
+        a, b = rows[int(data.get('a'))], rows[int(data.get('b'))]
+    except (TypeError, ValueError, KeyError):
+        return jsonify({'success': False, 'message': 'Lecture not found'}), 404
+    if a['id'] == b['id']:
+        return jsonify({'success': False, 'message': 'Pick two different lectures'}), 400
+    return lecture_moves_response([(a['id'], b['slot'], b['classroom_id']), (b['id'], a['slot'], a['classroom_id'])])
 
 @app.route('/timetable')
 @login_required
@@ -592,7 +1563,12 @@ def view_timetable():
             timetable = []
     
     conn.close()
-    return render_template('timetable.html', timetable=timetable)
+    
+    job = None
+    if current_user.role == 'admin':
+        job_id = request.args.get('job', type=int)
+        job = generation_jobs.get(job_id) if job_id else generation_jobs.active()
+    return render_template('timetable.html', timetable=timetable, job=job)
 
 @app.route('/export/excel')
 @login_required
@@ -602,7 +1578,7 @@ def export_excel():
     conn = get_db_connection()
     rows = conn.execute('''
         SELECT c.name as class, s.name as subject, s.code, 
-               u.full_name as teacher, cr.name as classroom, t.timeslot
+               u.full_name as teacher, cr.name as classroom, t.timeslot, t.duration
         FROM timetable t
         JOIN subjects s ON t.subject_id = s.id
         JOIN teachers te ON t.teacher_id = te.id
@@ -623,7 +1599,7 @@ def export_excel():
     worksheet = workbook.add_worksheet('Timetable')
     
     # Add headers
-    headers = ['Class', 'Subject', 'Code', 'Teacher', 'Classroom', 'Timeslot']
+    headers = ['Class', 'Subject', 'Code', 'Teacher', 'Classroom', 'Timeslot', 'Hours']
     for col, header in enumerate(headers):
         worksheet.write(0, col, header)
     
@@ -635,6 +1611,7 @@ def export_excel():
         worksheet.write(row_num, 3, row['teacher'])
         worksheet.write(row_num, 4, row['classroom'])
         worksheet.write(row_num, 5, row['timeslot'])
+        worksheet.write(row_num, 6, row['duration'] or 1)
     
     workbook.close()
     conn.close()
@@ -646,7 +1623,7 @@ def export_pdf():
     conn = get_db_connection()
     rows = conn.execute('''
         SELECT c.name as class, s.name as subject, s.code, 
-               u.full_name as teacher, cr.name as classroom, t.timeslot
+               u.full_name as teacher, cr.name as classroom, t.timeslot, t.duration
         FROM timetable t
         JOIN subjects s ON t.subject_id = s.id
         JOIN teachers te ON t.teacher_id = te.id
@@ -671,7 +1648,8 @@ def export_pdf():
             pdf.set_font('Arial', 'B', 12)
             pdf.cell(0, 8, f"Class: {current_class}", ln=True)
             pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 6, f"{row['timeslot']} - {row['subject']} ({row['code']}) - {row['teacher']} in {row['classroom']}", ln=True)
+        hours = f" ({row['duration']}h)" if (row['duration'] or 1) > 1 else ''
+        pdf.cell(0, 6, f"{row['timeslot']}{hours} - {row['subject']} ({row['code']}) - {row['teacher']} in {row['classroom']}", ln=True)
     
     exports_dir = os.path.join(os.path.dirname(__file__), 'exports')
     if not os.path.exists(exports_dir):
@@ -682,26 +1660,30 @@ def export_pdf():
     conn.close()
     return send_file(file_path, as_attachment=True)
 
-def create_notification_for_all(title, message):
-    conn = get_db_connection()
-    
-    # Check if notification already exists in last 5 minutes
+def publish_notification(conn, title, message, target_role='all'):
+    """
+    One broadcast row seen by every user with target_role ('all', 'teacher'
+    or 'student'), however many users there are. Returns False when the
+    same notice already went out in the last 5 minutes. Does not commit.
+    """
     existing = conn.execute('''
-        SELECT id FROM notifications 
-        WHERE title = ? AND message = ? 
-        AND datetime(created_at) > datetime('now', '-5 minutes')
+        SELECT id FROM notifications
+        WHERE title = ? AND message = ? AND target_role = ? AND user_id IS NULL
+        AND created_at > datetime('now', '-5 minutes')
         LIMIT 1
-    ''', (title, message)).fetchone()
-    
-    if not existing:
-        users = conn.execute('SELECT id FROM users WHERE is_active = 1').fetchall()
-        for user in users:
-            conn.execute('''
-                INSERT OR IGNORE INTO notifications (user_id, title, message, target_role)
-                VALUES (?, ?, ?, ?)
-            ''', (user['id'], title, message, 'all'))
+    ''', (title, message, target_role)).fetchone()
+    if existing:
+        return False
+    conn.execute('''
+        INSERT INTO notifications (title, message, target_role)
+        VALUES (?, ?, ?)
+    ''', (title, message, target_role))
+    return True
+
+def create_notification_for_all(title, message):
+    conn = get_db_connection()
+    if publish_notification(conn, title, message):
         conn.commit()
-    
     conn.close()
 
 @app.route('/notifications')
@@ -709,36 +1691,120 @@ def create_notification_for_all(title, message):
 def notifications():
     conn = get_db_connection()
     try:
+        # Direct messages plus broadcasts to the user's role; a receipt row means read
         notifications = conn.execute('''
-            SELECT * FROM notifications 
-            WHERE user_id = ? OR target_role IN ('all', ?) 
-            ORDER BY created_at DESC
-        ''', (current_user.id, current_user.role)).fetchall()
+            SELECT n.id, n.title, n.message, n.type, n.target_role, n.created_at,
+                   r.notification_id IS NOT NULL AS is_read
+            FROM notifications n
+            LEFT JOIN notification_reads r ON r.notification_id = n.id AND r.user_id = ?
+            WHERE n.user_id = ? OR (n.user_id IS NULL AND n.target_role IN ('all', ?))
+            ORDER BY n.created_at DESC
+        ''', (current_user.id, current_user.id, current_user.role)).fetchall()
+        # Shown as new once, read from then on
+        conn.executemany(
+            'INSERT OR IGNORE INTO notification_reads (notification_id, user_id) VALUES (?, ?)',
+            [(n['id'], current_user.id) for n in notifications if not n['is_read']]
+        )
+        conn.commit()
     except:
         notifications = []
     conn.close()
     return render_template('notifications.html', notifications=notifications)
 
+def replace_teacher_availability(conn, teacher_id, rows, days=None):
+    """
+    Store a teacher's availability merged: overlapping, touching and
+    duplicate ranges collapse into one row per contiguous run. Only the
+    given days are replaced (all days when None). Does not commit.
+    """
+    if days is None:
+        conn.execute('DELETE FROM teacher_availability WHERE teacher_id = ?', (teacher_id,))
+    else:
+        conn.executemany('DELETE FROM teacher_availability WHERE teacher_id = ? AND day = ?',
+                         [(teacher_id, day) for day in days])
+    merged = merged_rows(rows)
+    conn.executemany('''
+        INSERT INTO teacher_availability (teacher_id, day, start_hour, end_hour)
+        VALUES (?, ?, ?, ?)
+    ''', [(teacher_id, day, start, end) for day, start, end in merged])
+    return merged
+
 @app.route('/add_availability', methods=['POST'])
 @login_required
 @role_required('admin')
 def add_availability():
     teacher_id = request.form['teacher_id']
-    day = request.form['day']
-    start_hour = request.form['start_hour']
-    end_hour = request.form['end_hour']
+    try:
+        day, start_hour, end_hour = validate_interval(
+            request.form['day'], request.form['start_hour'], request.form['end_hour']
+        )
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin_panel'))
     
     conn = get_db_connection()
-    conn.execute('''
-        INSERT INTO teacher_availability (teacher_id, day, start_hour, end_hour)
-        VALUES (?, ?, ?, ?)
-    ''', (teacher_id, day, start_hour, end_hour))
-    conn.commit()
-    conn.close()
+    try:
+        existing = conn.execute('SELECT * FROM teacher_availability WHERE teacher_id = ? AND day = ?',
+                                (teacher_id, day)).fetchall()
+        new_row = {'day': day, 'start_hour': start_hour, 'end_hour': end_hour}
+        replace_teacher_availability(conn, teacher_id, list(existing) + [new_row], days=[day])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        flash('Error adding availability.', 'error')
+        return redirect(url_for('admin_panel'))
+    finally:
+        conn.close()
     
     flash('Teacher availability added successfully!', 'success')
+    flash_timetable_update(update_timetable_incrementally())
     return redirect(url_for('admin_panel'))
 
+@app.route('/teacher_availability/<int:teacher_id>', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def teacher_availability(teacher_id):
+    """
+    GET: the teacher's merged weekly availability; with no rows stored,
+    the default window the solvers assume.
+    POST: replace it in one transaction with a JSON body
+    {"availability": [{"day": "Mon", "start_hour": 9, "end_hour": 12}, ...]}
+    holding at least one range.
+    """
+    conn = get_db_connection()
+    try:
+        if not conn.execute('SELECT id FROM teachers WHERE id = ?', (teacher_id,)).fetchone():
+            return jsonify({'success': False, 'message': 'Teacher not found'}), 404
+        
+        if request.method == 'GET':
+            rows = conn.execute('SELECT * FROM teacher_availability WHERE teacher_id = ?', (teacher_id,)).fetchall()
+            index = AvailabilityIndex(rows)
+            return jsonify({'success': True, 'default': not rows, 'availability': [
+                {'day': day, 'start_hour': start, 'end_hour': end} for day, start, end in index.intervals(teacher_id)
+            ]})
+        
+        data = request.get_json(silent=True)
+        # With no rows the solvers fall back to the default Mon-Fri 9AM-12PM window, not "never"
+        if not isinstance(data, dict) or not isinstance(data.get('availability'), list) or not data['availability']:
+            return jsonify({'success': False, 'message': 'availability must list at least one range'}), 400
+        try:
+            rows = [dict(zip(('day', 'start_hour', 'end_hour'),
+                             validate_interval(r.get('day'), r.get('start_hour'), r.get('end_hour'))))
+                    for r in data['availability']]
+        except (ValueError, AttributeError) as e:
+            return jsonify({'success': False, 'message': str(e) or 'Invalid availability'}), 400
+        
+        merged = replace_teacher_availability(conn, teacher_id, rows)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'success': True,
+        'availability': [{'day': day, 'start_hour': start, 'end_hour': end} for day, start, end in merged],
+        'timetable_update': update_timetable_incrementally()
+    })
+
 # Attendance Management
 @app.route('/attendance')
 @login_required
@@ -812,21 +1878,13 @@ def mark_attendance():
             if not access_check:
                 return jsonify({'success': False, 'message': 'Access denied'})
             
-            # Check if attendance already marked
-            existing = conn.execute('''
-                SELECT * FROM attendance WHERE student_id = ? AND subject_id = ? AND date = ?
-            ''', (student_id, subject_id, date)).fetchone()
-            
-            if existing:
-                conn.execute('''
-                    UPDATE attendance SET status = ?, marked_at = CURRENT_TIMESTAMP 
-                    WHERE student_id = ? AND subject_id = ? AND date = ?
-                ''', (status, student_id, subject_id, date))
-            else:
-                conn.execute('''
-                    INSERT INTO attendance (student_id, subject_id, teacher_id, date, status)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (student_id, subject_id, teacher['id'], date, status))
+            # Marking again the same day changes the status
+            conn.execute('''
+                INSERT INTO attendance (student_id, subject_id, teacher_id, date, status)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (student_id, subject_id, date)
+                DO UPDATE SET status = excluded.status, marked_at = CURRENT_TIMESTAMP
+            ''', (student_id, subject_id, teacher['id'], date, status))
             
             conn.commit()
             return jsonify({'success': True, 'message': 'Attendance marked successfully'})
@@ -1004,18 +2062,12 @@ def submit_assignment():
     student = conn.execute('SELECT * FROM students WHERE user_id = ?', (current_user.id,)).fetchone()
     
     if student and file_path:
-        # Check if submission already exists
-        existing = conn.execute('SELECT * FROM assignment_submissions WHERE assignment_id = ? AND student_id = ?', 
-                               (assignment_id, student['id'])).fetchone()
-        
-        if existing:
-            # Update existing submission
-            conn.execute('UPDATE assignment_submissions SET file_path = ?, submitted_at = CURRENT_TIMESTAMP WHERE assignment_id = ? AND student_id = ?', 
-                        (file_path, assignment_id, student['id']))
-        else:
-            # Create new submission
-            conn.execute('INSERT INTO assignment_submissions (assignment_id, student_id, file_path) VALUES (?, ?, ?)', 
-                        (assignment_id, student['id'], file_path))
+        # A resubmission replaces the earlier file
+        conn.execute('''
+            INSERT INTO assignment_submissions (assignment_id, student_id, file_path) VALUES (?, ?, ?)
+            ON CONFLICT (assignment_id, student_id)
+            DO UPDATE SET file_path = excluded.file_path, submitted_at = CURRENT_TIMESTAMP
+        ''', (assignment_id, student['id'], file_path))
         
         conn.commit()
         flash('Assignment submitted successfully!', 'success')
@@ -1034,36 +2086,15 @@ def create_notice():
     message = request.form['message']
     target_role = request.form['target_role']
     
+    if target_role not in ('all', 'teacher', 'student'):
+        flash('Invalid audience for the notice.', 'error')
+        return redirect(url_for('admin_dashboard'))
+
     conn = get_db_connection()
-    
-    # Check if notification already exists in last 5 minutes
-    existing = conn.execute('''
-        SELECT id FROM notifications 
-        WHERE title = ? AND message = ? AND target_role = ?
-        AND datetime(created_at) > datetime('now', '-5 minutes')
-        LIMIT 1
-    ''', (title, message, target_role)).fetchone()
-    
-    if existing:
+    if not publish_notification(conn, title, message, target_role):
         flash('Similar notification was already sent recently!', 'warning')
         conn.close()
         return redirect(url_for('admin_dashboard'))
-    
-    if target_role == 'all':
-        users = conn.execute('SELECT id FROM users WHERE is_active = 1').fetchall()
-        for user in users:
-            conn.execute('''
-                INSERT OR IGNORE INTO notifications (user_id, title, message, target_role)
-                VALUES (?, ?, ?, ?)
-            ''', (user['id'], title, message, target_role))
-    else:
-        users = conn.execute('SELECT id FROM users WHERE role = ? AND is_active = 1', (target_role,)).fetchall()
-        for user in users:
-            conn.execute('''
-                INSERT OR IGNORE INTO notifications (user_id, title, message, target_role)
-                VALUES (?, ?, ?, ?)
-            ''', (user['id'], title, message, target_role))
-    
     conn.commit()
     conn.close()
     
@@ -1317,16 +2348,11 @@ def upload_assignment_photo():
         student = conn.execute('SELECT * FROM students WHERE user_id = ?', (current_user.id,)).fetchone()
         
         if student:
-            # Check if submission already exists
-            existing = conn.execute('SELECT id FROM assignment_submissions WHERE student_id = ? AND assignment_id = ?', 
-                                  (student['id'], assignment_id)).fetchone()
-            
-            if existing:
-                conn.execute('UPDATE assignment_submissions SET file_path = ?, submitted_at = ? WHERE id = ?', 
-                           (photo_url, datetime.now(), existing['id']))
-            else:
-                conn.execute('INSERT INTO assignment_submissions (student_id, assignment_id, file_path, submitted_at) VALUES (?, ?, ?, ?)', 
-                           (student['id'], assignment_id, photo_url, datetime.now()))
+            conn.execute('''
+                INSERT INTO assignment_submissions (student_id, assignment_id, file_path, submitted_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (assignment_id, student_id)
+                DO UPDATE SET file_path = excluded.file_path, submitted_at = excluded.submitted_at
+            ''', (student['id'], assignment_id, photo_url, datetime.now()))
             
             conn.commit()
             conn.close()
@@ -0,0 +1,275 @@
+"""
+Solver scalability benchmark.
+
+Generates synthetic institutions, times every scheduling strategy plus the
+conflict resolver on them and writes the numbers to a JSON file.
+
+    python benchmarks/solver_benchmark.py --sizes small,medium
+    python benchmarks/solver_benchmark.py --sizes xlarge --density 0.4
+    python benchmarks/solver_benchmark.py --baseline benchmarks/results/last.json
+
+With --baseline the run exits non-zero when any strategy places fewer
+lectures, or takes much longer, than in the baseline file.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling.backtracking import resolve_conflicts
+from scheduling.slot_grid import DAYS, block_mask, entry_duration, parse_slot_label
+from scheduling.strategies import STRATEGIES
+
+# name: (teachers, lecture demands, rooms)
+SIZES = {
+    'small': (50, 500, 20),
+    'medium': (250, 2500, 60),
+    'large': (1000, 10000, 250),
+    'xlarge': (2000, 20000, 500),
+}
+
+# Teaching day the synthetic availability windows are drawn from
+DAY_START, DAY_END = 9, 17
+LECTURES_PER_CLASS = 25
+ROOM_CAPACITIES = [30, 30, 40, 60, 60, 120]
+CLASS_SIZES = [25, 30, 30, 40, 55]
+# Lengths drawn for the multi-hour subjects (labs, studios)
+BLOCK_LENGTHS = [2, 3]
+
+# A run counts as a regression when it is this much slower than the baseline
+SLOWDOWN_TOLERANCE = 1.5
+
+
+def make_instance(n_teachers, n_lectures, n_rooms, density=0.6, block_share=0.2, seed=0):
+    """
+    Synthetic institution in the shape the solvers take:
+    - each teacher is available on a `density` share of weekdays, in one
+      window covering roughly `density` of the teaching day
+    - lecture demands are split into subject rows of 2-5 lectures, spread
+      evenly over teachers and over classes of ~LECTURES_PER_CLASS lectures
+    - a `block_share` of subject rows are taught in 2- or 3-hour blocks
+    """
+    rnd = random.Random(seed)
+    teachers = [{'id': i} for i in range(1, n_teachers + 1)]
+    n_classes = max(1, n_lectures // LECTURES_PER_CLASS)
+    classes = [{'id': i} for i in range(1, n_classes + 1)]
+    class_size = {c['id']: rnd.choice(CLASS_SIZES) for c in classes}
+    classrooms = [{'id': i, 'capacity': rnd.choice(ROOM_CAPACITIES)} for i in range(1, n_rooms + 1)]
+
+    teacher_availability = []
+    span = DAY_END - DAY_START
+    for t in teachers:
+        for day in DAYS:
+            if rnd.random() >= density:
+                continue
+            length = max(1, min(span, round(span * density * rnd.uniform(0.7, 1.3))))
+            start = rnd.randint(DAY_START, DAY_END - length)
+            teacher_availability.append({
+                'teacher_id': t['id'], 'day': day, 'start_hour': start, 'end_hour': start + length
+            })
+
+    subjects = []
+    remaining = n_lectures
+    while remaining > 0:
+        count = min(remaining, rnd.randint(2, 5))
+        remaining -= count
+        teacher_id = len(subjects) % n_teachers + 1
+        class_id = rnd.randint(1, n_classes)
+        subject = {
+            'id': len(subjects) + 1,
+            'name': f'Subject {len(subjects) + 1}',
+            'teacher_id': teacher_id,
+            'class_id': class_id,
+            'num_lectures': count,
+            'num_students': class_size[class_id],
+        }
+        if rnd.random() < block_share:
+            subject['block_length'] = rnd.choice(BLOCK_LENGTHS)
+        subjects.append(subject)
+    return subjects, teachers, classrooms, classes, teacher_availability
+
+
+def count_conflicts(schedule):
+    """
+    Double-booked hours of a teacher, room or class; anything above 0 is a
+    bug. A multi-hour entry books every hour of its block.
+    """
+    conflicts = 0
+    for field in ('teacher_id', 'classroom_id', 'class_id'):
+        busy = {}
+        for entry in schedule:
+            mask = block_mask(parse_slot_label(entry['timeslot']), entry_duration(entry))
+            held = busy.get(entry[field], 0)
+            conflicts += bin(held & mask).count('1')
+            busy[entry[field]] = held | mask
+    return conflicts
+
+
+def _measure(fn, trace_memory):
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_case(size, strategy, instance, repair_budget, trace_memory):
+    subjects, teachers, classrooms, classes, teacher_availability = instance
+    demanded = sum(s['num_lectures'] for s in subjects)
+
+    def solve():
+        return STRATEGIES[strategy](subjects, teachers, classrooms, classes, teacher_availability)
+
+    def repair(schedule, shortages):
+        return resolve_conflicts(
+            schedule, subjects, teachers, classrooms, classes,
+            teacher_availability=teacher_availability, shortages=shortages,
+            time_budget=repair_budget
+        )
+
+    (schedule, shortages), solve_time, solve_peak = _measure(solve, False)
+    (repaired, remaining), repair_time, repair_peak = _measure(lambda: repair(schedule, shortages), False)
+    if trace_memory:
+        # Second, traced pass: tracemalloc slows allocation-heavy code, so it
+        # must not run during the timed pass. Process-pool strategies only
+        # report the parent's allocations.
+        _, _, solve_peak = _measure(solve, True)
+        _, _, repair_peak = _measure(lambda: repair(schedule, shortages), True)
+
+    def mb(peak):
+        return round(peak / 2 ** 20, 2) if peak is not None else None
+
+    return {
+        'size': size,
+        'strategy': strategy,
+        'teachers': len(teachers),
+        'rooms': len(classrooms),
+        'classes': len(classes),
+        'demanded': demanded,
+        'placed': len(schedule),
+        'placement_rate': round(len(schedule) / demanded, 4) if demanded else 1.0,
+        'shortages': sum(s['needed'] - s['assigned'] for s in shortages),
+        'wall_time': round(solve_time, 3),
+        'peak_memory_mb': mb(solve_peak),
+        'conflicts': count_conflicts(schedule),
+        'unparsed_slots': sum(1 for e in schedule if parse_slot_label(e['timeslot']) is None),
+        'repaired_placed': len(repaired),
+        'repaired_placement_rate': round(len(repaired) / demanded, 4) if demanded else 1.0,
+        'repaired_shortages': sum(s['needed'] - s['assigned'] for s in remaining),
+        'repair_time': round(repair_time, 3),
+        'repair_peak_memory_mb': mb(repair_peak),
+        'repaired_conflicts': count_conflicts(repaired),
+    }
+
+
+def find_regressions(results, baseline):
+    """Human-readable regressions of results against a baseline results list."""
+    before = {(r['size'], r['strategy']): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = before.get((r['size'], r['strategy']))
+        if r['conflicts'] or r['repaired_conflicts']:
+            regressions.append(f"{r['size']}/{r['strategy']}: timetable has double bookings")
+        if old is None:
+            continue
+        if r['placed'] < old['placed']:
+            regressions.append(f"{r['size']}/{r['strategy']}: placed {r['placed']} < {old['placed']}")
+        if r['repaired_placed'] < old['repaired_placed']:
+            regressions.append(
+                f"{r['size']}/{r['strategy']}: placed after repair {r['repaired_placed']} < {old['repaired_placed']}"
+            )
+        if old['wall_time'] >= 0.05 and r['wall_time'] > old['wall_time'] * SLOWDOWN_TOLERANCE:
+            regressions.append(f"{r['size']}/{r['strategy']}: {r['wall_time']}s vs {old['wall_time']}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the timetable solvers on synthetic institutions.')
+    parser.add_argument('--sizes', default='small,medium',
+                        help='comma-separated subset of ' + ', '.join(SIZES))
+    parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                        help='comma-separated subset of ' + ', '.join(STRATEGIES))
+    parser.add_argument('--density', type=float, default=0.6,
+                        help='share of weekdays and hours teachers are available (0-1)')
+    parser.add_argument('--block-share', type=float, default=0.2,
+                        help='share of subjects taught in 2-3 hour blocks (0-1)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repair-budget', type=float, default=10.0,
+                        help='seconds resolve_conflicts may spend per run')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak-memory pass')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/solver-<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(',') if s]
+    strategies = [s for s in args.strategies.split(',') if s]
+    unknown = [s for s in sizes if s not in SIZES] + [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        parser.error('unknown size or strategy: ' + ', '.join(unknown))
+
+    results = []
+    for size in sizes:
+        instance = make_instance(*SIZES[size], density=args.density, block_share=args.block_share,
+                                 seed=args.seed)
+        for strategy in strategies:
+            result = run_case(size, strategy, instance, args.repair_budget, not args.no_memory)
+            results.append(result)
+            line = (f"{size:>7} {strategy:>11}  placed {result['placement_rate']:.1%}"
+                    f" ({result['repaired_placement_rate']:.1%} repaired)"
+                    f"  solve {result['wall_time']}s  repair {result['repair_time']}s")
+            if result['peak_memory_mb'] is not None:
+                line += f"  peak {result['peak_memory_mb']} MB"
+            print(line)
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'density': args.density,
+        'block_share': args.block_share,
+        'seed': args.seed,
+        'repair_budget': args.repair_budget,
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        'solver-' + datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if ((baseline.get('density'), baseline.get('block_share'), baseline.get('seed'))
+                != (args.density, args.block_share, args.seed)):
+            print('Baseline was run on different instances (density/block share/seed); not comparing')
+            return 0
+        regressions = find_regressions(results, baseline['results'])
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
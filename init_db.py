@@ -2,204 +2,19 @@ import sqlite3
 import hashlib
 from datetime import datetime
 
+from migrations import apply_migrations
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def init_database():
     conn = sqlite3.connect('database/timelybuddy.db')
+    # Stored in the database file, so the app's connections all use it too
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Creates the schema on a new database and upgrades an existing one
+    apply_migrations(conn)
     c = conn.cursor()
 
-    # Users table with roles
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL CHECK (role IN ('admin', 'teacher', 'student')),
-            full_name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-    ''')
-
-    # Teachers table (linked to users)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS teachers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            employee_id TEXT UNIQUE,
-            department TEXT,
-            specialization TEXT,
-            phone TEXT,
-            profile_photo TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Students table (linked to users)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            student_id TEXT UNIQUE,
-            class_id INTEGER,
-            year INTEGER,
-            section TEXT,
-            profile_photo TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (class_id) REFERENCES classes(id)
-        )
-    ''')
-
-    # Classes table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS classes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            year INTEGER,
-            section TEXT,
-            capacity INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Subjects table (no direct teacher/class relation)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS subjects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            code TEXT UNIQUE,
-            credits INTEGER DEFAULT 3,
-            num_lectures INTEGER,
-            semester TEXT
-        )
-    ''')
-
-    # Teacher-Subject-Class mapping (many-to-many)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS teacher_subject_class (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id INTEGER,
-            subject_id INTEGER,
-            class_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
-            FOREIGN KEY (subject_id) REFERENCES subjects(id),
-            FOREIGN KEY (class_id) REFERENCES classes(id),
-            UNIQUE(teacher_id, subject_id, class_id)
-        )
-    ''')
-
-    # Classrooms table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS classrooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            building TEXT,
-            floor INTEGER,
-            capacity INTEGER,
-            equipment TEXT,
-            is_available BOOLEAN DEFAULT 1
-        )
-    ''')
-
-    # Teacher availability
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS teacher_availability (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id INTEGER,
-            day TEXT,
-            start_hour INTEGER,
-            end_hour INTEGER,
-            FOREIGN KEY (teacher_id) REFERENCES teachers(id)
-        )
-    ''')
-
-    # Timetable
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS timetable (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            subject_id INTEGER,
-            teacher_id INTEGER,
-            classroom_id INTEGER,
-            class_id INTEGER,
-            day TEXT,
-            start_time TEXT,
-            end_time TEXT,
-            timeslot TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (subject_id) REFERENCES subjects(id),
-            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
-            FOREIGN KEY (classroom_id) REFERENCES classrooms(id),
-            FOREIGN KEY (class_id) REFERENCES classes(id)
-        )
-    ''')
-
-    # Notifications/Notices table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            title TEXT NOT NULL,
-            message TEXT NOT NULL,
-            type TEXT DEFAULT 'info',
-            target_role TEXT DEFAULT 'all',
-            is_read BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Attendance table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER,
-            subject_id INTEGER,
-            teacher_id INTEGER,
-            date DATE,
-            status TEXT CHECK (status IN ('present', 'absent')),
-            marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students(id),
-            FOREIGN KEY (subject_id) REFERENCES subjects(id),
-            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
-            UNIQUE(student_id, subject_id, date)
-        )
-    ''')
-
-    # Assignments table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            subject_id INTEGER,
-            teacher_id INTEGER,
-            class_id INTEGER,
-            due_date DATE,
-            file_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (subject_id) REFERENCES subjects(id),
-            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
-            FOREIGN KEY (class_id) REFERENCES classes(id)
-        )
-    ''')
-
-    # Assignment submissions table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS assignment_submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assignment_id INTEGER,
-            student_id INTEGER,
-            file_path TEXT,
-            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (assignment_id) REFERENCES assignments(id),
-            FOREIGN KEY (student_id) REFERENCES students(id)
-        )
-    ''')
-
     # Create default admin user
     admin_password = hash_password('admin123')
     c.execute('''
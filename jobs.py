@@ -0,0 +1,282 @@
+import atexit
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle worker waits before checking for jobs queued by another process
+POLL_INTERVAL = 2.0
+# Seconds between heartbeats of a running job
+HEARTBEAT_INTERVAL = 5.0
+# A running job without a heartbeat for this long lost its process
+STALE_AFTER = '-30 seconds'
+# Seconds between progress writes of a solver stage (see Job.reporter)
+PROGRESS_INTERVAL = 0.5
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobCancelled(Exception):
+    """Raised from Job.progress() once cancellation has been requested."""
+
+
+class Job:
+    """What a handler sees of its job: the queued params and a progress hook."""
+
+    def __init__(self, connect, job_id, params):
+        self._connect = connect
+        self.id = job_id
+        self.params = params
+
+    def progress(self, stage, percent, message=None):
+        """
+        Record the current stage, percentage and an optional detail line.
+        Also the cancellation point: raises JobCancelled when the job was
+        cancelled, so handlers call this before each step they are still
+        willing to abandon.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE generation_jobs SET stage = ?, progress = ?, message = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (stage, percent, message, self.id))
+            conn.commit()
+            row = conn.execute('SELECT cancel_requested FROM generation_jobs WHERE id = ?', (self.id,)).fetchone()
+        finally:
+            conn.close()
+        if row and row[0]:
+            raise JobCancelled()
+
+    def reporter(self, stage, start, end):
+        """
+        A progress(fraction) callback for a solver stage that spans start to
+        end percent. It writes at most every PROGRESS_INTERVAL seconds and,
+        like progress(), raises JobCancelled once the job was cancelled.
+        """
+        last = None
+
+        def report(fraction):
+            nonlocal last
+            now = time.monotonic()
+            if last is not None and now - last < PROGRESS_INTERVAL:
+                return
+            last = now
+            self.progress(stage, start + int((end - start) * min(max(fraction, 0.0), 1.0)))
+        return report
+
+
+class JobQueue:
+    """
+    Timetable generation jobs kept in the generation_jobs table and run by
+    one daemon thread per web process, so requests only enqueue and poll.
+
+    - the thread starts on the first enqueue, never at import: gunicorn
+      preloads the app and forks, and threads do not survive a fork
+    - jobs are claimed with a conditional UPDATE, so several processes can
+      share the table without running a job twice
+    - only one job is queued or running at a time; enqueueing again returns it
+    - a running job's heartbeat is refreshed every HEARTBEAT_INTERVAL; one
+      whose heartbeat stopped (its process was killed) is marked failed,
+      and a process exiting normally fails its own running job at once
+    - handler(job) returns a JSON-serialisable result or raises
+    """
+
+    def __init__(self, connect, handler):
+        self._connect = connect
+        self._handler = handler
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = None
+
+    def enqueue(self, params, user_id=None):
+        """Returns (job_id, created); created is False if a job was already active."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_stale(conn)
+            active = conn.execute('''
+                SELECT id FROM generation_jobs WHERE status IN (?, ?) ORDER BY id LIMIT 1
+            ''', ACTIVE_STATUSES).fetchone()
+            if active:
+                conn.commit()
+                job_id, created = active[0], False
+            else:
+                cursor = conn.execute('''
+                    INSERT INTO generation_jobs (params, created_by) VALUES (?, ?)
+                ''', (json.dumps(params), user_id))
+                conn.commit()
+                job_id, created = cursor.lastrowid, True
+        finally:
+            conn.close()
+
+        self._start()
+        self._wake.set()
+        return job_id, created
+
+    def get(self, job_id):
+        """Job status as a dict (result decoded), or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM generation_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def active(self):
+        """The queued or running job, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT id FROM generation_jobs WHERE status IN (?, ?) ORDER BY id LIMIT 1
+            ''', ACTIVE_STATUSES).fetchone()
+        finally:
+            conn.close()
+        return self.get(row[0]) if row else None
+
+    def last_done(self):
+        """The most recent job that finished successfully, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT id FROM generation_jobs WHERE status = 'done' ORDER BY id DESC LIMIT 1
+            ''').fetchone()
+        finally:
+            conn.close()
+        return self.get(row[0]) if row else None
+
+    def cancel(self, job_id):
+        """
+        A queued job is cancelled at once; a running one is flagged and stops
+        at its next progress() call. Returns the job, or None.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE generation_jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP,
+                       message = 'Cancelled before it started'
+                WHERE id = ? AND status = 'queued'
+            ''', (job_id,))
+            conn.execute('''
+                UPDATE generation_jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'
+            ''', (job_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is None:
+                    atexit.register(self._abandon)
+                self._thread = threading.Thread(target=self._run, name='generation-jobs', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception:
+                # e.g. the database is locked for longer than busy_timeout
+                logger.exception('Could not claim a generation job')
+                job = None
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._execute(job)
+
+    def _claim(self):
+        while True:
+            conn = self._connect()
+            try:
+                self._fail_stale(conn)
+                conn.commit()
+                row = conn.execute('''
+                    SELECT id, params FROM generation_jobs WHERE status = 'queued' ORDER BY id LIMIT 1
+                ''').fetchone()
+                if row is None:
+                    return None
+                claimed = conn.execute('''
+                    UPDATE generation_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP,
+                           updated_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'queued'
+                ''', (row[0],)).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            # rowcount 0: another process claimed it first
+            if claimed:
+                return Job(self._connect, row[0], json.loads(row[1] or '{}'))
+
+    def _execute(self, job):
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job.id, stop), name='generation-heartbeat',
+                         daemon=True).start()
+        self._running = job.id
+        try:
+            result = self._handler(job)
+        except JobCancelled:
+            self._finish(job.id, 'cancelled', message='Cancelled')
+        except Exception as e:
+            logger.exception('Generation job %s failed', job.id)
+            self._finish(job.id, 'failed', message=str(e) or e.__class__.__name__)
+        else:
+            self._finish(job.id, 'done', result=result)
+        finally:
+            self._running = None
+            stop.set()
+
+    def _heartbeat(self, job_id, stop):
+        # A thread of its own: the handler may go a long time without calling progress()
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            conn = self._connect()
+            try:
+                conn.execute('''
+                    UPDATE generation_jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'running'
+                ''', (job_id,))
+                conn.commit()
+            except Exception:
+                logger.exception('Could not record the heartbeat of generation job %s', job_id)
+            finally:
+                conn.close()
+
+    def _abandon(self):
+        """At interpreter exit (e.g. a recycled worker): the daemon thread dies with it, so fail its job now."""
+        job_id = self._running
+        if job_id is None:
+            return
+        try:
+            self._finish(job_id, 'failed', message='The worker running this job stopped')
+        except Exception:
+            logger.exception('Could not mark generation job %s as failed', job_id)
+
+    def _finish(self, job_id, status, message=None, result=None):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE generation_jobs
+                SET status = ?, message = ?, result = ?, finished_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP, progress = CASE WHEN ? = 'done' THEN 100 ELSE progress END
+                WHERE id = ?
+            ''', (status, message, json.dumps(result) if result is not None else None, status, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _fail_stale(conn):
+        conn.execute('''
+            UPDATE generation_jobs SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                   message = 'The worker running this job stopped'
+            WHERE status = 'running' AND COALESCE(heartbeat_at, updated_at) < datetime('now', ?)
+        ''', (STALE_AFTER,))
@@ -0,0 +1,437 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Tables the timetable solvers read, plus the timetable itself
+INPUT_TABLES = ('subjects', 'teacher_subject_class', 'teachers', 'classrooms', 'classes',
+                'teacher_availability', 'timetable')
+
+
+def add_column(table, column, definition):
+    """A migration step adding a column unless the table already has it (SQLite has no ADD COLUMN IF NOT EXISTS)."""
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+
+# (version, name, statements), applied in order; a statement is SQL or a
+# function taking the connection. Append only: a recorded version never
+# runs again, so any later schema change is a new migration.
+MIGRATIONS = [
+    # The schema of the first release. Databases created before this runner
+    # existed already have these tables, so every statement is a no-op there.
+    (0, 'Base schema', [
+        # Users table with roles
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('admin', 'teacher', 'student')),
+            full_name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+        ''',
+        # Teachers table (linked to users)
+        '''
+        CREATE TABLE IF NOT EXISTS teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            employee_id TEXT UNIQUE,
+            department TEXT,
+            specialization TEXT,
+            phone TEXT,
+            profile_photo TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        # Students table (linked to users)
+        '''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            student_id TEXT UNIQUE,
+            class_id INTEGER,
+            year INTEGER,
+            section TEXT,
+            profile_photo TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (class_id) REFERENCES classes(id)
+        )
+        ''',
+        # Classes table
+        '''
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            year INTEGER,
+            section TEXT,
+            capacity INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Subjects table (no direct teacher/class relation)
+        '''
+        CREATE TABLE IF NOT EXISTS subjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            code TEXT UNIQUE,
+            credits INTEGER DEFAULT 3,
+            num_lectures INTEGER,
+            semester TEXT
+        )
+        ''',
+        # Teacher-Subject-Class mapping (many-to-many)
+        '''
+        CREATE TABLE IF NOT EXISTS teacher_subject_class (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_id INTEGER,
+            subject_id INTEGER,
+            class_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            FOREIGN KEY (class_id) REFERENCES classes(id),
+            UNIQUE(teacher_id, subject_id, class_id)
+        )
+        ''',
+        # Classrooms table
+        '''
+        CREATE TABLE IF NOT EXISTS classrooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            building TEXT,
+            floor INTEGER,
+            capacity INTEGER,
+            equipment TEXT,
+            is_available BOOLEAN DEFAULT 1
+        )
+        ''',
+        # Teacher availability
+        '''
+        CREATE TABLE IF NOT EXISTS teacher_availability (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_id INTEGER,
+            day TEXT,
+            start_hour INTEGER,
+            end_hour INTEGER,
+            FOREIGN KEY (teacher_id) REFERENCES teachers(id)
+        )
+        ''',
+        # Timetable
+        '''
+        CREATE TABLE IF NOT EXISTS timetable (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            classroom_id INTEGER,
+            class_id INTEGER,
+            day TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            timeslot TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
+            FOREIGN KEY (classroom_id) REFERENCES classrooms(id),
+            FOREIGN KEY (class_id) REFERENCES classes(id)
+        )
+        ''',
+        # Notifications/Notices table
+        '''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            type TEXT DEFAULT 'info',
+            target_role TEXT DEFAULT 'all',
+            is_read BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        # Attendance table
+        '''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            date DATE,
+            status TEXT CHECK (status IN ('present', 'absent')),
+            marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(id),
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
+            UNIQUE(student_id, subject_id, date)
+        )
+        ''',
+        # Assignments table
+        '''
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            class_id INTEGER,
+            due_date DATE,
+            file_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            FOREIGN KEY (teacher_id) REFERENCES teachers(id),
+            FOREIGN KEY (class_id) REFERENCES classes(id)
+        )
+        ''',
+        # Assignment submissions table
+        '''
+        CREATE TABLE IF NOT EXISTS assignment_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_id INTEGER,
+            student_id INTEGER,
+            file_path TEXT,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (assignment_id) REFERENCES assignments(id),
+            FOREIGN KEY (student_id) REFERENCES students(id)
+        )
+        ''',
+    ]),
+    (1, 'Indexes for the hot lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_timetable_class ON timetable (class_id, timeslot)',
+        'CREATE INDEX IF NOT EXISTS idx_timetable_teacher ON timetable (teacher_id, timeslot)',
+        'CREATE INDEX IF NOT EXISTS idx_attendance_subject_date ON attendance (subject_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_notifications_role ON notifications (target_role, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_notifications_created ON notifications (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_students_class ON students (class_id)',
+    ]),
+    (2, 'One submission per student and assignment', [
+        # Keep each student's latest submission before the key is enforced
+        '''
+        DELETE FROM assignment_submissions WHERE id NOT IN (
+            SELECT MAX(id) FROM assignment_submissions GROUP BY assignment_id, student_id
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_assignment_student '
+        'ON assignment_submissions (assignment_id, student_id)',
+    ]),
+    (3, 'Timetable generations kept for rollback', [
+        '''
+        CREATE TABLE IF NOT EXISTS generations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER,
+            strategy TEXT,
+            params TEXT,
+            input_hash TEXT,
+            placed INTEGER,
+            missing INTEGER,
+            stats TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (job_id) REFERENCES generation_jobs(id)
+        )
+        ''',
+        # Snapshot rows are never updated; a generation is replaced, not edited
+        '''
+        CREATE TABLE IF NOT EXISTS generation_entries (
+            generation_id INTEGER NOT NULL,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            classroom_id INTEGER,
+            class_id INTEGER,
+            timeslot TEXT,
+            semester TEXT,
+            duration INTEGER DEFAULT 1,
+            FOREIGN KEY (generation_id) REFERENCES generations(id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_generation_entries_generation ON generation_entries (generation_id)',
+    ]),
+    (4, 'Broadcast notifications with per-user read receipts', [
+        # Only users who have read a notification get a row
+        '''
+        CREATE TABLE IF NOT EXISTS notification_reads (
+            notification_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            read_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (notification_id, user_id),
+            FOREIGN KEY (notification_id) REFERENCES notifications(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) WITHOUT ROWID
+        ''',
+        # Every notification so far was fanned out as one row per user, in
+        # one transaction walking the users in id order: a run of consecutive
+        # rows with the same text, rising user ids and under a minute between
+        # them is one announcement. Its first row becomes the broadcast row.
+        '''
+        CREATE TEMP TABLE notification_fanout AS
+        WITH steps AS (
+            SELECT id, user_id, is_read,
+                   CASE WHEN LAG(title) OVER w IS title AND LAG(message) OVER w IS message
+                             AND LAG(target_role) OVER w IS target_role AND LAG(user_id) OVER w < user_id
+                             AND julianday(created_at) - julianday(LAG(created_at) OVER w) < 60.0 / 86400
+                        THEN 0 ELSE 1 END AS starts
+            FROM notifications WHERE user_id IS NOT NULL
+            WINDOW w AS (ORDER BY id)
+        ), runs AS (
+            SELECT id, user_id, is_read, SUM(starts) OVER (ORDER BY id) AS run FROM steps
+        )
+        SELECT id, user_id, is_read, MIN(id) OVER (PARTITION BY run) AS keep_id FROM runs
+        ''',
+        '''
+        INSERT OR IGNORE INTO notification_reads (notification_id, user_id)
+        SELECT keep_id, user_id FROM notification_fanout WHERE is_read
+        ''',
+        'DELETE FROM notifications WHERE id IN (SELECT id FROM notification_fanout WHERE id != keep_id)',
+        'UPDATE notifications SET user_id = NULL WHERE id IN (SELECT keep_id FROM notification_fanout)',
+        'DROP TABLE notification_fanout',
+        # Direct messages by user, broadcasts (user_id NULL) by audience; replaces the user_id index
+        'CREATE INDEX IF NOT EXISTS idx_notifications_audience ON notifications (user_id, target_role, created_at)',
+        'DROP INDEX IF EXISTS idx_notifications_user',
+    ]),
+    # Schema changes that were applied ad hoc by init_db.py before the runner
+    (5, 'Generation jobs, schedule cache, settings and lecture blocks', [
+        # Databases created before per-semester generation and multi-hour lectures
+        add_column('subjects', 'block_length', 'INTEGER DEFAULT 1'),
+        add_column('timetable', 'semester', 'TEXT'),
+        add_column('timetable', 'duration', 'INTEGER DEFAULT 1'),
+        # Background timetable generation jobs
+        '''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+            params TEXT,
+            stage TEXT,
+            progress INTEGER DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            cancel_requested BOOLEAN DEFAULT 0,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+        ''',
+        # Solver results by input fingerprint, so regenerating unchanged inputs is instant
+        '''
+        CREATE TABLE IF NOT EXISTS schedule_cache (
+            input_hash TEXT PRIMARY KEY,
+            strategy TEXT,
+            schedule TEXT NOT NULL,
+            shortages TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Small application-wide key/value state
+        '''
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # inputs_version goes up on every change to the solver inputs or the
+        # timetable, so in-memory copies (what-if solving) know when to reload
+        "INSERT OR IGNORE INTO app_settings (key, value) VALUES ('inputs_version', '0')",
+    ] + [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_inputs_version
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE app_settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'inputs_version';
+        END
+        '''
+        for table in INPUT_TABLES for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    (6, 'Generation job heartbeats', [
+        add_column('generation_jobs', 'heartbeat_at', 'TIMESTAMP'),
+    ]),
+]
+
+# Index -> a query it was added for; check_query_plans() confirms SQLite uses it
+INDEX_QUERIES = {
+    'idx_timetable_class': 'SELECT * FROM timetable WHERE class_id = 1 ORDER BY timeslot',
+    'idx_timetable_teacher': 'SELECT * FROM timetable WHERE teacher_id = 1 ORDER BY timeslot',
+    'idx_attendance_subject_date':
+        "SELECT student_id, status FROM attendance WHERE subject_id = 1 AND date = '2024-01-01' AND teacher_id = 1",
+    'idx_notifications_audience':
+        "SELECT * FROM notifications WHERE user_id = 1 OR (user_id IS NULL AND target_role IN ('all', 'student')) "
+        "ORDER BY created_at DESC",
+    'idx_notifications_role':
+        "SELECT DISTINCT title, message, created_at FROM notifications WHERE target_role IN ('all', 'teacher') "
+        "ORDER BY created_at DESC LIMIT 5",
+    'idx_notifications_created': 'SELECT DISTINCT title, message, created_at FROM notifications '
+                                 'ORDER BY created_at DESC LIMIT 5',
+    'idx_students_class': 'SELECT * FROM students WHERE class_id = 1',
+    'idx_submissions_assignment_student':
+        'SELECT id FROM assignment_submissions WHERE student_id = 1 AND assignment_id = 1',
+    'idx_generation_entries_generation': 'SELECT * FROM generation_entries WHERE generation_id = 1',
+}
+
+
+def apply_migrations(conn):
+    """
+    Apply every migration not yet recorded in schema_migrations. Each one
+    runs in its own transaction together with its record, so a failure
+    leaves nothing half-done and it is retried next start. BEGIN IMMEDIATE
+    makes processes starting together take turns: the later ones find the
+    version already recorded and skip it. Returns the versions applied.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    done = set(row[0] for row in conn.execute('SELECT version FROM schema_migrations'))
+
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version in done:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info('Applied schema migration %s: %s', version, name)
+        applied.append(version)
+    return applied
+
+
+def check_query_plans(conn):
+    """[(index, query plan)] for every index in INDEX_QUERIES its query does not use."""
+    unused = []
+    for index, query in INDEX_QUERIES.items():
+        plan = ' | '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query))
+        if index not in plan:
+            unused.append((index, plan))
+    return unused
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect('database/timelybuddy.db')
+    print('Applied:', apply_migrations(conn) or 'nothing, already up to date')
+    for index, plan in check_query_plans(conn):
+        print(f'{index} is not used: {plan}')
+    conn.close()
@@ -0,0 +1,290 @@
+# === annealing.py ===
+
+import math
+import random
+import time
+
+from scheduling.room_index import min_capacity
+from scheduling.slot_grid import (
+    SlotGrid, FALLBACK_MASK, HOURS_PER_DAY, block_length, build_availability_masks, entry_duration, iter_slots,
+    parse_slot_label, slot_label
+)
+
+# Seconds the optimiser may spend; it is an anytime stage, so any budget works
+DEFAULT_TIME_BUDGET = 5.0
+
+# Soft-objective weights (lower total is better)
+# - spread: pairs of lectures of one subject/class on the same day
+# - teacher_gaps / class_gaps: idle hours between a day's first and last lecture
+# - room_balance: sum of squared room loads (uneven room use)
+DEFAULT_WEIGHTS = {
+    'spread': 3.0,
+    'teacher_gaps': 1.0,
+    'class_gaps': 1.0,
+    'room_balance': 0.1,
+}
+
+START_TEMPERATURE = 2.0
+END_TEMPERATURE = 0.01
+# Iterations between clock reads
+CHECK_EVERY = 256
+# Iterations in a row without an accepted move after which the search stops
+# early: the state is stuck (too few free slots to move into)
+STALL_LIMIT = 20000
+# Random rooms tried before a relocation gives up on a slot
+ROOM_TRIES = 3
+
+_DAY_BITS = (1 << HOURS_PER_DAY) - 1
+
+
+def _gaps(day_mask):
+    """Idle hours between the first and last busy hour of one day."""
+    if not day_mask:
+        return 0
+    first = (day_mask & -day_mask).bit_length()
+    return day_mask.bit_length() - first + 1 - bin(day_mask).count('1')
+
+
+class _Lecture:
+    __slots__ = ('key', 'teacher_id', 'class_id', 'slot', 'room_id', 'slots', 'avail', 'rooms', 'need')
+
+    def __init__(self, key, teacher_id, class_id, slot, room_id, slots, avail, rooms, need):
+        self.key = key
+        self.teacher_id = teacher_id
+        self.class_id = class_id
+        self.slot = slot
+        self.room_id = room_id
+        self.slots = slots
+        self.avail = avail
+        self.rooms = rooms
+        self.need = need
+
+
+class _Annealer:
+    """
+    Feasible-space local search over (slot, room) positions.
+
+    Moves are proposed as [(lecture, slot, room_id)] and checked against
+    the hard constraints before they are applied, so the current state is
+    always a valid timetable. The objective is kept as a running total;
+    moving one lecture only touches its teacher's day, its class's day, its
+    subject's day count and its room's load, so a move is scored in O(1).
+    `blocked` entries (fixed or reserved) go on the grid before the
+    lectures, so the starting cost counts the gaps they close or open.
+    """
+
+    def __init__(self, lectures, capacity, weights, blocked=()):
+        self.capacity = capacity
+        self.weights = weights
+        self.grid = SlotGrid()
+        self.day_count = {}
+        self.room_load = {}
+        self.cost = 0.0
+        for entry in blocked:
+            slot = entry.get('slot')
+            if slot is None:
+                slot = parse_slot_label(entry['timeslot'])
+            if slot is not None:
+                self.grid.occupy(entry['teacher_id'], entry['classroom_id'], entry['class_id'], slot,
+                                 entry_duration(entry))
+        for lecture in lectures:
+            self.cost += self._add(lecture, lecture.slot, lecture.room_id)
+
+    def _local(self, lecture, slot, room_id):
+        """Objective terms one lecture at (slot, room) touches."""
+        w = self.weights
+        shift = slot - slot % HOURS_PER_DAY
+        n = self.day_count.get((lecture.key, slot // HOURS_PER_DAY), 0)
+        load = self.room_load.get(room_id, 0)
+        return (
+            w['spread'] * n * (n - 1) / 2
+            + w['teacher_gaps'] * _gaps((self.grid.teacher.get(lecture.teacher_id, 0) >> shift) & _DAY_BITS)
+            + w['class_gaps'] * _gaps((self.grid.klass.get(lecture.class_id, 0) >> shift) & _DAY_BITS)
+            + w['room_balance'] * load * load
+        )
+
+    def _add(self, lecture, slot, room_id):
+        before = self._local(lecture, slot, room_id)
+        day = (lecture.key, slot // HOURS_PER_DAY)
+        self.day_count[day] = self.day_count.get(day, 0) + 1
+        self.room_load[room_id] = self.room_load.get(room_id, 0) + 1
+        self.grid.occupy(lecture.teacher_id, room_id, lecture.class_id, slot)
+        lecture.slot, lecture.room_id = slot, room_id
+        return self._local(lecture, slot, room_id) - before
+
+    def _remove(self, lecture):
+        slot, room_id = lecture.slot, lecture.room_id
+        before = self._local(lecture, slot, room_id)
+        self.day_count[(lecture.key, slot // HOURS_PER_DAY)] -= 1
+        self.room_load[room_id] -= 1
+        bit = 1 << slot
+        self.grid.teacher[lecture.teacher_id] &= ~bit
+        self.grid.room[room_id] &= ~bit
+        self.grid.klass[lecture.class_id] &= ~bit
+        return self._local(lecture, slot, room_id) - before
+
+    def apply(self, move):
+        """Apply a move; returns the change in cost and the move that undoes it."""
+        undo = [(lecture, lecture.slot, lecture.room_id) for lecture, _, _ in move]
+        delta = 0.0
+        for lecture, _, _ in move:
+            delta += self._remove(lecture)
+        for lecture, slot, room_id in move:
+            delta += self._add(lecture, slot, room_id)
+        self.cost += delta
+        return delta, undo
+
+    def _busy(self, mask_by_id, key, slot):
+        return (mask_by_id.get(key, 0) >> slot) & 1
+
+    def relocate(self, lecture, rnd):
+        """A random slot of the teacher's availability, keeping the room if it is free there."""
+        slot = rnd.choice(lecture.slots)
+        if slot == lecture.slot or self._busy(self.grid.teacher, lecture.teacher_id, slot) \
+                or self._busy(self.grid.klass, lecture.class_id, slot):
+            return None
+        room_id = lecture.room_id
+        if self._busy(self.grid.room, room_id, slot):
+            for _ in range(ROOM_TRIES):
+                room_id = rnd.choice(lecture.rooms)
+                if not self._busy(self.grid.room, room_id, slot):
+                    break
+            else:
+                return None
+        return [(lecture, slot, room_id)]
+
+    def swap(self, a, b):
+        """Exchange the (slot, room) positions of two lectures of one class."""
+        if a.slot == b.slot:
+            return None
+        if self.capacity[b.room_id] < a.need or self.capacity[a.room_id] < b.need:
+            return None
+        if not ((a.avail >> b.slot) & 1 and (b.avail >> a.slot) & 1):
+            return None
+        # A teacher busy at the other slot is fine only if it is the other lecture's own teacher
+        if a.teacher_id != b.teacher_id and (
+                self._busy(self.grid.teacher, a.teacher_id, b.slot)
+                or self._busy(self.grid.teacher, b.teacher_id, a.slot)):
+            return None
+        return [(a, b.slot, b.room_id), (b, a.slot, a.room_id)]
+
+
+def improve_schedule(schedule, subjects, teachers, classrooms, teacher_availability,
+                     time_budget=DEFAULT_TIME_BUDGET, weights=None, seed=0, reserved=(), progress=None):
+    """
+    Anytime simulated annealing over a feasible schedule:
+    - moves are single-lecture relocations (new slot, room kept if free)
+      and position swaps between two lectures of the same class
+    - hard constraints (clashes, availability, room capacity) are never
+      broken, so every state visited is a valid timetable
+    - each move is scored incrementally against soft goals: subject spread
+      over days, teacher and class gaps, and room balance
+    - runs until time_budget, or until STALL_LIMIT iterations in a row
+      find no move to accept, and returns the best schedule seen in the
+      same entry shape it was given; progress gets the fraction of the
+      budget used
+
+    Entries it cannot model (unknown subject row, unparsable slot,
+    multi-hour blocks) are kept as they are and simply block their slots,
+    as do `reserved` entries, which are not returned.
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    deadline = time.perf_counter() + time_budget
+    rnd = random.Random(seed)
+
+    rows = {}
+    for subject in subjects:
+        rows.setdefault((subject['id'], subject['teacher_id'], subject['class_id']), subject)
+    capacity = {c['id']: int(c['capacity'] or 0) for c in classrooms}
+    rooms_by_need = {}
+    availability = build_availability_masks(teacher_availability, teachers)
+    slots_by_teacher = {}
+
+    lectures, fixed, order = [], [], []
+    for entry in schedule:
+        key = (entry['subject_id'], entry['teacher_id'], entry['class_id'])
+        subject = rows.get(key)
+        slot = entry.get('slot')
+        if slot is None:
+            slot = parse_slot_label(entry['timeslot'])
+        if subject is None or slot is None or entry['classroom_id'] not in capacity \
+                or entry_duration(entry) > 1 or block_length(subject) > 1:
+            fixed.append(entry)
+            order.append(None)
+            continue
+        need = min_capacity(subject)
+        if need not in rooms_by_need:
+            rooms_by_need[need] = [room_id for room_id, cap in capacity.items() if cap >= need]
+        teacher_id = entry['teacher_id']
+        if teacher_id not in slots_by_teacher:
+            mask = availability.get(teacher_id, FALLBACK_MASK)
+            slots_by_teacher[teacher_id] = (mask, list(iter_slots(mask)))
+        mask, slots = slots_by_teacher[teacher_id]
+        lecture = _Lecture(key, teacher_id, entry['class_id'], slot, entry['classroom_id'],
+                           slots or [slot], mask | (1 << slot), rooms_by_need[need], need)
+        lectures.append(lecture)
+        order.append(lecture)
+
+    if not lectures:
+        return list(schedule)
+
+    state = _Annealer(lectures, capacity, weights, blocked=fixed + list(reserved))
+
+    by_class = {}
+    for lecture in lectures:
+        by_class.setdefault(lecture.class_id, []).append(lecture)
+
+    best_cost = state.cost
+    best = None     # None: the current state is the best one
+    start = time.perf_counter()
+    temperature = START_TEMPERATURE
+    iteration = accepted_at = 0
+
+    while iteration - accepted_at < STALL_LIMIT:
+        iteration += 1
+        if iteration % CHECK_EVERY == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            elapsed = (now - start) / max(deadline - start, 1e-9)
+            temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** elapsed
+            if progress is not None:
+                progress(elapsed)
+
+        lecture = rnd.choice(lectures)
+        if rnd.random() < 0.5:
+            move = state.relocate(lecture, rnd)
+        else:
+            move = state.swap(lecture, rnd.choice(by_class[lecture.class_id]))
+        if move is None:
+            continue
+
+        delta, undo = state.apply(move)
+        if delta <= 0:
+            accepted_at = iteration
+            if state.cost < best_cost - 1e-9:
+                best_cost = state.cost
+                best = None
+            continue
+        if rnd.random() >= math.exp(-delta / temperature):
+            state.apply(undo)
+            continue
+        accepted_at = iteration
+        if best is None:
+            # Walking uphill from the best state: snapshot it first
+            state.apply(undo)
+            best = [(l.slot, l.room_id) for l in lectures]
+            state.apply(move)
+
+    if best is not None:
+        for lecture, (slot, room_id) in zip(lectures, best):
+            lecture.slot, lecture.room_id = slot, room_id
+
+    result = []
+    for entry, lecture in zip(schedule, order):
+        if lecture is None:
+            result.append(entry)
+        else:
+            result.append(dict(entry, classroom_id=lecture.room_id, timeslot=slot_label(lecture.slot),
+                               slot=lecture.slot))
+    return result
@@ -0,0 +1,69 @@
+# === availability.py ===
+
+from scheduling.slot_grid import (
+    DAYS, DAY_INDEX, FALLBACK_MASK, HOURS_PER_DAY, block_mask, build_availability_masks, hour_range_mask
+)
+
+_DAY_BITS = (1 << HOURS_PER_DAY) - 1
+
+
+def mask_intervals(mask):
+    """A teacher's slot mask as [(day, start_hour, end_hour)] rows, one per contiguous run."""
+    rows = []
+    for day in DAYS:
+        day_mask = (mask >> (DAY_INDEX[day] * HOURS_PER_DAY)) & _DAY_BITS
+        hour = 0
+        while day_mask:
+            # Skip to the next run of set bits, then measure its length
+            skip = (day_mask & -day_mask).bit_length() - 1
+            day_mask >>= skip
+            hour += skip
+            length = (~day_mask & (day_mask + 1)).bit_length() - 1
+            rows.append((day, hour, hour + length))
+            day_mask >>= length
+            hour += length
+    return rows
+
+
+def merged_rows(rows):
+    """Normalise availability rows of one teacher: overlaps and duplicates merged, ordered Mon-Fri."""
+    mask = 0
+    for row in rows:
+        mask |= hour_range_mask(row['day'], row['start_hour'], row['end_hour'])
+    return mask_intervals(mask)
+
+
+def validate_interval(day, start_hour, end_hour):
+    """(day, start, end) with integer hours, or raise ValueError with a message for the admin."""
+    if day not in DAY_INDEX:
+        raise ValueError(f'Unknown day: {day}')
+    try:
+        start, end = int(start_hour), int(end_hour)
+    except (TypeError, ValueError):
+        raise ValueError('Hours must be whole numbers')
+    if not 0 <= start < end <= HOURS_PER_DAY:
+        raise ValueError(f'Invalid hours {start}-{end}: need 0 <= start < end <= {HOURS_PER_DAY}')
+    return day, start, end
+
+
+class AvailabilityIndex:
+    """
+    Per-teacher availability as slot bitmasks (one bit per hour of the
+    week), so lookups never expand rows hour by hour. Teachers with no rows
+    get the default Mon-Fri 9AM-12PM window, as in the solvers.
+    """
+
+    def __init__(self, teacher_availability, teachers=()):
+        self.masks = build_availability_masks(teacher_availability, teachers)
+
+    def mask(self, teacher_id):
+        return self.masks.get(teacher_id, FALLBACK_MASK)
+
+    def is_available(self, teacher_id, slot, length=1):
+        """Whether the teacher is available for every hour of the `length`-hour block from slot."""
+        bits = block_mask(slot, length)
+        return self.mask(teacher_id) & bits == bits
+
+    def intervals(self, teacher_id):
+        """The teacher's availability as merged [(day, start_hour, end_hour)] rows."""
+        return mask_intervals(self.mask(teacher_id))
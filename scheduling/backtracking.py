@@ -1,8 +1,317 @@
 # === backtracking.py ===
 
-def resolve_conflicts(initial_schedule, subjects, teachers, classrooms, classes):
+import time
+
+from scheduling.room_index import RoomIndex, min_capacity
+from scheduling.slot_grid import (
+    SlotGrid, FALLBACK_MASK, block_length, build_availability_masks, entry_duration, iter_slots, parse_slot_label,
+    slot_label
+)
+
+# Seconds the repair stage may spend; keeps /generate_timetable well inside
+# gunicorn's 30s worker timeout even after the greedy pass and persistence.
+DEFAULT_TIME_BUDGET = 10.0
+
+# Backtracks (backjumps included) allowed per neighbourhood before it is
+# abandoned and restored
+DEFAULT_MAX_BACKJUMPS = 2000
+
+
+class _Abort(Exception):
+    pass
+
+
+class _Lecture:
+    __slots__ = ('idx', 'subject', 'subject_id', 'teacher_id', 'class_id', 'avail', 'eligible',
+                 'slot', 'room_id', 'home_slot', 'movable')
+
+    def __init__(self, idx, subject, subject_id, teacher_id, class_id, avail, eligible):
+        self.idx = idx
+        self.subject = subject
+        self.subject_id = subject_id
+        self.teacher_id = teacher_id
+        self.class_id = class_id
+        self.avail = avail
+        self.eligible = eligible
+        self.slot = None
+        self.room_id = None
+        self.home_slot = None
+        self.movable = subject is not None
+
+
+def _subject_key(teacher_id, class_id, subject_id):
+    return (subject_id, teacher_id, class_id)
+
+
+class _Repair:
+    """
+    Lecture-level CSP over the greedy result.
+
+    Each stuck lecture is repaired inside a neighbourhood made of itself and
+    every placed lecture that shares its teacher or class. The neighbourhood
+    is lifted out of the grid and re-solved with MRV ordering, forward
+    checking over teacher/room/class domains and conflict-directed
+    backjumping; everything outside it stays frozen. A neighbourhood that
+    fails or runs over its backjump bound is put back exactly as it was.
+    """
+
+    def __init__(self, classrooms, availability, deadline, max_backjumps):
+        self.grid = SlotGrid()
+        self.rooms = RoomIndex(classrooms)
+        self.availability = availability
+        self.deadline = deadline
+        self.max_backjumps = max_backjumps
+        self.lectures = []
+        self._stack = []
+        self._backjumps = 0
+
+    def new_lecture(self, subject, subject_id, teacher_id, class_id):
+        if subject is None:
+            avail, eligible = 0, 0
+        else:
+            avail = self.availability.get(teacher_id, FALLBACK_MASK)
+            eligible = self.rooms.eligible(min_capacity(subject))
+        lecture = _Lecture(len(self.lectures), subject, subject_id, teacher_id, class_id, avail, eligible)
+        self.lectures.append(lecture)
+        return lecture
+
+    # -- occupancy -------------------------------------------------------
+
+    def assign(self, lecture, slot, room_id):
+        lecture.slot = slot
+        lecture.room_id = room_id
+        self.grid.occupy(lecture.teacher_id, room_id, lecture.class_id, slot)
+        if room_id in self.rooms.position:
+            self.rooms.assign(room_id, slot)
+
+    def unassign(self, lecture):
+        self.grid.release(lecture.teacher_id, lecture.room_id, lecture.class_id, lecture.slot)
+        if lecture.room_id in self.rooms.position:
+            self.rooms.release(lecture.room_id, lecture.slot)
+        lecture.slot = None
+        lecture.room_id = None
+
+    def domain(self, lecture):
+        """Feasible slots for an unassigned lecture, its previous slot first."""
+        mask = self.grid.free_slots(lecture.teacher_id, lecture.class_id, lecture.avail)
+        slots = [s for s in iter_slots(mask) if self.rooms.free(s, lecture.eligible)]
+        home = lecture.home_slot
+        if home is not None and home in slots:
+            slots.remove(home)
+            slots.insert(0, home)
+        return slots
+
+    # -- search ----------------------------------------------------------
+
+    def repair(self, stuck):
+        """Try to place every lecture in `stuck` (same teacher and class)."""
+        first = stuck[0]
+        neighbourhood = [
+            l for l in self.lectures
+            if l.movable and l.slot is not None
+            and (l.teacher_id == first.teacher_id or l.class_id == first.class_id)
+        ]
+        saved = [(l, l.slot, l.room_id) for l in neighbourhood]
+        for lecture in neighbourhood:
+            lecture.home_slot = lecture.slot
+            self.unassign(lecture)
+
+        variables = neighbourhood + stuck
+        self._stack = []
+        self._backjumps = 0
+        try:
+            domains = {v.idx: self.domain(v) for v in variables}
+            if self._counts_fit(variables, domains) and self._extend(variables, domains) is None:
+                return True
+        except _Abort:
+            pass
+
+        # Failed: unwind whatever the search left behind and restore
+        for lecture in self._stack:
+            self.unassign(lecture)
+        self._stack = []
+        for lecture, slot, room_id in saved:
+            self.assign(lecture, slot, room_id)
+        return False
+
+    def _counts_fit(self, variables, domains):
+        """Pigeonhole check: a teacher or class cannot take more lectures than slots."""
+        groups = {}
+        for v in variables:
+            for key in (('t', v.teacher_id), ('c', v.class_id)):
+                count, mask = groups.get(key, (0, 0))
+                for slot in domains[v.idx]:
+                    mask |= 1 << slot
+                groups[key] = (count + 1, mask)
+        return all(count <= bin(mask).count('1') for count, mask in groups.values())
+
+    def _extend(self, unassigned, domains):
+        """
+        FC-CBJ step. Returns None once every variable is assigned, otherwise
+        the conflict set (lecture indexes) explaining the failure.
+        """
+        if not unassigned:
+            return None
+        if time.perf_counter() > self.deadline:
+            raise _Abort()
+
+        # MRV: smallest remaining domain, ties by lecture order
+        var = min(unassigned, key=lambda v: (len(domains[v.idx]), v.idx))
+        rest = [v for v in unassigned if v is not var]
+        conflict = set()
+
+        for slot in domains[var.idx]:
+            room_id = self.rooms.pick(slot, var.eligible)
+            if room_id is None:
+                continue
+            self.assign(var, slot, room_id)
+            self._stack.append(var)
+
+            # Forward check every remaining domain against the new assignment
+            new_domains = {}
+            wiped = None
+            for other in rest:
+                d = self.domain(other)
+                if not d:
+                    wiped = other
+                    break
+                new_domains[other.idx] = d
+
+            if wiped is None:
+                result = self._extend(rest, new_domains)
+                if result is None:
+                    return None
+            else:
+                result = self._culprits(wiped)
+
+            self._stack.pop()
+            self.unassign(var)
+
+            self._backjumps += 1
+            if self._backjumps > self.max_backjumps:
+                raise _Abort()
+            if var.idx not in result:
+                # Nothing about var caused this failure: jump straight past it
+                return result
+            conflict |= result
+
+        conflict.discard(var.idx)
+        return conflict | self._culprits(var)
+
+    def _culprits(self, lecture):
+        """Assigned search variables that could have pruned lecture's domain."""
+        culprits = set()
+        for other in self._stack:
+            if other.teacher_id == lecture.teacher_id or other.class_id == lecture.class_id:
+                culprits.add(other.idx)
+            elif (lecture.avail >> other.slot) & 1 and other.room_id in self.rooms.position \
+                    and (lecture.eligible >> self.rooms.position[other.room_id]) & 1:
+                culprits.add(other.idx)
+        return culprits
+
+
+def _hold(state, entry):
+    """Fixed stand-ins for every hour of an entry the repair must work around."""
+    slot = entry.get('slot')
+    if slot is None:
+        slot = parse_slot_label(entry['timeslot'])
+    if slot is None:
+        return
+    for hour in range(slot, slot + entry_duration(entry)):
+        state.assign(state.new_lecture(None, entry['subject_id'], entry['teacher_id'], entry['class_id']),
+                     hour, entry['classroom_id'])
+
+
+def resolve_conflicts(initial_schedule, subjects, teachers, classrooms, classes,
+                      teacher_availability=(), shortages=None,
+                      time_budget=DEFAULT_TIME_BUDGET, max_backjumps=DEFAULT_MAX_BACKJUMPS, reserved=(),
+                      progress=None):
     """
-    Placeholder: for now, assumes initial schedule is conflict-free.
-    For advanced version: attempt rescheduling if conflicts found.
+    CSP repair stage run after generate_initial_schedule.
+
+    - Rebuilds the occupancy of the greedy result
+    - For every shortage, re-solves the lectures of the same teacher and
+      class with MRV, forward checking and bounded backjumping
+    - Stops as soon as time_budget seconds have passed, keeping every
+      repair completed so far
+    - `reserved` entries block their slots but are never moved or returned
+    - multi-hour blocks stay where they are and their shortages are passed
+      through; the search moves one-hour lectures only
+    - calls progress(fraction of shortages handled) when given
+
+    Returns (schedule, shortages) in the same shapes as the greedy pass.
     """
-    return initial_schedule
+    if not shortages:
+        return initial_schedule, list(shortages or [])
+
+    deadline = time.perf_counter() + time_budget
+    availability = build_availability_masks(teacher_availability, teachers)
+    state = _Repair(classrooms, availability, deadline, max_backjumps)
+
+    rows = {}
+    for subject in subjects:
+        rows.setdefault(_subject_key(subject['teacher_id'], subject['class_id'], subject['id']), subject)
+
+    for entry in reserved:
+        _hold(state, entry)
+    blocks = [entry for entry in initial_schedule if entry_duration(entry) > 1]
+    for entry in blocks:
+        _hold(state, entry)
+    first_own = len(state.lectures)
+
+    for entry in initial_schedule:
+        if entry_duration(entry) > 1:
+            continue
+        key = _subject_key(entry['teacher_id'], entry['class_id'], entry['subject_id'])
+        lecture = state.new_lecture(rows.get(key), entry['subject_id'], entry['teacher_id'], entry['class_id'])
+        slot = entry.get('slot')
+        if slot is None:
+            slot = parse_slot_label(entry['timeslot'])
+        state.assign(lecture, slot, entry['classroom_id'])
+
+    # Unplaced lectures, one group per shortage row
+    groups = []
+    outcome = {}
+    for pos, shortage in enumerate(shortages):
+        key = _subject_key(shortage['teacher_id'], shortage['class_id'], shortage['subject_id'])
+        subject = rows.get(key)
+        missing = shortage['needed'] - shortage['assigned']
+        if subject is None or missing <= 0 or block_length(subject) > 1:
+            outcome[pos] = shortage
+            continue
+        groups.append((pos, shortage, [
+            state.new_lecture(subject, subject['id'], shortage['teacher_id'], shortage['class_id'])
+            for _ in range(missing)
+        ]))
+
+    # Most constrained groups first
+    groups.sort(key=lambda g: bin(g[2][0].avail).count('1'))
+
+    for done, (pos, shortage, stuck) in enumerate(groups):
+        if progress is not None:
+            progress(done / len(groups))
+        if time.perf_counter() > deadline:
+            unplaced = stuck
+        elif state.repair(stuck):
+            unplaced = []
+        else:
+            # Not all of them fit together; salvage what fits one at a time
+            unplaced = [l for l in stuck if time.perf_counter() > deadline or not state.repair([l])]
+
+        if unplaced:
+            placed = len(stuck) - len(unplaced)
+            outcome[pos] = dict(shortage, assigned=shortage['assigned'] + placed)
+
+    remaining = [outcome[pos] for pos in sorted(outcome)]
+
+    schedule = [{
+        'subject_id': l.subject_id,
+        'teacher_id': l.teacher_id,
+        'classroom_id': l.room_id,
+        'class_id': l.class_id,
+        'timeslot': slot_label(l.slot),
+        'slot': l.slot,
+        'duration': 1
+    } for l in state.lectures[first_own:] if l.slot is not None]
+
+    return schedule + blocks, remaining
@@ -0,0 +1,173 @@
+# === decomposition.py ===
+
+import os
+
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.parallel import plain, run_parallel
+from scheduling.room_index import min_capacity
+from scheduling.stats import SolverStats
+
+
+def sharing_components(subjects):
+    """
+    Connected components of the teacher/class sharing graph: two subject rows
+    belong together when they share a teacher or a class, directly or through
+    other rows. Returns lists of row indexes, largest component first.
+    """
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    for s in subjects:
+        a, b = find(('t', s['teacher_id'])), find(('c', s['class_id']))
+        if a != b:
+            parent[a] = b
+
+    groups = {}
+    for i, s in enumerate(subjects):
+        groups.setdefault(find(('t', s['teacher_id'])), []).append(i)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def _demand(subjects, rows):
+    return sum(int(subjects[i]['num_lectures']) for i in rows)
+
+
+def pack_components(components, subjects, bins):
+    """
+    Pack components into at most `bins` independent buckets, heaviest
+    component into the lightest bucket first, so each worker gets a similar
+    number of lectures.
+    """
+    buckets = [[] for _ in range(min(bins, len(components)))]
+    load = [0] * len(buckets)
+    for rows in sorted(components, key=lambda r: _demand(subjects, r), reverse=True):
+        k = load.index(min(load))
+        buckets[k].extend(rows)
+        load[k] += _demand(subjects, rows)
+    return [sorted(b) for b in buckets if b]
+
+
+def apportion_rooms(buckets, subjects, classrooms):
+    """
+    Rooms are the one resource every department can share, so the pool is
+    split into disjoint shares sized to each bucket's lecture demand. Every
+    bucket first gets the smallest room that seats its largest lecture.
+    Returns one list of classrooms per bucket.
+    """
+    rooms = sorted(classrooms, key=lambda c: (-int(c['capacity'] or 0), c['id']))
+    shares = [[] for _ in buckets]
+    taken = set()
+
+    needs = [max(min_capacity(subjects[i]) for i in rows) for rows in buckets]
+    for k in sorted(range(len(buckets)), key=lambda k: -needs[k]):
+        fitting = [r for r in rooms if r['id'] not in taken and int(r['capacity'] or 0) >= needs[k]]
+        if fitting:
+            shares[k].append(fitting[-1])
+            taken.add(fitting[-1]['id'])
+
+    demand = [_demand(subjects, rows) for rows in buckets]
+    total = sum(demand) or 1
+    for room in rooms:
+        if room['id'] in taken:
+            continue
+        # Largest remaining room to the bucket furthest below its fair share
+        k = max(range(len(buckets)),
+                key=lambda k: (demand[k] / total * len(rooms) - len(shares[k]), -k))
+        shares[k].append(room)
+    return shares
+
+
+def _solve_bucket(solver, subjects, teachers, classrooms, classes, teacher_availability, reserved):
+    stats = SolverStats()
+    schedule, shortages = solver(
+        subjects, teachers, classrooms, classes, teacher_availability, reserved=reserved, stats=stats
+    )
+    return schedule, shortages, stats
+
+
+def generate_decomposed_schedule(subjects, teachers, classrooms, classes, teacher_availability, reserved=(),
+                                 workers=None, solver=generate_initial_schedule, stats=None, progress=None):
+    """
+    Splits the instance into independent parts and solves them concurrently:
+    - subject rows are grouped into connected components of the
+      teacher/class sharing graph
+    - components are packed into one bucket per worker and each bucket gets
+      its own share of the rooms, so buckets share no teacher, class or room
+    - buckets are solved in a process pool and the results merged
+    - lectures a bucket could not place get one spill pass against the
+      merged timetable and the full room pool
+    - every bucket and the spill pass work around the `reserved` entries
+    - `stats` gets the summed counters of every bucket and the spill pass;
+      progress is the fraction of buckets solved
+    """
+    subjects = plain(subjects)
+    teachers = plain(teachers)
+    classrooms = plain(classrooms)
+    teacher_availability = plain(teacher_availability)
+    classes = plain(classes)
+    reserved = plain(reserved)
+
+    components = sharing_components(subjects)
+    if not components:
+        return [], []
+    bins = min(workers or os.cpu_count() or 1, len(classrooms) or 1)
+    buckets = pack_components(components, subjects, bins)
+    shares = apportion_rooms(buckets, subjects, classrooms)
+
+    tasks = []
+    for rows, share in zip(buckets, shares):
+        bucket_subjects = [subjects[i] for i in rows]
+        teacher_ids = set(s['teacher_id'] for s in bucket_subjects)
+        tasks.append((
+            solver,
+            bucket_subjects,
+            [t for t in teachers if t['id'] in teacher_ids],
+            share,
+            classes,
+            [a for a in teacher_availability if a['teacher_id'] in teacher_ids],
+            reserved,
+        ))
+
+    results = [None] * len(tasks)
+    for finished, (index, result, error) in enumerate(run_parallel(_solve_bucket, tasks, workers), 1):
+        results[index] = result
+        if progress is not None:
+            progress(finished / len(tasks))
+    for index, result in enumerate(results):
+        if result is None:
+            # Lost worker: solve that bucket here rather than drop it
+            results[index] = _solve_bucket(*tasks[index])
+
+    schedule = []
+    shortages = []
+    for bucket_schedule, bucket_shortages, bucket_stats in results:
+        schedule.extend(bucket_schedule)
+        shortages.extend(bucket_shortages)
+        if stats is not None:
+            stats.merge(bucket_stats)
+    if not shortages or len(buckets) == 1:
+        return schedule, shortages
+
+    # Spill pass: bucket leftovers get one more try against the whole room pool
+    rows = {(s['id'], s['teacher_id'], s['class_id']): s for s in subjects}
+    leftovers = [
+        dict(rows[(s['subject_id'], s['teacher_id'], s['class_id'])], num_lectures=s['needed'] - s['assigned'])
+        for s in shortages
+    ]
+    spilled, still_short = generate_initial_schedule(
+        leftovers, teachers, classrooms, classes, teacher_availability, reserved=reserved + schedule, stats=stats
+    )
+    missing = {(s['subject_id'], s['teacher_id'], s['class_id']): s['needed'] - s['assigned'] for s in still_short}
+    remaining = []
+    for s in shortages:
+        key = (s['subject_id'], s['teacher_id'], s['class_id'])
+        if key in missing:
+            remaining.append(dict(s, assigned=s['needed'] - missing[key]))
+    return schedule + spilled, remaining
@@ -0,0 +1,42 @@
+# === fingerprint.py ===
+
+import hashlib
+import json
+
+from scheduling.room_index import min_capacity
+from scheduling.semesters import concurrency_key, semester_of
+from scheduling.slot_grid import block_length, build_availability_masks
+
+# Bump when a solver change should invalidate every cached result
+SOLVER_VERSION = 3
+
+
+def canonical_inputs(subjects, teachers, classrooms, classes, teacher_availability, strategy, concurrent=()):
+    """
+    The part of the solver inputs that can change its result, in a fixed
+    order: row order, unused teachers or classes, and how availability is
+    split into rows (overlaps, duplicates) do not matter. Subjects carry
+    their semester's concurrency group, since groups are solved apart.
+    """
+    demand = sorted(
+        (s['id'], s['teacher_id'], s['class_id'], int(s['num_lectures']), min_capacity(s), block_length(s),
+         concurrency_key(semester_of(s), concurrent))
+        for s in subjects
+    )
+    used_teachers = set(s['teacher_id'] for s in subjects)
+    masks = build_availability_masks(teacher_availability, [t for t in teachers if t['id'] in used_teachers])
+    return {
+        'version': SOLVER_VERSION,
+        'strategy': strategy,
+        'subjects': demand,
+        'rooms': sorted((c['id'], int(c['capacity'] or 0)) for c in classrooms),
+        # Masks are 120-bit ints; hex keeps them exact in JSON
+        'availability': sorted((t, format(m, 'x')) for t, m in masks.items() if t in used_teachers),
+    }
+
+
+def input_fingerprint(subjects, teachers, classrooms, classes, teacher_availability, strategy, concurrent=()):
+    """SHA-256 of canonical_inputs(); equal inputs give equal fingerprints."""
+    canonical = canonical_inputs(subjects, teachers, classrooms, classes, teacher_availability, strategy, concurrent)
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -1,117 +1,404 @@
 # === graph_coloring.py ===
 
-def generate_initial_schedule(subjects, teachers, classrooms, classes, teacher_availability):
+import heapq
+
+from scheduling.room_index import RoomIndex, min_capacity
+from scheduling.room_matching import match_rooms, room_fits
+from scheduling.slot_grid import (
+    SlotGrid, FALLBACK_MASK, HOURS_PER_DAY, block_length, block_starts, build_availability_masks, entry_duration,
+    iter_slots, parse_slot_label, slot_label
+)
+from scheduling.stats import phase, progress_span
+
+
+def reserve(grid, rooms, entries):
+    """
+    Mark schedule entries that are not being solved (already published,
+    another semester, another bucket...) as busy. Returns slot -> mask of
+    room positions they hold, which the room re-matching must not touch.
+    Multi-hour entries hold every hour of their block.
+    """
+    held = {}
+    for entry in entries:
+        start = entry.get('slot')
+        if start is None:
+            start = parse_slot_label(entry['timeslot'])
+        if start is None:
+            continue
+        room_id = entry['classroom_id']
+        length = entry_duration(entry)
+        grid.occupy(entry['teacher_id'], room_id, entry['class_id'], start, length)
+        for slot in range(start, start + length):
+            if room_id in rooms.position and rooms.is_free(room_id, slot):
+                rooms.assign(room_id, slot)
+                held[slot] = held.get(slot, 0) | (1 << rooms.position[room_id])
+    return held
+
+
+def generate_initial_schedule(subjects, teachers, classrooms, classes, teacher_availability, reserved=(),
+                              stats=None, progress=None):
     """
-    Improved version:
-    - Groups teacher slots by day
-    - Prefers different days for each lecture
-    - Checks room capacity and conflict
+    Improved version (collects the events of iter_initial_schedule):
+    - Tracks teacher, room and class occupancy as slot bitmasks
+    - Takes the earliest free slot of the teacher's week for each lecture;
+      multi-hour subjects (block_length) take the earliest run of that many
+      free hours in one day, found with bitmask run detection, in a room
+      free for the whole block
+    - Picks the least-loaded free room from a capacity-bucketed index
+    - When every fitting room is taken, re-matches the slot's rooms
+      (bipartite matching) before giving the slot up
+    - Works around `reserved` entries, which keep their slots and rooms
     - Reports shortage if not enough slots
+    - Records counters and the availability phase into `stats`
+      (SolverStats) when given: slots tried, room checks, and rejected
+      slots by reason (teacher or class clash, no free fitting room)
+    - Calls progress(fraction of subject rows done) when given
     """
+    schedule, shortages = [], []
+    for kind, index, item in iter_initial_schedule(
+            subjects, teachers, classrooms, classes, teacher_availability, reserved, stats, progress):
+        if kind == 'placed':
+            schedule.append(item)
+        elif kind == 'moved':
+            schedule[index] = item
+        else:
+            shortages.append(item)
+    return schedule, shortages
 
-    schedule = []
-    shortages = []
 
-    used_teacher_slots = {}
-    used_classroom_slots = {}
-    used_class_slots = {}
-    classroom_load = {c['id']: 0 for c in classrooms}
-
-    # Build teacher_id -> slots grouped by day
-    teacher_day_slots = {}
-    for row in teacher_availability:
-        t_id = row['teacher_id']
-        day = row['day']
-        start = int(row['start_hour'])
-        end = int(row['end_hour'])
-        slots = []
-        for hour in range(start, end):
-            if hour < 12:
-                slot = f"{day} {hour}AM"
-            else:
-                pm_hour = hour - 12 if hour > 12 else 12
-                slot = f"{day} {pm_hour}PM"
-            slots.append(slot)
-        teacher_day_slots.setdefault(t_id, {}).setdefault(day, []).extend(slots)
+def iter_initial_schedule(subjects, teachers, classrooms, classes, teacher_availability, reserved=(),
+                          stats=None, progress=None):
+    """
+    The greedy solver as a generator, so callers can persist and report
+    progress while it runs. Yields (kind, index, item) events:
+    - ('placed', i, entry): lecture i was placed
+    - ('moved', i, entry): a room re-match moved lecture i to another room
+      of the same slot; entry is its new state
+    - ('shortage', row, shortage): subject row `row` could not be fully placed
+    """
 
-    # Fallback: if teacher has no slots at all
-    for t in teachers:
-        if t['id'] not in teacher_day_slots:
-            fallback = {}
-            for day in ["Mon", "Tue", "Wed", "Thu", "Fri"]:
-                fallback[day] = [f"{day} {hour}AM" for hour in range(9, 12)]
-            teacher_day_slots[t['id']] = fallback
+    grid = SlotGrid()
+    rooms = RoomIndex(classrooms)
+    placements = []
 
-    days_order = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+    held = reserve(grid, rooms, reserved)
+    slot_members = {}   # slot -> indexes into placements
+    slot_demand = {}    # slot -> {seats needed: lectures}
+
+    def entry(i):
+        subject, room_id, slot = placements[i]
+        return {
+            'subject_id': subject['id'],
+            'teacher_id': subject['teacher_id'],
+            'classroom_id': room_id,
+            'class_id': subject['class_id'],
+            'timeslot': slot_label(slot),
+            'slot': slot,
+            'duration': block_length(subject)
+        }
+
+    def rematch(slot, need):
+        """(room for the new lecture, indexes of placed lectures whose room changed), or (None, ())."""
+        if not room_fits(slot_demand.get(slot, {}), need, rooms, held.get(slot, 0)):
+            return None, ()
+        members = slot_members.get(slot, [])
+        matched = match_rooms(
+            rooms,
+            [min_capacity(placements[i][0]) for i in members] + [need],
+            [placements[i][1] for i in members] + [None],
+            held.get(slot, 0)
+        )
+        if matched is None:
+            return None, ()
+
+        bit = 1 << slot
+        moved = [(i, room_id) for i, room_id in zip(members, matched) if placements[i][1] != room_id]
+        for i, _ in moved:
+            old = placements[i][1]
+            rooms.release(old, slot)
+            grid.room[old] &= ~bit
+        for i, room_id in moved:
+            rooms.assign(room_id, slot)
+            grid.room[room_id] = grid.room.get(room_id, 0) | bit
+            placements[i][1] = room_id
+        return matched[-1], [i for i, _ in moved]
+
+    with phase(stats, 'availability'):
+        availability = build_availability_masks(teacher_availability, teachers)
+
+    tried = room_checks = rematches = 0
+    teacher_clash = class_clash = room_clash = 0
 
     # Now, schedule each subject
-    for subject in subjects:
+    for row, subject in enumerate(subjects):
         teacher_id = subject['teacher_id']
         class_id = subject['class_id']
         needed = int(subject['num_lectures'])
         assigned = 0
 
-        teacher_slots_by_day = teacher_day_slots[teacher_id]
-
-        # Try to spread over different days first
-        pass_num = 0
-        while assigned < needed:
-            assigned_in_pass = False
-
-            for day in days_order:
-                slots = teacher_slots_by_day.get(day, [])
-                for slot in slots:
-                    # pick rooms big enough (use default capacity if num_students not available)
-                    try:
-                        min_capacity = subject['num_students']
-                    except (KeyError, IndexError):
-                        min_capacity = 30  # default to 30 students
-                    good_rooms = [r for r in classrooms if r['capacity'] >= min_capacity]
-                    sorted_rooms = sorted(good_rooms, key=lambda r: classroom_load[r['id']])
-
-                    for room in sorted_rooms:
-                        if used_teacher_slots.get((teacher_id, slot)):
-                            continue
-                        if used_classroom_slots.get((room['id'], slot)):
-                            continue
-                        if used_class_slots.get((class_id, slot)):
-                            continue
-
-                        # assign
-                        schedule.append({
-                            'subject_id': subject['id'],
-                            'teacher_id': teacher_id,
-                            'classroom_id': room['id'],
-                            'class_id': class_id,
-                            'timeslot': slot
-                        })
-
-                        used_teacher_slots[(teacher_id, slot)] = True
-                        used_classroom_slots[(room['id'], slot)] = True
-                        used_class_slots[(class_id, slot)] = True
-                        classroom_load[room['id']] += 1
-
-                        assigned += 1
-                        assigned_in_pass = True
-                        break  # done with this room
-
-                    if assigned_in_pass:
-                        break  # done with this slot
-
-                if assigned_in_pass:
-                    break  # done with this day
-
-            if not assigned_in_pass:
-                # No more free slots anywhere
+        need = min_capacity(subject)
+        good_rooms = rooms.eligible(need)
+        length = block_length(subject)
+        block_end = 0
+
+        # Only slots where teacher and class are both idle are worth a room check
+        avail = availability.get(teacher_id, FALLBACK_MASK)
+        candidates = block_starts(grid.free_slots(teacher_id, class_id, avail), length)
+        if stats is not None:
+            # Ruled out in bulk by the masks, so counted once per subject
+            teacher_busy = avail & grid.teacher.get(teacher_id, 0)
+            teacher_clash += bin(teacher_busy).count('1')
+            class_clash += bin(avail & ~teacher_busy & grid.klass.get(class_id, 0)).count('1')
+        if not good_rooms:
+            room_clash += bin(candidates).count('1')
+            candidates = 0
+
+        for slot in iter_slots(candidates):
+            if assigned >= needed:
                 break
+            if slot < block_end:
+                # Starts inside the block just placed
+                continue
+            tried += 1
 
-            pass_num += 1
+            room_checks += 1
+            room_id = rooms.pick(slot, good_rooms, length)
+            moved = ()
+            if room_id is None and length == 1:
+                rematches += 1
+                room_id, moved = rematch(slot, need)
+            if room_id is None:
+                room_clash += 1
+                continue
+            for i in moved:
+                yield 'moved', i, entry(i)
+
+            if length == 1:
+                slot_members.setdefault(slot, []).append(len(placements))
+                demand = slot_demand.setdefault(slot, {})
+                demand[need] = demand.get(need, 0) + 1
+                rooms.assign(room_id, slot)
+            else:
+                # Blocks keep their room: re-matching works one slot at a time
+                for s in range(slot, slot + length):
+                    rooms.assign(room_id, s)
+                    held[s] = held.get(s, 0) | (1 << rooms.position[room_id])
+                block_end = slot + length
+            placements.append([subject, room_id, slot])
+            grid.occupy(teacher_id, room_id, class_id, slot, length)
+            assigned += 1
+            yield 'placed', len(placements) - 1, entry(len(placements) - 1)
 
         if assigned < needed:
-            shortages.append({
+            yield 'shortage', row, {
                 'subject': subject['name'],
+                'subject_id': subject['id'],
+                'teacher_id': teacher_id,
+                'class_id': class_id,
                 'needed': needed,
                 'assigned': assigned
+            }
+        if progress is not None:
+            progress((row + 1) / len(subjects))
+
+    if stats is not None:
+        stats.count('slots_tried', tried)
+        stats.count('room_checks', room_checks)
+        stats.count('room_rematches', rematches)
+        stats.count('rejected_teacher', teacher_clash)
+        stats.count('rejected_class', class_clash)
+        stats.count('rejected_room', room_clash)
+        stats.count('placed', len(placements))
+
+
+def generate_dsatur_schedule(subjects, teachers, classrooms, classes, teacher_availability, stats=None,
+                             reserved=(), progress=None):
+    """
+    DSATUR graph coloring:
+    - Every lecture is a vertex; lectures sharing a teacher or class are adjacent
+    - Slots are colors, restricted to the teacher's availability
+    - The vertex with the fewest colors left (highest saturation relative to
+      its own slot list) is colored next, ties broken by degree: the number
+      of other subject rows sharing its teacher or class
+    - After each coloring, every lecture that lost a slot (a neighbour, or
+      one whose room size ran out at that slot) is re-queued with its new
+      count
+    - Each color is checked against room capacity for the slot; concrete
+      rooms are assigned in a second pass
+    - Multi-hour subjects are placed by the greedy solver first: a colour
+      is one slot, and a block needs a run of them
+    Same inputs and return shape as generate_initial_schedule; progress is
+    the fraction of lectures coloured.
+    """
+    if any(block_length(s) > 1 for s in subjects):
+        blocks = [s for s in subjects if block_length(s) > 1]
+        block_schedule, block_shortages = generate_initial_schedule(
+            blocks, teachers, classrooms, classes, teacher_availability, reserved=reserved, stats=stats,
+            progress=progress_span(progress, 0.0, 0.2)
+        )
+        schedule, shortages = generate_dsatur_schedule(
+            [s for s in subjects if block_length(s) == 1], teachers, classrooms, classes, teacher_availability,
+            stats=stats, reserved=list(reserved) + block_schedule, progress=progress_span(progress, 0.2, 1.0)
+        )
+        return block_schedule + schedule, block_shortages + shortages
+
+    grid = SlotGrid()
+    rooms = RoomIndex(classrooms)
+    held = reserve(grid, rooms, reserved)
+    with phase(stats, 'availability'):
+        availability = build_availability_masks(teacher_availability, teachers)
+
+    # Vertices
+    lectures = []   # (row index, teacher_id, class_id, avail mask, need)
+    by_teacher = {}
+    by_class = {}
+    by_need = {}
+    rows_by_teacher = {}
+    rows_by_class = {}
+    for row, subject in enumerate(subjects):
+        need = min_capacity(subject)
+        avail = availability.get(subject['teacher_id'], FALLBACK_MASK) if rooms.eligible(need) else 0
+        rows_by_teacher.setdefault(subject['teacher_id'], set()).add(row)
+        rows_by_class.setdefault(subject['class_id'], set()).add(row)
+        for _ in range(int(subject['num_lectures'])):
+            v = len(lectures)
+            lectures.append((row, subject['teacher_id'], subject['class_id'], avail, need))
+            by_teacher.setdefault(subject['teacher_id'], []).append(v)
+            by_class.setdefault(subject['class_id'], []).append(v)
+            by_need.setdefault(need, []).append(v)
+    # Distinct subject rows each row conflicts with; a row's own lectures do not count
+    row_degree = [
+        len((rows_by_teacher[s['teacher_id']] | rows_by_class[s['class_id']]) - {row})
+        for row, s in enumerate(subjects)
+    ]
+
+    color = [None] * len(lectures)
+    row_days = {}   # row -> bitmask of days already used
+    demand = {}     # slot -> {need: count}
+    # need -> slots whose rooms can no longer take a lecture of that size
+    blocked = {need: 0 for need in set(l[4] for l in lectures)}
+    for slot, mask in held.items():
+        for size in blocked:
+            if not room_fits({}, size, rooms, mask):
+                blocked[size] |= 1 << slot
+
+    def feasible(v):
+        _, teacher_id, class_id, avail, need = lectures[v]
+        return grid.free_slots(teacher_id, class_id, avail) & ~blocked[need]
+
+    def degree(v):
+        return row_degree[lectures[v][0]]
+
+    heap = [(bin(feasible(v)).count('1'), -degree(v), v) for v in range(len(lectures))]
+    heapq.heapify(heap)
+
+    popped = stale = done = 0
+    while heap:
+        left, neg_degree, v = heapq.heappop(heap)
+        if color[v] is not None:
+            continue
+        popped += 1
+        mask = feasible(v)
+        count = bin(mask).count('1')
+        if count != left:
+            # Stale entry: saturation moved since it was pushed
+            stale += 1
+            heapq.heappush(heap, (count, neg_degree, v))
+            continue
+        if not mask:
+            color[v] = -1
+            done += 1
+            continue
+
+        row, teacher_id, class_id, _, need = lectures[v]
+
+        # Prefer a day this subject has not used yet, then the earliest slot
+        used_days = row_days.get(row, 0)
+        slot = None
+        for s in iter_slots(mask):
+            if not (used_days >> (s // HOURS_PER_DAY)) & 1:
+                slot = s
+                break
+        if slot is None:
+            slot = (mask & -mask).bit_length() - 1
+
+        color[v] = slot
+        done += 1
+        if progress is not None:
+            progress(done / len(lectures))
+        row_days[row] = used_days | (1 << (slot // HOURS_PER_DAY))
+        bit = 1 << slot
+        slot_demand = demand.setdefault(slot, {})
+        slot_demand[need] = slot_demand.get(need, 0) + 1
+        filled = [size for size in blocked
+                  if not blocked[size] & bit and not room_fits(slot_demand, size, rooms, held.get(slot, 0))]
+
+        # Lectures that can still take this slot lose it: the neighbours, and
+        # every lecture of a size the slot's rooms can no longer take
+        candidates = set(by_teacher[teacher_id] + by_class[class_id])
+        for size in filled:
+            candidates.update(by_need[size])
+        for u in candidates:
+            if color[u] is None:
+                before = feasible(u)
+                if before & bit:
+                    heapq.heappush(heap, (bin(before).count('1') - 1, -degree(u), u))
+
+        grid.teacher[teacher_id] = grid.teacher.get(teacher_id, 0) | bit
+        grid.klass[class_id] = grid.klass.get(class_id, 0) | bit
+        for size in filled:
+            blocked[size] |= bit
+
+    # Second pass: rooms, one bipartite matching per slot
+    by_slot = {}
+    for v, slot in enumerate(color):
+        if slot is not None and slot >= 0:
+            by_slot.setdefault(slot, []).append(v)
+
+    room_of = {}
+    for slot in sorted(by_slot):
+        members = by_slot[slot]
+        # Hall's condition held for every color, so the matching is complete
+        matched = match_rooms(rooms, [lectures[v][4] for v in members], None, held.get(slot, 0))
+        for v, room_id in zip(members, matched):
+            rooms.assign(room_id, slot)
+            room_of[v] = room_id
+
+    schedule = []
+    placed = [0] * len(subjects)
+    for v, slot in enumerate(color):
+        if v not in room_of:
+            continue
+        row = lectures[v][0]
+        subject = subjects[row]
+        placed[row] += 1
+        schedule.append({
+            'subject_id': subject['id'],
+            'teacher_id': subject['teacher_id'],
+            'classroom_id': room_of[v],
+            'class_id': subject['class_id'],
+            'timeslot': slot_label(slot),
+            'slot': slot,
+            'duration': 1
+        })
+
+    if stats is not None:
+        stats.count('vertices_popped', popped)
+        stats.count('stale_saturation', stale)
+        stats.count('uncolourable', color.count(-1))
+        stats.count('placed', len(schedule))
+
+    shortages = []
+    for row, subject in enumerate(subjects):
+        needed = int(subject['num_lectures'])
+        if placed[row] < needed:
+            shortages.append({
+                'subject': subject['name'],
+                'subject_id': subject['id'],
+                'teacher_id': subject['teacher_id'],
+                'class_id': subject['class_id'],
+                'needed': needed,
+                'assigned': placed[row]
             })
 
     return schedule, shortages
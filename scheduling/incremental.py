@@ -0,0 +1,115 @@
+# === incremental.py ===
+
+from scheduling.availability import AvailabilityIndex
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.room_index import min_capacity
+from scheduling.slot_grid import block_length, block_mask, entry_duration, parse_slot_label
+
+
+def _key(entry):
+    return (entry['subject_id'], entry['teacher_id'], entry['class_id'])
+
+
+def _one_group(row):
+    return None
+
+
+def split_invalidated(current, subjects, teachers, classrooms, teacher_availability, group_of=None):
+    """
+    Split stored timetable rows into (kept, dropped) against the current
+    inputs. A row is dropped when:
+    - its subject/teacher/class assignment no longer exists
+    - its room is gone, unavailable or too small
+    - its slot (any hour of a multi-hour block) is outside the teacher's
+      availability, or its length no longer matches the subject's
+    - it double-books a teacher, room or class that a kept row of the
+      same group holds (group_of(row); rows of groups that never run at the
+      same time, e.g. different semesters, may share them)
+    - its assignment already has num_lectures kept rows
+    Rows are checked in id order, so the oldest placement wins a conflict.
+    """
+    group_of = group_of or _one_group
+    rows = {}
+    for s in subjects:
+        rows.setdefault((s['id'], s['teacher_id'], s['class_id']), s)
+    capacity = {c['id']: int(c['capacity'] or 0) for c in classrooms}
+    availability = AvailabilityIndex(teacher_availability, teachers)
+
+    teacher_busy, room_busy, class_busy = {}, {}, {}
+    count = {}
+    kept, dropped = [], []
+    for entry in sorted(current, key=lambda e: e['id']):
+        key = _key(entry)
+        subject = rows.get(key)
+        slot = parse_slot_label(entry['timeslot'])
+        length = entry_duration(entry)
+        bit = block_mask(slot, length) if slot is not None else 0
+        group = group_of(entry)
+        teacher = (group, entry['teacher_id'])
+        room = (group, entry['classroom_id'])
+        klass = (group, entry['class_id'])
+        valid = (
+            subject is not None
+            and bit
+            and capacity.get(entry['classroom_id'], -1) >= min_capacity(subject)
+            and length == block_length(subject)
+            and availability.is_available(entry['teacher_id'], slot, length)
+            and not teacher_busy.get(teacher, 0) & bit
+            and not room_busy.get(room, 0) & bit
+            and not class_busy.get(klass, 0) & bit
+            and count.get(key, 0) < int(subject['num_lectures'])
+        )
+        if not valid:
+            dropped.append(entry)
+            continue
+        teacher_busy[teacher] = teacher_busy.get(teacher, 0) | bit
+        room_busy[room] = room_busy.get(room, 0) | bit
+        class_busy[klass] = class_busy.get(klass, 0) | bit
+        count[key] = count.get(key, 0) + 1
+        kept.append(dict(entry, slot=slot, duration=length))
+    return kept, dropped
+
+
+def reschedule(current, subjects, teachers, classrooms, classes, teacher_availability, group_of=None):
+    """
+    Incremental re-solve after a small edit: every still-valid row of the
+    stored timetable stays frozen in its slot and room, and only lectures
+    that lost their placement (or never had one) are placed around them.
+    With group_of, each group is placed around its own kept rows only.
+
+    Returns (dropped, added, shortages): stored rows to delete, new entries
+    to insert, and the shortages of the resulting timetable.
+    """
+    group_of = group_of or _one_group
+    kept, dropped = split_invalidated(current, subjects, teachers, classrooms, teacher_availability, group_of)
+
+    have = {}
+    for entry in kept:
+        have[_key(entry)] = have.get(_key(entry), 0) + 1
+    missing = {}
+    seen = set()
+    for s in subjects:
+        key = (s['id'], s['teacher_id'], s['class_id'])
+        if key in seen:
+            continue
+        seen.add(key)
+        deficit = int(s['num_lectures']) - have.get(key, 0)
+        if deficit > 0:
+            missing.setdefault(group_of(s), []).append(dict(s, num_lectures=deficit))
+    if not missing:
+        return dropped, [], []
+
+    added, shortages = [], []
+    for group, rows in missing.items():
+        placed, short = generate_initial_schedule(
+            rows, teachers, classrooms, classes, teacher_availability,
+            reserved=[e for e in kept if group_of(e) == group]
+        )
+        added.extend(placed)
+        shortages.extend(short)
+    # Shortages count against the whole assignment, not just the re-solved part
+    shortages = [
+        dict(s, needed=s['needed'] + have.get(_key(s), 0), assigned=s['assigned'] + have.get(_key(s), 0))
+        for s in shortages
+    ]
+    return dropped, added, shortages
@@ -0,0 +1,121 @@
+# === multistart.py ===
+
+import random
+import time
+
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.parallel import plain, run_parallel
+from scheduling.slot_grid import build_availability_masks
+from scheduling.stats import SolverStats
+
+DEFAULT_STARTS = 16
+# Seconds the whole multi-start run may take, leaving room for persistence
+DEFAULT_TIME_LIMIT = 15.0
+
+# Inputs shared by every start inside one worker process
+_inputs = None
+
+
+def _init_worker(inputs):
+    global _inputs
+    _inputs = inputs
+
+
+def _run_start(start, order):
+    subjects, teachers, classrooms, classes, teacher_availability, reserved = _inputs
+    stats = SolverStats()
+    schedule, shortages = generate_initial_schedule(
+        [subjects[i] for i in order], teachers, classrooms, classes, teacher_availability, reserved=reserved,
+        stats=stats
+    )
+    return start, schedule, shortages, stats
+
+
+def score(schedule, shortages, classrooms):
+    """
+    Lower is better: unplaced lectures first, then how unevenly lectures are
+    spread over rooms (variance of room load).
+    """
+    missing = sum(s['needed'] - s['assigned'] for s in shortages)
+    load = {c['id']: 0 for c in classrooms}
+    for entry in schedule:
+        load[entry['classroom_id']] = load.get(entry['classroom_id'], 0) + 1
+    if not load:
+        return (missing, 0.0)
+    mean = sum(load.values()) / len(load)
+    variance = sum((n - mean) ** 2 for n in load.values()) / len(load)
+    return (missing, round(variance, 6))
+
+
+def start_orders(subjects, teachers, teacher_availability, starts, seed=0):
+    """
+    Subject orderings to try:
+    - start 0 keeps the query order (the plain greedy result)
+    - start 1 is most constrained first (fewest free hours per lecture)
+    - start 2 is most lectures first
+    - every other start is the constrained order with random noise
+    """
+    availability = build_availability_masks(teacher_availability, teachers)
+    tightness = []
+    for s in subjects:
+        hours = bin(availability.get(s['teacher_id'], 0)).count('1')
+        tightness.append(hours / max(int(s['num_lectures']), 1))
+
+    n = len(subjects)
+    orders = [list(range(n))]
+    if starts > 1:
+        orders.append(sorted(range(n), key=lambda i: (tightness[i], i)))
+    if starts > 2:
+        orders.append(sorted(range(n), key=lambda i: (-int(subjects[i]['num_lectures']), i)))
+
+    rnd = random.Random(seed)
+    while len(orders) < starts:
+        noise = [rnd.uniform(0.5, 1.5) for _ in range(n)]
+        orders.append(sorted(range(n), key=lambda i: (tightness[i] * noise[i], i)))
+    return orders[:starts]
+
+
+def generate_multistart_schedule(subjects, teachers, classrooms, classes, teacher_availability, reserved=(),
+                                 starts=DEFAULT_STARTS, time_limit=DEFAULT_TIME_LIMIT,
+                                 workers=None, seed=0, stats=None, progress=None):
+    """
+    Runs generate_initial_schedule over several subject orderings in a
+    process pool and keeps the best result by score(). Starts still pending
+    when time_limit runs out are cancelled and the best finished one wins
+    (at least one start always completes). Falls back to running the starts
+    in-process when a pool is unavailable. Every start works around the
+    `reserved` entries. `stats` gets the summed counters
+    of every finished start; progress is the fraction of starts finished.
+    """
+    deadline = time.monotonic() + time_limit
+    inputs = (plain(subjects), plain(teachers), plain(classrooms), plain(classes),
+              plain(teacher_availability), plain(reserved))
+    orders = start_orders(inputs[0], inputs[1], inputs[4], max(int(starts), 1), seed)
+
+    best = None
+
+    def consider(result):
+        nonlocal best
+        start, schedule, shortages, start_stats = result
+        if stats is not None:
+            stats.merge(start_stats)
+            stats.count('starts_finished')
+        key = score(schedule, shortages, inputs[2]) + (start,)
+        if best is None or key < best[0]:
+            best = (key, schedule, shortages)
+
+    tasks = list(enumerate(orders))
+    for finished, (_, result, error) in enumerate(
+            run_parallel(_run_start, tasks, workers, deadline, _init_worker, (inputs,)), 1):
+        if error is None:
+            consider(result)
+        if progress is not None:
+            progress(finished / len(tasks))
+
+    if best is None:
+        # Nothing finished in time: the query-order start is always returned
+        _init_worker(inputs)
+        consider(_run_start(0, orders[0]))
+
+    _, schedule, shortages = best
+    return schedule, shortages
@@ -0,0 +1,170 @@
+# === occupancy.py ===
+
+from bisect import bisect_left
+
+from scheduling.availability import AvailabilityIndex
+from scheduling.room_index import min_capacity
+from scheduling.slot_grid import (
+    HOURS_PER_DAY, NUM_SLOTS, block_mask, entry_duration, iter_slots, parse_slot_label, slot_label
+)
+
+
+class OccupancyIndex:
+    """
+    Who is busy when, for free-room/free-teacher lookups and for checking
+    hand edits of the timetable.
+
+    Built once from the timetable, the available classrooms and teacher
+    availability; every query after that is bit arithmetic.
+    - lookups: each room and teacher owns one bit, and per slot the index
+      keeps the rooms and teachers booked then and the teachers available
+      then; rooms get their bits in ascending capacity order, so
+      "capacity >= N" is a bisect and results come smallest room first
+    - edits: every teacher, room and class has a slot mask of its
+      bookings, so a lecture-hour is checked in O(1)
+    - bookings are kept per group (semesters.concurrency_key of the row),
+      since groups that never meet may share rooms and teachers: a lookup
+      for a group only sees that group's bookings, a lookup without one
+      sees them all, and an edit is checked against the row's own group
+    """
+
+    def __init__(self, timetable, classrooms, teachers, teacher_availability, qualified=(), group_of=None,
+                 subjects=()):
+        self.rooms = sorted((dict(c) for c in classrooms), key=lambda c: (int(c['capacity'] or 0), c['id']))
+        self.teachers = [dict(t) for t in teachers]
+        self.rows = {}
+        self._caps = [int(c['capacity'] or 0) for c in self.rooms]
+        self._capacity = {c['id']: int(c['capacity'] or 0) for c in self.rooms}
+        self._need = {s['id']: min_capacity(s) for s in subjects}
+        self._room_bit = {c['id']: 1 << i for i, c in enumerate(self.rooms)}
+        self._teacher_bit = {t['id']: 1 << i for i, t in enumerate(self.teachers)}
+
+        # slot -> teachers whose availability covers it
+        self._availability = AvailabilityIndex(teacher_availability, self.teachers)
+        self._available = [0] * NUM_SLOTS
+        for teacher_id, mask in self._availability.masks.items():
+            for slot in iter_slots(mask):
+                self._available[slot] |= self._teacher_bit.get(teacher_id, 0)
+
+        # subject -> teachers assigned to it
+        self._qualified = {}
+        for subject_id, teacher_id in qualified:
+            self._qualified[subject_id] = self._qualified.get(subject_id, 0) | self._teacher_bit.get(teacher_id, 0)
+
+        # group -> (slot -> busy rooms, slot -> busy teachers)
+        self._at = {}
+        # (group, 'teacher' | 'room' | 'class', id) -> slot mask of its bookings
+        self._busy = {}
+        for row in timetable:
+            slot = parse_slot_label(row['timeslot'])
+            if slot is None:
+                continue
+            entry = {
+                'id': row['id'],
+                'subject_id': row['subject_id'],
+                'teacher_id': row['teacher_id'],
+                'classroom_id': row['classroom_id'],
+                'class_id': row['class_id'],
+                'slot': slot,
+                'duration': entry_duration(row),
+                'group': group_of(row) if group_of else None,
+            }
+            self.rows[entry['id']] = entry
+            self._book(entry, True)
+
+    def _keys(self, entry, room_id):
+        group = entry['group']
+        return (group, 'teacher', entry['teacher_id']), (group, 'room', room_id), (group, 'class', entry['class_id'])
+
+    def _book(self, entry, on):
+        hours = block_mask(entry['slot'], entry['duration'])
+        for key in self._keys(entry, entry['classroom_id']):
+            mask = self._busy.get(key, 0)
+            self._busy[key] = mask | hours if on else mask & ~hours
+        room = self._room_bit.get(entry['classroom_id'], 0)
+        teacher = self._teacher_bit.get(entry['teacher_id'], 0)
+        rooms, teachers = self._at.setdefault(entry['group'], ({}, {}))
+        for s in range(entry['slot'], entry['slot'] + entry['duration']):
+            rooms[s] = rooms.get(s, 0) | room if on else rooms.get(s, 0) & ~room
+            teachers[s] = teachers.get(s, 0) | teacher if on else teachers.get(s, 0) & ~teacher
+
+    def _booked_at(self, slot, length, group):
+        if slot is None or length < 1 or slot % HOURS_PER_DAY + length > HOURS_PER_DAY:
+            raise ValueError('The lookup must start at a valid slot and stay within one day')
+        # Groups may overlap each other, so "all groups" is a union taken per
+        # lookup (over a copy: a committed move may be patching the index)
+        booked = list(self._at.values()) if group is None else [self._at.get(group, ({}, {}))]
+        busy_rooms = busy_teachers = 0
+        for rooms, teachers in booked:
+            for s in range(slot, slot + length):
+                busy_rooms |= rooms.get(s, 0)
+                busy_teachers |= teachers.get(s, 0)
+        return busy_rooms, busy_teachers
+
+    def free_rooms(self, slot, length=1, min_capacity=0, group=None):
+        """Rooms seating min_capacity that are free for `length` hours from slot, smallest first."""
+        busy, _ = self._booked_at(slot, length, group)
+        k = bisect_left(self._caps, min_capacity)
+        eligible = ((1 << len(self.rooms)) - 1) >> k << k
+        return [self.rooms[i] for i in iter_slots(eligible & ~busy)]
+
+    def free_teachers(self, slot, length=1, subject_id=None, group=None):
+        """
+        Teachers available and not teaching for `length` hours from slot;
+        with subject_id, only those assigned to teach that subject.
+        """
+        _, busy = self._booked_at(slot, length, group)
+        available = (1 << len(self.teachers)) - 1
+        for s in range(slot, slot + length):
+            available &= self._available[s]
+        if subject_id is not None:
+            available &= self._qualified.get(subject_id, 0)
+        return [self.teachers[i] for i in iter_slots(available & ~busy)]
+
+    def check_moves(self, moves):
+        """
+        Problems with moving timetable rows to new positions all at once,
+        given as [(row id, slot, classroom id)]; an empty list means the
+        moves are valid. The moved rows' current hours count as free, so
+        two lectures can trade places. Each row keeps its duration and
+        must stay within one day, in a room that seats its class, inside
+        its teacher's availability and clear of every other booking.
+        """
+        freed = {}
+        for row_id, _, _ in moves:
+            entry = self.rows[row_id]
+            hours = block_mask(entry['slot'], entry['duration'])
+            for key in self._keys(entry, entry['classroom_id']):
+                freed[key] = freed.get(key, 0) | hours
+
+        problems = []
+        claimed = {}
+        for row_id, slot, room_id in moves:
+            entry = self.rows[row_id]
+            length = entry['duration']
+            if slot is None or slot % HOURS_PER_DAY + length > HOURS_PER_DAY:
+                problems.append(f'Lecture {row_id}: the new slot is not on the timetable grid')
+                continue
+            label = slot_label(slot)
+            if room_id not in self._capacity:
+                problems.append(f'Lecture {row_id}: classroom {room_id} does not exist or is unavailable')
+                continue
+            if self._capacity[room_id] < self._need.get(entry['subject_id'], 0):
+                problems.append(f'Lecture {row_id}: classroom {room_id} is too small')
+            hours = block_mask(slot, length)
+            if not self._availability.is_available(entry['teacher_id'], slot, length):
+                problems.append(f'Lecture {row_id}: the teacher is not available at {label}')
+            for key in self._keys(entry, room_id):
+                if (self._busy.get(key, 0) & ~freed.get(key, 0) | claimed.get(key, 0)) & hours:
+                    problems.append(f'Lecture {row_id}: the {key[1]} is already booked at {label}')
+                claimed[key] = claimed.get(key, 0) | hours
+        return problems
+
+    def apply_moves(self, moves):
+        """Record moves (see check_moves) that were written to the timetable."""
+        for row_id, _, _ in moves:
+            self._book(self.rows[row_id], False)
+        for row_id, slot, room_id in moves:
+            entry = self.rows[row_id]
+            entry['slot'], entry['classroom_id'] = slot, room_id
+            self._book(entry, True)
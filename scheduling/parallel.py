@@ -0,0 +1,69 @@
+# === parallel.py ===
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+def plain(rows):
+    """sqlite3.Row objects do not pickle; workers get plain dicts."""
+    return [dict(r) for r in rows]
+
+
+def run_parallel(fn, tasks, workers=None, deadline=None, initializer=None, initargs=()):
+    """
+    Run fn(*args) for every args tuple in tasks across a process pool and
+    yield (index, result, error) as each one finishes.
+
+    - deadline is a time.monotonic() value; once it passes, tasks that have
+      not started are cancelled and not yielded
+    - fn, initializer and every argument must be picklable
+    - with one worker, or when no pool can be created, tasks run in-process
+      in order (the deadline is checked between tasks)
+    """
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    executor = None
+    if workers > 1:
+        try:
+            # spawn: the web worker may be running other threads, so never fork it
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initializer,
+                initargs=initargs
+            )
+        except (OSError, NotImplementedError, ImportError):
+            executor = None
+
+    if executor is None:
+        if initializer is not None:
+            initializer(*initargs)
+        for index, args in enumerate(tasks):
+            if index and deadline is not None and time.monotonic() > deadline:
+                return
+            try:
+                yield index, fn(*args), None
+            except Exception as e:
+                yield index, None, e
+        return
+
+    try:
+        futures = {executor.submit(fn, *args): index for index, args in enumerate(tasks)}
+        pending = set(futures)
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    # A crashed or broken worker only loses its own task
+                    yield futures[future], None, e
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
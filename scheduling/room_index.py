@@ -0,0 +1,104 @@
+# === room_index.py ===
+
+from bisect import bisect_left, insort
+
+
+def min_capacity(subject):
+    """Seats a lecture needs (use default capacity if num_students not available)."""
+    try:
+        return subject['num_students']
+    except (KeyError, IndexError):
+        return 30  # default to 30 students
+
+
+class RoomIndex:
+    """
+    Persistent room lookup for one solve.
+
+    Every room owns one bit (in classrooms order). Rooms are bucketed by
+    capacity so "capacity >= N" is a bisect plus a precomputed suffix mask,
+    and rooms are grouped by current load so the least-loaded free room is
+    found by walking the few load levels in ascending order. Assigning a
+    room moves its bit to the next level in place; nothing is re-sorted.
+    """
+
+    def __init__(self, classrooms):
+        self.room_ids = [c['id'] for c in classrooms]
+        self.capacity = {c['id']: int(c['capacity'] or 0) for c in classrooms}
+        self.position = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.load = {room_id: 0 for room_id in self.room_ids}
+
+        # Capacity buckets: _at_least[k] holds every room with capacity >= _caps[k]
+        self._caps = sorted(set(self.capacity.values()))
+        by_capacity = {}
+        for room_id, cap in self.capacity.items():
+            by_capacity[cap] = by_capacity.get(cap, 0) | (1 << self.position[room_id])
+        self._at_least = [0] * len(self._caps)
+        running = 0
+        for k in range(len(self._caps) - 1, -1, -1):
+            running |= by_capacity[self._caps[k]]
+            self._at_least[k] = running
+
+        # Load levels: _level[n] holds every room currently carrying n lectures
+        all_rooms = (1 << len(self.room_ids)) - 1
+        self._level = {0: all_rooms} if all_rooms else {}
+        self._levels = [0] if all_rooms else []
+
+        # slot -> rooms busy in that slot
+        self._busy = {}
+
+    def eligible(self, min_capacity):
+        """Mask of rooms that can seat min_capacity students."""
+        k = bisect_left(self._caps, min_capacity)
+        return self._at_least[k] if k < len(self._caps) else 0
+
+    def free(self, slot, eligible, length=1):
+        """Eligible rooms free at slot (for `length` hours from it)."""
+        if length == 1:
+            return eligible & ~self._busy.get(slot, 0)
+        busy = 0
+        for s in range(slot, slot + length):
+            busy |= self._busy.get(s, 0)
+        return eligible & ~busy
+
+    def pick(self, slot, eligible, length=1):
+        """Least-loaded eligible room free at slot (for `length` hours), or None."""
+        free = self.free(slot, eligible, length)
+        if not free:
+            return None
+        for load in self._levels:
+            hit = free & self._level[load]
+            if hit:
+                return self.room_ids[(hit & -hit).bit_length() - 1]
+        return None
+
+    def is_free(self, room_id, slot):
+        return not (self._busy.get(slot, 0) >> self.position[room_id]) & 1
+
+    def assign(self, room_id, slot):
+        bit = 1 << self.position[room_id]
+        self._busy[slot] = self._busy.get(slot, 0) | bit
+        self._move(room_id, bit, 1)
+
+    def release(self, room_id, slot):
+        bit = 1 << self.position[room_id]
+        self._busy[slot] = self._busy.get(slot, 0) & ~bit
+        self._move(room_id, bit, -1)
+
+    def _move(self, room_id, bit, delta):
+        old = self.load[room_id]
+        new = old + delta
+        self.load[room_id] = new
+
+        remaining = self._level[old] & ~bit
+        if remaining:
+            self._level[old] = remaining
+        else:
+            del self._level[old]
+            self._levels.pop(bisect_left(self._levels, old))
+
+        if new in self._level:
+            self._level[new] |= bit
+        else:
+            self._level[new] = bit
+            insort(self._levels, new)
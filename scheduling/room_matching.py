@@ -0,0 +1,95 @@
+# === room_matching.py ===
+
+from collections import deque
+
+
+def room_fits(demand, need, rooms, exclude=0):
+    """
+    Can one more lecture needing `need` seats join a slot that already holds
+    `demand` ({need: count})? Capacities nest, so Hall's condition only has to
+    hold at each distinct need <= need. Rooms in `exclude` are not offered.
+    """
+    for x in [n for n in demand if n <= need] + [need]:
+        wanting = 1 + sum(count for n, count in demand.items() if n >= x)
+        if wanting > bin(rooms.eligible(x) & ~exclude).count('1'):
+            return False
+    return True
+
+
+def hopcroft_karp(adjacency, n_right, match_left=None):
+    """
+    Maximum bipartite matching. adjacency[u] lists the right vertices of left
+    vertex u in preference order; match_left optionally seeds an existing
+    matching. Returns match_left (right vertex or None per left vertex).
+    """
+    n_left = len(adjacency)
+    match_left = list(match_left) if match_left is not None else [None] * n_left
+    match_right = [None] * n_right
+    for u, r in enumerate(match_left):
+        if r is not None:
+            match_right[r] = u
+
+    unreached = n_left + 1
+    while True:
+        # BFS layers from every free left vertex
+        dist = [unreached] * n_left
+        queue = deque()
+        for u in range(n_left):
+            if match_left[u] is None:
+                dist[u] = 0
+                queue.append(u)
+        found = False
+        while queue:
+            u = queue.popleft()
+            for r in adjacency[u]:
+                w = match_right[r]
+                if w is None:
+                    found = True
+                elif dist[w] == unreached:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return match_left
+
+        # DFS along the layers for vertex-disjoint shortest augmenting paths
+        def augment(u):
+            for r in adjacency[u]:
+                w = match_right[r]
+                if w is None or (dist[w] == dist[u] + 1 and augment(w)):
+                    match_left[u] = r
+                    match_right[r] = u
+                    return True
+            dist[u] = unreached
+            return False
+
+        for u in range(n_left):
+            if match_left[u] is None:
+                augment(u)
+
+
+def _room_graph(rooms, needs, exclude=0):
+    """Adjacency for hopcroft_karp: eligible room positions, least-loaded first."""
+    order = sorted(range(len(rooms.room_ids)), key=lambda p: (rooms.load[rooms.room_ids[p]], p))
+    adjacency = []
+    for need in needs:
+        eligible = rooms.eligible(need) & ~exclude
+        adjacency.append([p for p in order if (eligible >> p) & 1])
+    return adjacency
+
+
+def match_rooms(rooms, needs, current=None, exclude=0):
+    """
+    Rooms for lectures sharing one slot. needs[i] is the seat count of
+    lecture i and current[i] its room id so far (or None). Rooms are offered
+    least-loaded first, never those in the `exclude` mask. Returns a room id
+    per lecture, or None when no complete matching exists.
+    """
+    adjacency = _room_graph(rooms, needs, exclude)
+    seed = None
+    if current is not None:
+        seed = [rooms.position.get(room_id) for room_id in current]
+    matched = hopcroft_karp(adjacency, len(rooms.room_ids), seed)
+    if any(p is None for p in matched):
+        return None
+    return [rooms.room_ids[p] for p in matched]
+
@@ -0,0 +1,131 @@
+# === semesters.py ===
+
+from scheduling.annealing import DEFAULT_TIME_BUDGET as DEFAULT_OPTIMISER_BUDGET, improve_schedule
+from scheduling.backtracking import DEFAULT_TIME_BUDGET as DEFAULT_REPAIR_BUDGET, resolve_conflicts
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.parallel import plain, run_parallel
+from scheduling.stats import SolverStats, progress_span
+
+
+def semester_of(row):
+    """Semester label of a subject or timetable row ('' when unset)."""
+    return str(row['semester'] or '')
+
+
+def parse_concurrent_semesters(spec):
+    """
+    "Fall,Summer;Spring" -> [{'Fall', 'Summer'}, {'Spring'}]: semesters
+    listed together run at the same time and share teachers and rooms;
+    semesters in different groups never meet.
+    """
+    groups = []
+    for part in (spec or '').split(';'):
+        group = set(s.strip() for s in part.split(',') if s.strip())
+        if group:
+            groups.append(group)
+    return groups
+
+
+def concurrency_key(semester, concurrent=()):
+    """
+    Semesters with the same key run concurrently; any other pair never
+    meets. Keeping semesters apart is opt-in: those not listed in any
+    `concurrent` group (all of them when it is empty) share the key ''.
+    """
+    for group in concurrent:
+        if semester in group:
+            return ','.join(sorted(group))
+    return ''
+
+
+def _solve_group(solver, semesters, subjects, teachers, classrooms, classes, teacher_availability,
+                 reserved, repair_budget, optimiser_budget, progress=None):
+    stats = SolverStats()
+    schedule, shortages = [], []
+    # Concurrent semesters go one after another so each sees the others' occupancy
+    with stats.phase('solve'):
+        share = 0.4 / len(semesters)
+        for i, semester in enumerate(semesters):
+            rows = [s for s in subjects if semester_of(s) == semester]
+            placed, short = solver(
+                rows, teachers, classrooms, classes, teacher_availability, reserved=reserved + schedule,
+                stats=stats, progress=progress_span(progress, share * i, share * (i + 1))
+            )
+            schedule.extend(placed)
+            shortages.extend(short)
+
+    group_subjects = [s for s in subjects if semester_of(s) in semesters]
+    with stats.phase('conflict_resolution'):
+        schedule, shortages = resolve_conflicts(
+            schedule, group_subjects, teachers, classrooms, classes,
+            teacher_availability=teacher_availability, shortages=shortages,
+            time_budget=repair_budget, reserved=reserved, progress=progress_span(progress, 0.4, 0.7)
+        )
+    with stats.phase('optimise'):
+        schedule = improve_schedule(
+            schedule, group_subjects, teachers, classrooms, teacher_availability,
+            time_budget=optimiser_budget, reserved=reserved, progress=progress_span(progress, 0.7, 1.0)
+        )
+    return schedule, shortages, stats
+
+
+def generate_semester_schedules(subjects, teachers, classrooms, classes, teacher_availability, semesters,
+                                reserved=(), concurrent=(), workers=None,
+                                repair_budget=DEFAULT_REPAIR_BUDGET, optimiser_budget=DEFAULT_OPTIMISER_BUDGET,
+                                stats=None, progress=None, solver=generate_initial_schedule):
+    """
+    Generates the timetable of the given semesters only:
+    - semesters that never run at the same time are solved in parallel
+      workers, each with its own solve (`solver`, one of STRATEGIES), repair
+      and optimiser stages
+    - semesters that run concurrently (see parse_concurrent_semesters) are
+      solved in one worker, one after another, so they share teacher, room
+      and class occupancy
+    - `reserved` holds stored timetable rows (with a 'semester' key) of
+      semesters not being regenerated; each group works around the ones
+      that run concurrently with it and never moves them
+    - `stats` gets every group's counters and phase timings, summed (so
+      timings of parallel groups add up to more than the wall time)
+    - progress follows the stages of a single group, or counts finished
+      groups when they run in parallel
+
+    Returns (schedule, shortages) for the requested semesters.
+    """
+    subjects = plain(subjects)
+    teachers = plain(teachers)
+    classrooms = plain(classrooms)
+    classes = plain(classes)
+    teacher_availability = plain(teacher_availability)
+    reserved = plain(reserved)
+
+    groups = {}
+    for semester in sorted(set(semesters)):
+        groups.setdefault(concurrency_key(semester, concurrent), []).append(semester)
+
+    tasks = []
+    for key, members in sorted(groups.items()):
+        held = [r for r in reserved if concurrency_key(semester_of(r), concurrent) == key]
+        tasks.append((solver, members, subjects, teachers, classrooms, classes, teacher_availability,
+                      held, repair_budget, optimiser_budget))
+
+    results = [None] * len(tasks)
+    if len(tasks) == 1:
+        # Nothing to run in parallel; in-process, the group can report its own progress
+        results[0] = _solve_group(*tasks[0], progress=progress)
+    else:
+        for finished, (index, result, error) in enumerate(run_parallel(_solve_group, tasks, workers), 1):
+            results[index] = result
+            if progress is not None:
+                progress(finished / len(tasks))
+    for index, result in enumerate(results):
+        if result is None:
+            # Lost worker: solve that group here rather than drop it
+            results[index] = _solve_group(*tasks[index])
+
+    schedule, shortages = [], []
+    for group_schedule, group_shortages, group_stats in results:
+        schedule.extend(group_schedule)
+        shortages.extend(group_shortages)
+        if stats is not None:
+            stats.merge(group_stats)
+    return schedule, shortages
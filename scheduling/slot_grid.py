@@ -0,0 +1,164 @@
+# === slot_grid.py ===
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+HOURS_PER_DAY = 24
+NUM_SLOTS = len(DAYS) * HOURS_PER_DAY
+
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+
+
+def slot_index(day, hour):
+    """Slot number for a day name and 24h hour, e.g. ("Mon", 9) -> 9."""
+    return DAY_INDEX[day] * HOURS_PER_DAY + hour
+
+
+def slot_day(slot):
+    return DAYS[slot // HOURS_PER_DAY]
+
+
+def slot_hour(slot):
+    return slot % HOURS_PER_DAY
+
+
+def _render_label(slot):
+    day = slot_day(slot)
+    hour = slot_hour(slot)
+    if hour < 12:
+        return f"{day} {hour}AM"
+    pm_hour = hour - 12 if hour > 12 else 12
+    return f"{day} {pm_hour}PM"
+
+
+# Labels are rendered once at import; the solver only touches integers
+SLOT_LABELS = [_render_label(slot) for slot in range(NUM_SLOTS)]
+LABEL_SLOTS = {label: slot for slot, label in enumerate(SLOT_LABELS)}
+
+
+def slot_label(slot):
+    """Render a slot number as the "Mon 9AM" label stored in timetable."""
+    return SLOT_LABELS[slot]
+
+
+def parse_slot_label(label):
+    """Inverse of slot_label. Returns None for labels outside the grid."""
+    return LABEL_SLOTS.get(label)
+
+
+def hour_range_mask(day, start, end):
+    """Bitmask of the slots [start, end) on one day."""
+    start = max(int(start), 0)
+    end = min(int(end), HOURS_PER_DAY)
+    if day not in DAY_INDEX or end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << slot_index(day, start)
+
+
+def iter_slots(mask):
+    """Yield the set bits of a slot mask in ascending order (Mon first)."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# Teachers without any availability rows get Mon-Fri 9AM-12PM
+FALLBACK_MASK = 0
+for _day in DAYS:
+    FALLBACK_MASK |= hour_range_mask(_day, 9, 12)
+
+
+def block_length(subject):
+    """Consecutive hours one lecture of a subject takes (labs: 2-3); 1 if not set."""
+    try:
+        return max(int(subject['block_length'] or 1), 1)
+    except (KeyError, IndexError):
+        return 1
+
+
+def entry_duration(entry):
+    """Hours a schedule entry or timetable row spans; 1 if not recorded."""
+    try:
+        return max(int(entry['duration'] or 1), 1)
+    except (KeyError, IndexError):
+        return 1
+
+
+def block_mask(slot, length=1):
+    """Bitmask of the `length` slots starting at slot."""
+    return ((1 << length) - 1) << slot
+
+
+# length -> slots a block of that length may start at without running past midnight
+_START_MASKS = {}
+
+
+def block_starts(mask, length):
+    """
+    Start slots of every run of `length` consecutive set bits in mask that
+    stays within one day. Run detection is done on the whole week at once:
+    AND-ing the mask with itself shifted by 1, 2, 4... hours leaves a bit
+    only where that many following bits are set too.
+    """
+    if length <= 1:
+        return mask
+    if length not in _START_MASKS:
+        starts = 0
+        for day in DAYS:
+            starts |= hour_range_mask(day, 0, HOURS_PER_DAY - length + 1)
+        _START_MASKS[length] = starts
+    run, covered = mask, 1
+    while covered < length:
+        step = min(covered, length - covered)
+        run &= run >> step
+        covered += step
+    return run & _START_MASKS[length]
+
+
+def build_availability_masks(teacher_availability, teachers):
+    """
+    Collapse teacher_availability rows into one slot mask per teacher.
+    Overlapping or duplicate rows simply OR together.
+    """
+    masks = {}
+    for row in teacher_availability:
+        t_id = row['teacher_id']
+        masks[t_id] = masks.get(t_id, 0) | hour_range_mask(row['day'], row['start_hour'], row['end_hour'])
+
+    for t in teachers:
+        if t['id'] not in masks:
+            masks[t['id']] = FALLBACK_MASK
+    return masks
+
+
+class SlotGrid:
+    """
+    Occupancy of every teacher, room and class as an integer bitmask,
+    one bit per slot.
+    """
+
+    def __init__(self):
+        self.teacher = {}
+        self.room = {}
+        self.klass = {}
+
+    def busy(self, teacher_id, room_id, class_id):
+        return self.teacher.get(teacher_id, 0) | self.room.get(room_id, 0) | self.klass.get(class_id, 0)
+
+    def is_free(self, teacher_id, room_id, class_id, slot):
+        return not (self.busy(teacher_id, room_id, class_id) >> slot) & 1
+
+    def free_slots(self, teacher_id, class_id, candidates):
+        """Candidate slots where both the teacher and the class are idle."""
+        return candidates & ~(self.teacher.get(teacher_id, 0) | self.klass.get(class_id, 0))
+
+    def occupy(self, teacher_id, room_id, class_id, slot, length=1):
+        bit = block_mask(slot, length)
+        self.teacher[teacher_id] = self.teacher.get(teacher_id, 0) | bit
+        self.room[room_id] = self.room.get(room_id, 0) | bit
+        self.klass[class_id] = self.klass.get(class_id, 0) | bit
+
+    def release(self, teacher_id, room_id, class_id, slot, length=1):
+        bit = ~block_mask(slot, length)
+        self.teacher[teacher_id] = self.teacher.get(teacher_id, 0) & bit
+        self.room[room_id] = self.room.get(room_id, 0) & bit
+        self.klass[class_id] = self.klass.get(class_id, 0) & bit
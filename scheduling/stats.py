@@ -0,0 +1,57 @@
+# === stats.py ===
+
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class SolverStats:
+    """
+    Counters and per-phase timings of one generation run. Solvers take an
+    optional `stats` and record into it; without one they skip the work.
+    - counters: name -> int (slots tried, room checks, rejections by reason)
+    - timings: phase -> seconds; a phase entered twice accumulates
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def merge(self, other):
+        """Add another run's counters and timings (e.g. one a worker process sent back)."""
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'timings': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+        }
+
+
+def phase(stats, name):
+    """stats.phase(name), or a no-op when there is no stats object."""
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def progress_span(progress, start, end):
+    """
+    Solvers take an optional progress(fraction) callback, called with 0..1
+    as they go. This maps a sub-stage's 0..1 onto start..end of progress
+    (None stays None).
+    """
+    if progress is None:
+        return None
+    return lambda fraction: progress(start + (end - start) * fraction)
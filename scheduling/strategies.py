@@ -0,0 +1,14 @@
+# === strategies.py ===
+
+from scheduling.decomposition import generate_decomposed_schedule
+from scheduling.graph_coloring import generate_dsatur_schedule, generate_initial_schedule
+from scheduling.multistart import generate_multistart_schedule
+
+# Selectable solver strategies, all with the generate_initial_schedule signature
+# (including the optional `reserved`, `stats` and `progress` keywords)
+STRATEGIES = {
+    'greedy': generate_initial_schedule,
+    'dsatur': generate_dsatur_schedule,
+    'multistart': generate_multistart_schedule,
+    'decomposed': generate_decomposed_schedule,
+}
@@ -0,0 +1,211 @@
+# === whatif.py ===
+
+import threading
+from collections import Counter
+
+from scheduling.availability import mask_intervals, validate_interval
+from scheduling.backtracking import DEFAULT_TIME_BUDGET, resolve_conflicts
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.incremental import reschedule
+from scheduling.semesters import concurrency_key, generate_semester_schedules, semester_of
+from scheduling.slot_grid import (
+    FALLBACK_MASK, build_availability_masks, entry_duration, hour_range_mask, parse_slot_label
+)
+
+MODES = ('incremental', 'full')
+
+
+class InputCache:
+    """
+    One loaded copy of the solver inputs and live timetable, reused by
+    successive what-ifs until the database's inputs version changes. A
+    version of None (not tracked) never matches, so it always reloads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._inputs = None
+
+    def get(self, version, load):
+        """(inputs, reused): load() is only called when the version moved on."""
+        with self._lock:
+            if self._inputs is not None and version is not None and version == self._version:
+                return self._inputs, True
+            self._inputs = load()
+            self._version = version
+            return self._inputs, False
+
+    def patch(self, version, new_version, apply):
+        """
+        Bring the copy loaded at `version` up to new_version by calling
+        apply(inputs) on it, for a change the caller has committed. If the
+        copy is from another version it is left alone and the next get()
+        reloads it. Returns whether the copy was patched.
+        """
+        with self._lock:
+            if self._inputs is None or self._version is None or self._version != version:
+                return False
+            apply(self._inputs)
+            self._version = new_version
+            return True
+
+
+def _ids(value, name):
+    try:
+        return [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a list of ids')
+
+
+def _id_map(value, name):
+    try:
+        return {int(k): int(v) for k, v in dict(value).items()}
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must map ids to whole numbers')
+
+
+def apply_overrides(subjects, teachers, classrooms, classes, teacher_availability, overrides):
+    """
+    Copy of the inputs with what-if overrides applied; the originals are
+    not touched, so cached inputs can be reused:
+    - close_rooms: [classroom_id] taken out of the room pool
+    - room_capacity: {classroom_id: seats}
+    - num_lectures: {subject_id: lectures per week}
+    - teacher_unavailable: [{teacher_id, day, start_hour, end_hour}] hours
+      taken out of a teacher's availability (no day: the whole week, no
+      hours: the whole day)
+    Raises ValueError on unknown ids or malformed values.
+    """
+    room_ids = set(c['id'] for c in classrooms)
+    subject_ids = set(s['id'] for s in subjects)
+    teacher_ids = set(t['id'] for t in teachers)
+
+    closed = set(_ids(overrides.get('close_rooms', []), 'close_rooms'))
+    capacity = _id_map(overrides.get('room_capacity', {}), 'room_capacity')
+    lectures = _id_map(overrides.get('num_lectures', {}), 'num_lectures')
+    for room_id in closed | set(capacity):
+        if room_id not in room_ids:
+            raise ValueError(f'Unknown or unavailable classroom: {room_id}')
+    for subject_id, n in lectures.items():
+        if subject_id not in subject_ids:
+            raise ValueError(f'Unknown or unassigned subject: {subject_id}')
+        if n < 0:
+            raise ValueError('num_lectures cannot be negative')
+
+    removed = {}
+    for block in overrides.get('teacher_unavailable', []):
+        try:
+            teacher_id = int(block['teacher_id'])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError('teacher_unavailable entries need a teacher_id')
+        if teacher_id not in teacher_ids:
+            raise ValueError(f'Unknown teacher: {teacher_id}')
+        if block.get('day') is None:
+            mask = ~0
+        else:
+            day, start, end = validate_interval(block['day'], block.get('start_hour', 0), block.get('end_hour', 24))
+            mask = hour_range_mask(day, start, end)
+        removed[teacher_id] = removed.get(teacher_id, 0) | mask
+
+    classrooms = [
+        dict(c, capacity=capacity.get(c['id'], c['capacity'])) if c['id'] in capacity else c
+        for c in classrooms if c['id'] not in closed
+    ]
+    subjects = [
+        dict(s, num_lectures=lectures[s['id']]) if s['id'] in lectures else s
+        for s in subjects
+    ]
+    if removed:
+        masks = build_availability_masks(teacher_availability, teachers)
+        teacher_availability = [a for a in teacher_availability if a['teacher_id'] not in removed]
+        for teacher_id, mask in removed.items():
+            left = mask_intervals(masks.get(teacher_id, FALLBACK_MASK) & ~mask)
+            # An empty range keeps a teacher with no hours left from falling back to the default window
+            for day, start, end in left or [('Mon', 0, 0)]:
+                teacher_availability.append({'teacher_id': teacher_id, 'day': day, 'start_hour': start, 'end_hour': end})
+    return subjects, teachers, classrooms, classes, teacher_availability
+
+
+def solve_whatif(subjects, teachers, classrooms, classes, teacher_availability, live,
+                 mode='incremental', group_of=None, time_budget=DEFAULT_TIME_BUDGET, concurrent=()):
+    """
+    (proposed timetable, shortages) for the given inputs:
+    - incremental: keep every live row that is still valid and place only
+      the lectures that lost their slot, as an edit would
+    - full: solve from scratch (greedy, then conflict repair); semesters in
+      different `concurrent` groups are solved apart, as a real generation
+      does (see generate_semester_schedules)
+    """
+    if mode == 'incremental':
+        dropped, added, shortages = reschedule(
+            live, subjects, teachers, classrooms, classes, teacher_availability, group_of=group_of
+        )
+        dropped_ids = set(entry['id'] for entry in dropped)
+        return [entry for entry in live if entry['id'] not in dropped_ids] + added, shortages
+
+    semesters = sorted(set(semester_of(s) for s in subjects))
+    if len(set(concurrency_key(s, concurrent) for s in semesters)) > 1:
+        # No optimiser pass, as below: it only improves soft goals the diff does not show
+        return generate_semester_schedules(
+            subjects, teachers, classrooms, classes, teacher_availability, semesters,
+            concurrent=concurrent, repair_budget=time_budget, optimiser_budget=0
+        )
+    schedule, shortages = generate_initial_schedule(subjects, teachers, classrooms, classes, teacher_availability)
+    return resolve_conflicts(
+        schedule, subjects, teachers, classrooms, classes,
+        teacher_availability=teacher_availability, shortages=shortages, time_budget=time_budget
+    )
+
+
+def _lecture(entry):
+    return {
+        'subject_id': entry['subject_id'],
+        'teacher_id': entry['teacher_id'],
+        'class_id': entry['class_id'],
+        'timeslot': entry['timeslot'],
+        'duration': entry_duration(entry),
+        'classroom_id': entry['classroom_id'],
+    }
+
+
+def diff_timetables(live, proposed):
+    """
+    Compare two timetables lecture by lecture (same subject, teacher and
+    class). Lectures at the same slot and room in both are unchanged; the
+    rest are paired up in slot order as moved, and the leftovers are
+    added (only in proposed) or removed (only in live).
+    """
+    def positions(entries):
+        by_key = {}
+        for entry in entries:
+            key = (entry['subject_id'], entry['teacher_id'], entry['class_id'])
+            slot = parse_slot_label(entry['timeslot'])
+            by_key.setdefault(key, []).append((slot if slot is not None else -1, entry['classroom_id'], entry))
+        return by_key
+
+    before, after = positions(live), positions(proposed)
+    moved, added, removed = [], [], []
+    unchanged = 0
+    for key in list(before) + [k for k in after if k not in before]:
+        old, new = before.get(key, []), after.get(key, [])
+        same = Counter(p[:2] for p in old) & Counter(p[:2] for p in new)
+        unchanged += sum(same.values())
+        old, new = _without(old, same), _without(new, same)
+        for (_, _, a), (_, _, b) in zip(old, new):
+            moved.append(dict(_lecture(a), to={'timeslot': b['timeslot'], 'classroom_id': b['classroom_id']}))
+        removed.extend(_lecture(p[2]) for p in old[len(new):])
+        added.extend(_lecture(p[2]) for p in new[len(old):])
+    return {'unchanged': unchanged, 'moved': moved, 'added': added, 'removed': removed}
+
+
+def _without(positions, counts):
+    """positions in slot order, minus counts[(slot, room)] of each position."""
+    counts = Counter(counts)
+    out = []
+    for p in sorted(positions, key=lambda p: p[:2]):
+        if counts[p[:2]]:
+            counts[p[:2]] -= 1
+        else:
+            out.append(p)
+    return out
@@ -0,0 +1,46 @@
+from scheduling.room_index import min_capacity
+from scheduling.slot_grid import block_length, block_mask, build_availability_masks, entry_duration, parse_slot_label
+
+
+def hours(entry):
+    return block_mask(parse_slot_label(entry['timeslot']), entry_duration(entry))
+
+
+def clashes(entries):
+    """Hours booked twice for the same teacher, room or class."""
+    found = []
+    for field in ('teacher_id', 'classroom_id', 'class_id'):
+        busy = {}
+        for entry in entries:
+            held = busy.get(entry[field], 0)
+            if held & hours(entry):
+                found.append((field, entry[field], entry['timeslot']))
+            busy[entry[field]] = held | hours(entry)
+    return found
+
+
+def check_schedule(schedule, shortages, instance):
+    """
+    Hard constraints of a solver result: no clash, every lecture inside its
+    teacher's availability in a room that seats it, placed + missing equal
+    to num_lectures for every subject.
+    """
+    subjects, teachers, classrooms, _, teacher_availability = instance
+    by_id = {s['id']: s for s in subjects}
+    capacity = {c['id']: c['capacity'] for c in classrooms}
+    availability = build_availability_masks(teacher_availability, teachers)
+
+    assert clashes(schedule) == []
+    placed = {}
+    for entry in schedule:
+        subject = by_id[entry['subject_id']]
+        assert entry['teacher_id'] == subject['teacher_id']
+        assert entry['class_id'] == subject['class_id']
+        assert entry_duration(entry) == block_length(subject)
+        assert availability[entry['teacher_id']] & hours(entry) == hours(entry), entry
+        assert capacity[entry['classroom_id']] >= min_capacity(subject), entry
+        placed[subject['id']] = placed.get(subject['id'], 0) + 1
+
+    missing = {s['subject_id']: s['needed'] - s['assigned'] for s in shortages}
+    for subject in subjects:
+        assert placed.get(subject['id'], 0) + missing.get(subject['id'], 0) == subject['num_lectures']
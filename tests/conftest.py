@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, fully migrated database in tmp_path, opened the way the app opens it."""
+    import app
+    monkeypatch.setattr(app, 'DB_PATH', str(tmp_path / 'timelybuddy.db'))
+    app.schema_checked.clear()
+    conn = app.open_db_connection()
+    yield conn
+    conn.close()
+    app.schema_checked.clear()
+
+
+@pytest.fixture
+def admin(db):
+    """A test client logged in as an admin of the db fixture's database."""
+    import app
+    db.execute('''
+        INSERT INTO users (username, email, password_hash, role, full_name)
+        VALUES ('admin', 'admin@example.com', ?, 'admin', 'Admin')
+    ''', (app.hash_password('secret'),))
+    db.commit()
+    client = app.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def instance():
+    """
+    A small fixed institution in the shape the solvers take: a lab that
+    needs 2-hour blocks, a class too big for most rooms, teachers with and
+    without availability rows.
+    """
+    teachers = [{'id': t} for t in (1, 2, 3, 4)]
+    classrooms = [
+        {'id': 1, 'name': 'R1', 'capacity': 30},
+        {'id': 2, 'name': 'R2', 'capacity': 60},
+        {'id': 3, 'name': 'R3', 'capacity': 40},
+    ]
+    classes = [{'id': c, 'capacity': 30} for c in (1, 2, 3)]
+    teacher_availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 13},
+        {'teacher_id': 1, 'day': 'Tue', 'start_hour': 9, 'end_hour': 13},
+        {'teacher_id': 2, 'day': 'Wed', 'start_hour': 10, 'end_hour': 16},
+        {'teacher_id': 2, 'day': 'Thu', 'start_hour': 14, 'end_hour': 17},
+        {'teacher_id': 4, 'day': 'Fri', 'start_hour': 9, 'end_hour': 15},
+    ]
+    subjects = [
+        {'id': 1, 'name': 'Maths', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 3, 'num_students': 30},
+        {'id': 2, 'name': 'Physics', 'teacher_id': 1, 'class_id': 2, 'num_lectures': 2, 'num_students': 30},
+        {'id': 3, 'name': 'Physics Lab', 'teacher_id': 2, 'class_id': 2, 'num_lectures': 2, 'num_students': 30,
+         'block_length': 2},
+        {'id': 4, 'name': 'Lecture Hall', 'teacher_id': 2, 'class_id': 3, 'num_lectures': 2, 'num_students': 55},
+        {'id': 5, 'name': 'History', 'teacher_id': 3, 'class_id': 1, 'num_lectures': 3, 'num_students': 30},
+        {'id': 6, 'name': 'Chemistry', 'teacher_id': 4, 'class_id': 3, 'num_lectures': 4, 'num_students': 35},
+        {'id': 7, 'name': 'Biology', 'teacher_id': 3, 'class_id': 2, 'num_lectures': 2, 'num_students': 30},
+    ]
+    return subjects, teachers, classrooms, classes, teacher_availability
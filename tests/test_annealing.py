@@ -0,0 +1,76 @@
+import time
+
+from checks import check_schedule, clashes, hours
+from scheduling.annealing import DEFAULT_WEIGHTS, _Annealer, _gaps, _Lecture, improve_schedule
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.slot_grid import HOURS_PER_DAY
+
+DAY = (1 << HOURS_PER_DAY) - 1
+
+
+def objective(schedule, blocked=()):
+    """The annealer's soft objective, recomputed from scratch."""
+    w = DEFAULT_WEIGHTS
+    per_day, room_load, teacher, klass = {}, {}, {}, {}
+    for entry in schedule:
+        day = hours(entry).bit_length() // HOURS_PER_DAY
+        key = (entry['subject_id'], entry['class_id'], day)
+        per_day[key] = per_day.get(key, 0) + 1
+        room_load[entry['classroom_id']] = room_load.get(entry['classroom_id'], 0) + 1
+    for entry in list(schedule) + list(blocked):
+        teacher[entry['teacher_id']] = teacher.get(entry['teacher_id'], 0) | hours(entry)
+        klass[entry['class_id']] = klass.get(entry['class_id'], 0) | hours(entry)
+    gaps = lambda masks: sum(_gaps((m >> (d * HOURS_PER_DAY)) & DAY) for m in masks.values() for d in range(5))
+    return (w['spread'] * sum(n * (n - 1) / 2 for n in per_day.values())
+            + w['teacher_gaps'] * gaps(teacher) + w['class_gaps'] * gaps(klass)
+            + w['room_balance'] * sum(n * n for n in room_load.values()))
+
+
+def test_result_is_valid_and_never_worse(instance):
+    schedule, shortages = generate_initial_schedule(*instance)
+    subjects, teachers, classrooms, _, availability = instance
+    improved = improve_schedule(schedule, subjects, teachers, classrooms, availability, time_budget=0.3)
+    check_schedule(improved, shortages, instance)
+    assert objective(improved) <= objective(schedule)
+
+
+def test_reserved_entries_are_worked_around(instance):
+    subjects, teachers, classrooms, _, availability = instance
+    # Another semester holds teacher 1 and class 1 at Mon 11AM, and room 2 at Fri 10AM
+    reserved = [
+        {'subject_id': 99, 'teacher_id': 1, 'classroom_id': 3, 'class_id': 1, 'timeslot': 'Mon 11AM'},
+        {'subject_id': 98, 'teacher_id': 9, 'classroom_id': 2, 'class_id': 9, 'timeslot': 'Fri 10AM'},
+    ]
+    schedule, shortages = generate_initial_schedule(*instance, reserved=reserved)
+    improved = improve_schedule(schedule, subjects, teachers, classrooms, availability, time_budget=0.3,
+                                reserved=reserved)
+    check_schedule(improved, shortages, instance)
+    assert clashes(improved + reserved) == []
+    assert objective(improved, reserved) <= objective(schedule, reserved)
+
+
+def test_starting_cost_counts_fixed_entries():
+    # Teacher 1 and class 1 are held at Tue 12PM; a lecture at Tue 9AM opens a 2-hour gap for both
+    blocked = [{'subject_id': 9, 'teacher_id': 1, 'classroom_id': 2, 'class_id': 1, 'timeslot': 'Tue 12PM'}]
+    entry = {'subject_id': 1, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Tue 9AM'}
+    slot = hours(entry).bit_length() - 1
+    lecture = _Lecture((1, 1, 1), 1, 1, slot, 1, [slot], 1 << slot, [1], 0)
+    state = _Annealer([lecture], {1: 30, 2: 30}, DEFAULT_WEIGHTS, blocked)
+    assert state.cost == objective([entry], blocked) - objective([], blocked) == 4.1
+
+
+def test_stops_early_when_nothing_can_move():
+    # One lecture whose teacher has a single available hour
+    subjects = [{'id': 1, 'teacher_id': 1, 'class_id': 1, 'num_lectures': 1, 'num_students': 20}]
+    availability = [{'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10}]
+    schedule = [{'subject_id': 1, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Mon 9AM'}]
+    started = time.perf_counter()
+    improved = improve_schedule(schedule, subjects, [{'id': 1}], [{'id': 1, 'capacity': 30}], availability,
+                                time_budget=30)
+    assert time.perf_counter() - started < 5
+    assert [e['timeslot'] for e in improved] == ['Mon 9AM']
+
+
+def test_no_movable_lectures_returns_the_input():
+    schedule = [{'subject_id': 7, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Mon 9AM'}]
+    assert improve_schedule(schedule, [], [{'id': 1}], [{'id': 1, 'capacity': 30}], [], time_budget=30) == schedule
@@ -0,0 +1,94 @@
+import pytest
+
+from scheduling.availability import AvailabilityIndex, mask_intervals, merged_rows, validate_interval
+from scheduling.slot_grid import hour_range_mask, parse_slot_label
+
+
+def window(day, start, end):
+    return {'teacher_id': 1, 'day': day, 'start_hour': start, 'end_hour': end}
+
+
+def test_overlapping_touching_and_duplicate_rows_merge():
+    rows = [window('Tue', 9, 11), window('Mon', 14, 16), window('Mon', 9, 11), window('Mon', 10, 12),
+            window('Mon', 12, 13), window('Mon', 9, 11)]
+    assert merged_rows(rows) == [('Mon', 9, 13), ('Mon', 14, 16), ('Tue', 9, 11)]
+
+
+def test_intervals_round_trip_a_mask():
+    mask = hour_range_mask('Wed', 8, 10) | hour_range_mask('Wed', 13, 17) | hour_range_mask('Fri', 0, 24)
+    assert mask_intervals(mask) == [('Wed', 8, 10), ('Wed', 13, 17), ('Fri', 0, 24)]
+
+
+def test_index_lookups():
+    index = AvailabilityIndex([window('Mon', 9, 11), window('Mon', 10, 12)], [{'id': 1}, {'id': 2}])
+    mon_9 = parse_slot_label('Mon 9AM')
+    assert index.is_available(1, mon_9, 3)
+    assert not index.is_available(1, mon_9, 4)
+    assert index.intervals(1) == [('Mon', 9, 12)]
+    # No rows: the solvers' default Mon-Fri 9AM-12PM window
+    assert index.intervals(2) == index.intervals(3)
+    assert index.intervals(3)[0] == ('Mon', 9, 12)
+
+
+@pytest.mark.parametrize('interval', [('Sun', 9, 10), ('Mon', 'nine', 10), ('Mon', 10, 10), ('Mon', 20, 25)])
+def test_invalid_intervals_are_rejected(interval):
+    with pytest.raises(ValueError):
+        validate_interval(*interval)
+
+
+def add_teacher(db):
+    db.execute('INSERT INTO teachers (id) VALUES (1)')
+    db.commit()
+
+
+def stored(db):
+    return [tuple(r) for r in db.execute(
+        'SELECT day, start_hour, end_hour FROM teacher_availability WHERE teacher_id = 1 ORDER BY day, start_hour'
+    )]
+
+
+def test_add_availability_merges_on_write(db, admin):
+    add_teacher(db)
+    for start, end in ((9, 11), (10, 12), (12, 14), (16, 17)):
+        admin.post('/add_availability', data={'teacher_id': 1, 'day': 'Mon', 'start_hour': start, 'end_hour': end})
+    assert stored(db) == [('Mon', 9, 14), ('Mon', 16, 17)]
+
+
+def test_bulk_replace_and_read_back(db, admin):
+    add_teacher(db)
+    admin.post('/add_availability', data={'teacher_id': 1, 'day': 'Fri', 'start_hour': 9, 'end_hour': 10})
+    response = admin.post('/teacher_availability/1', json={'availability': [
+        {'day': 'Tue', 'start_hour': 13, 'end_hour': 15},
+        {'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+        {'day': 'Mon', 'start_hour': 11, 'end_hour': 12},
+    ]})
+    assert response.status_code == 200
+    assert stored(db) == [('Mon', 9, 12), ('Tue', 13, 15)]
+    assert admin.get('/teacher_availability/1').get_json()['availability'] == [
+        {'day': 'Mon', 'start_hour': 9, 'end_hour': 12},
+        {'day': 'Tue', 'start_hour': 13, 'end_hour': 15},
+    ]
+
+
+def test_read_without_rows_shows_the_default_window(db, admin):
+    add_teacher(db)
+    body = admin.get('/teacher_availability/1').get_json()
+    assert body['default'] is True
+    assert body['availability'][0] == {'day': 'Mon', 'start_hour': 9, 'end_hour': 12}
+
+
+@pytest.mark.parametrize('body', [
+    [],
+    {'availability': []},
+    {'availability': [{'day': 'Mon', 'start_hour': 12, 'end_hour': 9}]},
+    {'availability': ['Mon 9-12']},
+])
+def test_bulk_replace_rejects_bad_bodies(db, admin, body):
+    add_teacher(db)
+    admin.post('/add_availability', data={'teacher_id': 1, 'day': 'Fri', 'start_hour': 9, 'end_hour': 10})
+    assert admin.post('/teacher_availability/1', json=body).status_code == 400
+    assert stored(db) == [('Fri', 9, 10)]
+
+
+def test_unknown_teacher_is_404(db, admin):
+    assert admin.get('/teacher_availability/7').status_code == 404
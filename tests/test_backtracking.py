@@ -0,0 +1,87 @@
+import time
+
+from checks import check_schedule, clashes
+from scheduling.backtracking import resolve_conflicts
+from scheduling.graph_coloring import generate_initial_schedule
+
+TEACHERS = [{'id': 1}, {'id': 2}]
+CLASSROOMS = [{'id': 1, 'name': 'R1', 'capacity': 30}]
+CLASSES = [{'id': 1, 'capacity': 30}]
+
+
+def subject(subject_id, teacher_id, num_lectures=1):
+    return {'id': subject_id, 'name': f'S{subject_id}', 'teacher_id': teacher_id, 'class_id': 1,
+            'num_lectures': num_lectures, 'num_students': 30}
+
+
+def test_repair_moves_a_lecture_to_make_room():
+    # Greedy gives teacher 1 Mon 9AM, the only hour teacher 2 can teach
+    subjects = [subject(1, 1), subject(2, 2)]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+    ]
+    instance = (subjects, TEACHERS, CLASSROOMS, CLASSES, availability)
+    schedule, shortages = generate_initial_schedule(*instance)
+    assert shortages
+
+    repaired, left = resolve_conflicts(schedule, *instance[:4], teacher_availability=availability,
+                                       shortages=shortages, time_budget=5)
+    assert left == []
+    check_schedule(repaired, left, instance)
+    assert {(e['subject_id'], e['timeslot']) for e in repaired} == {(1, 'Mon 10AM'), (2, 'Mon 9AM')}
+
+
+def test_impossible_shortage_is_reported():
+    # Both teachers can only teach the one class at Mon 9AM
+    subjects = [subject(1, 1), subject(2, 2)]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+    ]
+    instance = (subjects, TEACHERS, CLASSROOMS, CLASSES, availability)
+    schedule, shortages = generate_initial_schedule(*instance)
+
+    repaired, left = resolve_conflicts(schedule, *instance[:4], teacher_availability=availability,
+                                       shortages=shortages, time_budget=5)
+    assert sum(s['needed'] - s['assigned'] for s in left) == 1
+    check_schedule(repaired, left, instance)
+
+
+def test_reserved_entries_are_never_moved():
+    subjects = [subject(1, 1), subject(2, 2)]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+    ]
+    # Another semester holds the room at Mon 10AM
+    reserved = [{'subject_id': 9, 'teacher_id': 3, 'classroom_id': 1, 'class_id': 2, 'timeslot': 'Mon 10AM'}]
+    instance = (subjects, TEACHERS, CLASSROOMS, CLASSES, availability)
+    schedule, shortages = generate_initial_schedule(*instance, reserved=reserved)
+
+    repaired, left = resolve_conflicts(schedule, *instance[:4], teacher_availability=availability,
+                                       shortages=shortages, time_budget=5, reserved=reserved)
+    assert len(left) == 1
+    assert clashes(repaired + reserved) == []
+    assert all(e['subject_id'] != 9 for e in repaired)
+
+
+def test_time_budget_is_respected():
+    # Far more lectures than hours: the search could go on for a long time
+    subjects = [subject(1, 1, 20), subject(2, 2, 20)]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 17},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 17},
+    ]
+    instance = (subjects, TEACHERS, CLASSROOMS, CLASSES, availability)
+    schedule, shortages = generate_initial_schedule(*instance)
+    started = time.perf_counter()
+    repaired, left = resolve_conflicts(schedule, *instance[:4], teacher_availability=availability,
+                                       shortages=shortages, time_budget=0.05)
+    assert time.perf_counter() - started < 1.0
+    check_schedule(repaired, left, instance)
+
+
+def test_nothing_to_repair_returns_the_input(instance):
+    schedule, shortages = generate_initial_schedule(*instance)
+    assert resolve_conflicts(schedule, *instance[:4], teacher_availability=instance[4], shortages=[]) == (schedule, [])
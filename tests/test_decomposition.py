@@ -0,0 +1,55 @@
+from checks import check_schedule
+from scheduling.decomposition import (apportion_rooms, generate_decomposed_schedule, pack_components,
+                                      sharing_components)
+
+
+def row(teacher_id, class_id, num_lectures=2, num_students=30):
+    return {'id': teacher_id * 10 + class_id, 'name': f'S{teacher_id}-{class_id}', 'teacher_id': teacher_id,
+            'class_id': class_id, 'num_lectures': num_lectures, 'num_students': num_students}
+
+
+def test_components_follow_shared_teachers_and_classes():
+    # 1-2 share a teacher, 2-3 share a class; row 4 shares nothing
+    subjects = [row(1, 1), row(1, 2), row(2, 2), row(3, 3)]
+    assert sharing_components(subjects) == [[0, 1, 2], [3]]
+
+
+def test_packing_balances_lectures_over_buckets():
+    subjects = [row(1, 1, 5), row(2, 2, 3), row(3, 3, 2), row(4, 4, 1)]
+    buckets = pack_components(sharing_components(subjects), subjects, 2)
+    loads = sorted(sum(subjects[i]['num_lectures'] for i in bucket) for bucket in buckets)
+    assert loads == [5, 6]
+    assert sorted(i for bucket in buckets for i in bucket) == [0, 1, 2, 3]
+
+
+def test_room_shares_are_disjoint_and_seat_each_bucket():
+    subjects = [row(1, 1, num_students=55), row(2, 2)]
+    rooms = [{'id': 1, 'capacity': 30}, {'id': 2, 'capacity': 60}, {'id': 3, 'capacity': 40}]
+    buckets = [[0], [1]]
+    shares = apportion_rooms(buckets, subjects, rooms)
+    ids = [room['id'] for share in shares for room in share]
+    assert sorted(ids) == [1, 2, 3]
+    assert any(room['capacity'] >= 55 for room in shares[0])
+
+
+def test_decomposed_result_is_valid(instance):
+    schedule, shortages = generate_decomposed_schedule(*instance, workers=2)
+    check_schedule(schedule, shortages, instance)
+
+
+def test_spill_pass_uses_the_whole_room_pool():
+    # Department 1 needs two rooms at Mon 9AM but its share is one room;
+    # department 2 only teaches in the afternoon, so its room is free then
+    subjects = [row(1, 1, 1), row(2, 2, 1), row(1, 2, 1), row(3, 3, 1)]
+    teachers = [{'id': 1}, {'id': 2}, {'id': 3}]
+    rooms = [{'id': 1, 'capacity': 30}, {'id': 2, 'capacity': 30}]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+        {'teacher_id': 3, 'day': 'Mon', 'start_hour': 14, 'end_hour': 16},
+    ]
+    instance = (subjects, teachers, rooms, [{'id': c} for c in (1, 2, 3)], availability)
+    assert len(pack_components(sharing_components(subjects), subjects, 2)) == 2
+    schedule, shortages = generate_decomposed_schedule(*instance, workers=2)
+    check_schedule(schedule, shortages, instance)
+    assert shortages == []
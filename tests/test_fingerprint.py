@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import app
+from jobs import Job
+from scheduling.fingerprint import input_fingerprint
+
+
+def fingerprint(instance, strategy='greedy', concurrent=()):
+    subjects, *rest = instance
+    # Subject rows from the database always carry a semester column
+    return input_fingerprint([dict(s, semester=s.get('semester')) for s in subjects], *rest, strategy, concurrent)
+
+
+def test_row_order_does_not_matter(instance):
+    shuffled = tuple(list(reversed(rows)) for rows in instance)
+    assert fingerprint(shuffled) == fingerprint(instance)
+
+
+def test_split_availability_rows_do_not_matter(instance):
+    subjects, teachers, classrooms, classes, availability = instance
+    # Mon 9-13 for teacher 1 as two overlapping rows
+    split = [{'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 11},
+             {'teacher_id': 1, 'day': 'Mon', 'start_hour': 10, 'end_hour': 13}] + availability[1:]
+    assert fingerprint((subjects, teachers, classrooms, classes, split)) == fingerprint(instance)
+
+
+def test_strategy_changes_the_hash(instance):
+    assert fingerprint(instance, 'greedy') != fingerprint(instance, 'dsatur')
+
+
+@pytest.mark.parametrize('edit', [
+    lambda s, r, a: s[0].update(num_lectures=4),
+    lambda s, r, a: s[1].update(num_students=45),
+    lambda s, r, a: r[0].update(capacity=25),
+    lambda s, r, a: a[0].update(end_hour=12),
+])
+def test_input_edits_change_the_hash(instance, edit):
+    before = fingerprint(instance)
+    subjects, teachers, classrooms, classes, availability = instance
+    edit(subjects, classrooms, availability)
+    assert fingerprint(instance) != before
+
+
+def seed(conn):
+    conn.executemany('INSERT INTO teachers (id) VALUES (?)', [(1,), (2,)])
+    conn.executemany('INSERT INTO classes (id, name) VALUES (?, ?)', [(1, 'A'), (2, 'B')])
+    conn.executemany('INSERT INTO classrooms (id, name, capacity) VALUES (?, ?, 30)', [(1, 'R1'), (2, 'R2')])
+    conn.executemany('INSERT INTO subjects (id, name, num_lectures) VALUES (?, ?, ?)',
+                     [(1, 'Maths', 3), (2, 'History', 2)])
+    conn.executemany('INSERT INTO teacher_subject_class (teacher_id, subject_id, class_id) VALUES (?, ?, ?)',
+                     [(1, 1, 1), (2, 2, 2)])
+    conn.commit()
+
+
+def run_job(conn, params):
+    job_id = conn.execute(
+        "INSERT INTO generation_jobs (status, params) VALUES ('running', ?)", (json.dumps(params),)
+    ).lastrowid
+    conn.commit()
+    return app.run_generation_job(Job(app.open_db_connection, job_id, params))
+
+
+def timetable(conn):
+    return [(r['subject_id'], r['classroom_id'], r['timeslot']) for r in conn.execute('SELECT * FROM timetable ORDER BY id')]
+
+
+def test_regenerating_unchanged_inputs_hits_the_cache(db, monkeypatch):
+    monkeypatch.setattr(app, 'SOLVER_TIME_BUDGET', 0.1)
+    monkeypatch.setattr(app, 'OPTIMISER_TIME_BUDGET', 0.1)
+    seed(db)
+    first = run_job(db, {'strategy': 'greedy'})
+    solved = timetable(db)
+    assert not first['cached'] and first['placed'] == 5
+
+    def no_solve(*args, **kwargs):
+        raise AssertionError('solver ran on a cache hit')
+
+    monkeypatch.setitem(app.STRATEGIES, 'greedy', no_solve)
+    second = run_job(db, {'strategy': 'greedy'})
+    assert second['cached'] and second['placed'] == 5
+    assert timetable(db) == solved
+    assert app.get_setting(db, 'timetable_input_hash') == db.execute('SELECT input_hash FROM schedule_cache').fetchone()[0]
+
+
+def test_edited_inputs_miss_the_cache(db, monkeypatch):
+    monkeypatch.setattr(app, 'SOLVER_TIME_BUDGET', 0.1)
+    monkeypatch.setattr(app, 'OPTIMISER_TIME_BUDGET', 0.1)
+    seed(db)
+    run_job(db, {'strategy': 'greedy'})
+    db.execute('UPDATE subjects SET num_lectures = 1 WHERE id = 2')
+    db.commit()
+    result = run_job(db, {'strategy': 'greedy'})
+    assert not result['cached'] and result['placed'] == 4
+    assert db.execute('SELECT COUNT(*) FROM schedule_cache').fetchone()[0] == 2
@@ -0,0 +1,134 @@
+import app
+from checks import clashes
+from scheduling.incremental import reschedule, split_invalidated
+
+TEACHERS = [{'id': 1}, {'id': 2}]
+CLASSROOMS = [{'id': 1, 'capacity': 30}, {'id': 2, 'capacity': 30}]
+CLASSES = [{'id': 1}, {'id': 2}]
+AVAILABILITY = [
+    {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 12},
+    {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 12},
+]
+SUBJECTS = [
+    {'id': 1, 'name': 'Maths', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 2, 'num_students': 30},
+    {'id': 2, 'name': 'History', 'teacher_id': 2, 'class_id': 2, 'num_lectures': 1, 'num_students': 30},
+]
+
+
+def stored(row_id, subject_id, teacher_id, classroom_id, class_id, timeslot, semester=None):
+    return {'id': row_id, 'subject_id': subject_id, 'teacher_id': teacher_id, 'classroom_id': classroom_id,
+            'class_id': class_id, 'timeslot': timeslot, 'duration': 1, 'semester': semester}
+
+
+CURRENT = [
+    stored(1, 1, 1, 1, 1, 'Mon 9AM'),
+    stored(2, 1, 1, 1, 1, 'Mon 10AM'),
+    stored(3, 2, 2, 2, 2, 'Mon 9AM'),
+]
+
+
+def dropped_ids(current, subjects=SUBJECTS, classrooms=CLASSROOMS, availability=AVAILABILITY, group_of=None):
+    _, dropped = split_invalidated(current, subjects, TEACHERS, classrooms, availability, group_of)
+    return [entry['id'] for entry in dropped]
+
+
+def test_valid_timetable_is_kept():
+    assert dropped_ids(CURRENT) == []
+
+
+def test_row_in_a_removed_room_is_dropped():
+    assert dropped_ids(CURRENT, classrooms=CLASSROOMS[:1]) == [3]
+
+
+def test_row_outside_availability_is_dropped():
+    availability = [dict(AVAILABILITY[0], start_hour=10)] + AVAILABILITY[1:]
+    assert dropped_ids(CURRENT, availability=availability) == [1]
+
+
+def test_clash_drops_the_newer_row():
+    current = CURRENT + [stored(4, 2, 2, 1, 2, 'Mon 10AM')]
+    # Room 1 is already held at Mon 10AM by row 2; subject 2 also has its one lecture
+    assert dropped_ids(current) == [4]
+
+
+def test_groups_may_share_a_slot():
+    current = [stored(1, 1, 1, 1, 1, 'Mon 9AM', 'S1'), stored(2, 1, 1, 1, 1, 'Mon 9AM', 'S2')]
+    assert dropped_ids(current) == [2]
+    assert dropped_ids(current, group_of=lambda row: row['semester']) == []
+
+
+def test_surplus_lectures_are_dropped():
+    subjects = [dict(SUBJECTS[0], num_lectures=1), SUBJECTS[1]]
+    assert dropped_ids(CURRENT, subjects=subjects) == [2]
+
+
+def test_reschedule_only_replaces_invalidated_rows():
+    # Teacher 1 can no longer teach at Mon 10AM
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 11, 'end_hour': 12},
+    ] + AVAILABILITY[1:]
+    dropped, added, shortages = reschedule(CURRENT, SUBJECTS, TEACHERS, CLASSROOMS, CLASSES, availability)
+    assert [entry['id'] for entry in dropped] == [2]
+    assert [(e['subject_id'], e['timeslot']) for e in added] == [(1, 'Mon 11AM')]
+    assert shortages == []
+    kept = [entry for entry in CURRENT if entry['id'] != 2]
+    assert clashes(kept + added) == []
+
+
+def test_reschedule_reports_shortages_against_the_whole_assignment():
+    availability = [{'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10}] + AVAILABILITY[1:]
+    dropped, added, shortages = reschedule(CURRENT, SUBJECTS, TEACHERS, CLASSROOMS, CLASSES, availability)
+    assert added == []
+    assert [(s['needed'], s['assigned']) for s in shortages] == [(2, 1)]
+
+
+def seed(conn):
+    """Two teachers with Mon 9-12, one room, and CURRENT's first two rows published."""
+    conn.executemany('INSERT INTO teachers (id) VALUES (?)', [(1,), (2,)])
+    conn.executemany('INSERT INTO classes (id, name) VALUES (?, ?)', [(1, 'A'), (2, 'B')])
+    conn.executemany('INSERT INTO classrooms (id, name, capacity) VALUES (?, ?, 30)', [(1, 'R1'), (2, 'R2')])
+    conn.executemany('INSERT INTO subjects (id, name, num_lectures) VALUES (?, ?, ?)',
+                     [(s['id'], s['name'], s['num_lectures']) for s in SUBJECTS])
+    conn.executemany('INSERT INTO teacher_subject_class (teacher_id, subject_id, class_id) VALUES (?, ?, ?)',
+                     [(s['teacher_id'], s['id'], s['class_id']) for s in SUBJECTS])
+    conn.executemany(
+        'INSERT INTO teacher_availability (teacher_id, day, start_hour, end_hour) VALUES (?, ?, ?, ?)',
+        [(a['teacher_id'], a['day'], a['start_hour'], a['end_hour']) for a in AVAILABILITY]
+    )
+    conn.commit()
+
+
+def test_edit_during_a_generation_is_applied_on_publish(db):
+    seed(db)
+    loaded_version = app.mark_generation_inputs(db)
+    # Room 2 is taken out of service after the job loaded its inputs
+    db.execute('UPDATE classrooms SET is_available = 0 WHERE id = 2')
+    db.commit()
+
+    update = app.save_timetable(db, CURRENT, 'hash-1', loaded_version)
+    rows = app.load_timetable_rows(db)
+    assert update == {'placed': 1, 'invalidated': 1, 'missing': 0, 'shortages': []}
+    assert all(row['classroom_id'] == 1 for row in rows)
+    assert clashes(rows) == []
+    assert app.get_setting(db, 'timetable_input_hash') is None
+    assert app.get_setting(db, 'generation_inputs_version') is None
+
+
+def test_publish_without_edits_keeps_the_hash(db):
+    seed(db)
+    loaded_version = app.mark_generation_inputs(db)
+    assert app.save_timetable(db, CURRENT, 'hash-1', loaded_version) is None
+    assert app.get_setting(db, 'timetable_input_hash') == 'hash-1'
+
+
+def test_unpublished_job_applies_deferred_edits(db):
+    seed(db)
+    app.save_timetable(db, CURRENT)
+    app.mark_generation_inputs(db)
+    db.execute('UPDATE classrooms SET is_available = 0 WHERE id = 2')
+    db.commit()
+
+    app.apply_deferred_edits()
+    assert [row['classroom_id'] for row in app.load_timetable_rows(db)] == [1, 1, 1]
+    assert app.get_setting(db, 'generation_inputs_version') is None
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+import app
+import jobs
+from jobs import JobCancelled, JobQueue
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """A queue whose jobs are claimed and run by the test, not a worker thread."""
+    queue = JobQueue(app.open_db_connection, lambda job: {'ran': job.params})
+    monkeypatch.setattr(queue, '_start', lambda: None)
+    return queue
+
+
+def run_next(queue):
+    job = queue._claim()
+    assert job is not None
+    queue._execute(job)
+    return queue.get(job.id)
+
+
+def test_only_one_job_is_active(queue):
+    first, created = queue.enqueue({'strategy': 'greedy'}, user_id=1)
+    assert created
+    assert queue.enqueue({'strategy': 'dsatur'}) == (first, False)
+    assert queue.active()['id'] == first
+    job = run_next(queue)
+    assert job['status'] == 'done' and job['result'] == {'ran': {'strategy': 'greedy'}}
+    assert queue.active() is None
+    assert queue.last_done()['id'] == first
+    assert queue.enqueue({})[1]
+
+
+def test_a_claimed_job_is_not_claimed_again(queue):
+    queue.enqueue({})
+    assert queue._claim() is not None
+    assert queue._claim() is None
+
+
+def test_handler_errors_fail_the_job(queue):
+    def handler(job):
+        raise ValueError('no rooms')
+    queue._handler = handler
+    queue.enqueue({})
+    job = run_next(queue)
+    assert (job['status'], job['message']) == ('failed', 'no rooms')
+
+
+def test_cancel_before_start(queue):
+    job_id, _ = queue.enqueue({})
+    assert queue.cancel(job_id)['status'] == 'cancelled'
+    assert queue._claim() is None
+
+
+def test_cancel_while_running_stops_at_the_next_progress(queue):
+    steps = []
+
+    def handler(job):
+        job.progress('solving', 10)
+        steps.append('solving')
+        queue.cancel(job.id)
+        job.progress('saving', 90)
+        steps.append('saving')
+    queue._handler = handler
+    queue.enqueue({})
+    job = run_next(queue)
+    assert job['status'] == 'cancelled'
+    assert steps == ['solving']
+
+
+def test_reporter_maps_fractions_and_throttles(queue, monkeypatch):
+    monkeypatch.setattr(jobs, 'PROGRESS_INTERVAL', 0.0)
+    seen = []
+
+    def handler(job):
+        report = job.reporter('solving', 10, 50)
+        for fraction in (0.0, 0.5, 2.0):
+            report(fraction)
+            seen.append(queue.get(job.id)['progress'])
+        monkeypatch.setattr(jobs, 'PROGRESS_INTERVAL', 60.0)
+        report = job.reporter('repairing', 50, 70)
+        report(0.0)
+        report(1.0)
+        seen.append(queue.get(job.id)['progress'])
+    queue._handler = handler
+    queue.enqueue({})
+    run_next(queue)
+    assert seen == [10, 30, 50, 50]
+
+
+def test_running_job_keeps_its_heartbeat(queue, db, monkeypatch):
+    monkeypatch.setattr(jobs, 'HEARTBEAT_INTERVAL', 0.05)
+    beats = []
+
+    def handler(job):
+        conn = app.open_db_connection()
+        conn.execute("UPDATE generation_jobs SET heartbeat_at = '2000-01-01 00:00:00' WHERE id = ?", (job.id,))
+        conn.commit()
+        time.sleep(0.3)
+        beats.append(conn.execute('SELECT heartbeat_at FROM generation_jobs WHERE id = ?', (job.id,)).fetchone()[0])
+        conn.close()
+    queue._handler = handler
+    queue.enqueue({})
+    assert run_next(queue)['status'] == 'done'
+    assert beats[0] > '2000-01-01 00:00:00'
+
+
+def test_job_without_heartbeat_is_failed_and_frees_the_queue(queue, db):
+    db.execute('''
+        INSERT INTO generation_jobs (status, params, heartbeat_at, updated_at)
+        VALUES ('running', '{}', datetime('now', '-1 minute'), datetime('now'))
+    ''')
+    db.commit()
+    stale = db.execute('SELECT MAX(id) FROM generation_jobs').fetchone()[0]
+    job_id, created = queue.enqueue({})
+    assert created and job_id != stale
+    assert (queue.get(stale)['status'], queue.get(stale)['message']) == ('failed', 'The worker running this job stopped')
+
+
+def test_recent_heartbeat_keeps_the_job(queue, db):
+    db.execute("INSERT INTO generation_jobs (status, params, heartbeat_at) VALUES ('running', '{}', datetime('now'))")
+    db.commit()
+    running = db.execute('SELECT MAX(id) FROM generation_jobs').fetchone()[0]
+    assert queue.enqueue({}) == (running, False)
+
+
+def test_exiting_worker_fails_its_running_job(queue):
+    queue.enqueue({})
+    job = queue._claim()
+    queue._running = job.id
+    queue._abandon()
+    assert queue.get(job.id)['status'] == 'failed'
+
+
+def test_progress_raises_once_cancelled(queue):
+    queue.enqueue({})
+    job = queue._claim()
+    queue.cancel(job.id)
+    with pytest.raises(JobCancelled):
+        job.progress('solving', 10)
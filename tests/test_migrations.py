@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def migrate_to(conn, monkeypatch, last):
+    with monkeypatch.context() as m:
+        m.setattr(migrations, 'MIGRATIONS', [entry for entry in migrations.MIGRATIONS if entry[0] <= last])
+        return migrations.apply_migrations(conn)
+
+
+def test_fresh_database_gets_every_migration(conn):
+    applied = migrations.apply_migrations(conn)
+    assert applied == [entry[0] for entry in migrations.MIGRATIONS]
+    assert migrations.apply_migrations(conn) == []
+    assert migrations.check_query_plans(conn) == []
+
+
+def test_older_database_gets_only_the_newer_migrations(conn, monkeypatch):
+    assert migrate_to(conn, monkeypatch, 2) == [0, 1, 2]
+    assert migrations.apply_migrations(conn) == [entry[0] for entry in migrations.MIGRATIONS if entry[0] > 2]
+    recorded = [r[0] for r in conn.execute('SELECT version FROM schema_migrations ORDER BY version')]
+    assert recorded == [entry[0] for entry in migrations.MIGRATIONS]
+
+
+def test_migration_4_collapses_fanned_out_notifications(conn, monkeypatch):
+    migrate_to(conn, monkeypatch, 3)
+    for user_id, role in ((1, 'admin'), (2, 'teacher'), (3, 'student')):
+        conn.execute('''
+            INSERT INTO users (id, username, email, password_hash, role, full_name) VALUES (?, ?, ?, 'x', ?, ?)
+        ''', (user_id, f'u{user_id}', f'u{user_id}@example.com', role, f'User {user_id}'))
+    # One announcement fanned out to three users across a minute boundary, two of them read
+    conn.executemany('''
+        INSERT INTO notifications (user_id, title, message, target_role, is_read, created_at) VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (1, 'Timetable Updated', 'New timetable', 'all', 1, '2024-03-01 10:00:59'),
+        (2, 'Timetable Updated', 'New timetable', 'all', 0, '2024-03-01 10:00:59'),
+        (3, 'Timetable Updated', 'New timetable', 'all', 1, '2024-03-01 10:01:00'),
+        # The same text sent again at once starts over at the first user
+        (1, 'Timetable Updated', 'New timetable', 'all', 0, '2024-03-01 10:01:01'),
+        (3, 'Timetable Updated', 'New timetable', 'all', 0, '2024-03-01 10:01:01'),
+        # ...and a day later it is another announcement too
+        (1, 'Timetable Updated', 'New timetable', 'all', 0, '2024-03-02 09:00:00'),
+    ])
+    conn.commit()
+
+    assert migrate_to(conn, monkeypatch, 4) == [4]
+
+    rows = conn.execute('SELECT id, user_id, created_at FROM notifications ORDER BY id').fetchall()
+    assert [(r['user_id'], r['created_at']) for r in rows] == [
+        (None, '2024-03-01 10:00:59'),
+        (None, '2024-03-01 10:01:01'),
+        (None, '2024-03-02 09:00:00'),
+    ]
+    reads = conn.execute('SELECT notification_id, user_id FROM notification_reads ORDER BY user_id').fetchall()
+    assert [tuple(r) for r in reads] == [(rows[0]['id'], 1), (rows[0]['id'], 3)]
+    indexes = set(r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'"))
+    assert 'idx_notifications_audience' in indexes
+    assert 'idx_notifications_user' not in indexes
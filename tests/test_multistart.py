@@ -0,0 +1,40 @@
+import time
+
+from checks import check_schedule
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.multistart import generate_multistart_schedule, score, start_orders
+from scheduling.stats import SolverStats
+
+
+def test_start_orders_are_permutations_and_repeatable(instance):
+    subjects, teachers, _, _, teacher_availability = instance
+    orders = start_orders(subjects, teachers, teacher_availability, 6, seed=3)
+    assert len(orders) == 6
+    assert orders[0] == list(range(len(subjects)))
+    assert all(sorted(order) == list(range(len(subjects))) for order in orders)
+    assert orders == start_orders(subjects, teachers, teacher_availability, 6, seed=3)
+
+
+def test_score_prefers_fewer_missing_then_balanced_rooms():
+    rooms = [{'id': 1}, {'id': 2}]
+    balanced = [{'classroom_id': 1}, {'classroom_id': 2}]
+    lopsided = [{'classroom_id': 1}, {'classroom_id': 1}]
+    short = [{'needed': 2, 'assigned': 1}]
+    assert score(balanced, [], rooms) < score(lopsided, [], rooms)
+    assert score(lopsided, [], rooms) < score(balanced, short, rooms)
+
+
+def test_multistart_is_never_worse_than_greedy(instance):
+    stats = SolverStats()
+    schedule, shortages = generate_multistart_schedule(*instance, starts=4, workers=1, stats=stats)
+    check_schedule(schedule, shortages, instance)
+    greedy = generate_initial_schedule(*instance)
+    assert score(schedule, shortages, instance[2]) <= score(*greedy, instance[2])
+    assert stats.as_dict()['counters']['starts_finished'] == 4
+
+
+def test_time_limit_still_returns_a_result(instance):
+    started = time.monotonic()
+    schedule, shortages = generate_multistart_schedule(*instance, starts=50, time_limit=0.0, workers=1)
+    assert time.monotonic() - started < 2.0
+    check_schedule(schedule, shortages, instance)
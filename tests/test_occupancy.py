@@ -0,0 +1,152 @@
+import pytest
+
+import app
+from scheduling.occupancy import OccupancyIndex
+from scheduling.slot_grid import parse_slot_label
+from scheduling.whatif import InputCache
+
+
+@pytest.fixture
+def index(instance):
+    subjects, teachers, classrooms, _, teacher_availability = instance
+    timetable = [
+        # id, subject, teacher, room, class, timeslot, duration
+        (1, 1, 1, 1, 1, 'Mon 9AM', 1),
+        (2, 2, 1, 3, 2, 'Mon 10AM', 1),
+        (3, 5, 3, 1, 1, 'Tue 9AM', 1),
+        (4, 3, 2, 1, 2, 'Wed 10AM', 2),
+        (5, 4, 2, 2, 3, 'Wed 2PM', 1),
+    ]
+    rows = [
+        dict(zip(('id', 'subject_id', 'teacher_id', 'classroom_id', 'class_id', 'timeslot', 'duration'), row))
+        for row in timetable
+    ]
+    qualified = [(s['id'], s['teacher_id']) for s in subjects]
+    return OccupancyIndex(rows, classrooms, teachers, teacher_availability, qualified, subjects=subjects)
+
+
+def slot(label):
+    return parse_slot_label(label)
+
+
+def ids(found):
+    return [item['id'] for item in found]
+
+
+def test_free_rooms_come_smallest_first(index):
+    # Room 1 (30 seats) holds lecture 1; rooms sort by capacity: 3 (40), then 2 (60)
+    assert ids(index.free_rooms(slot('Mon 9AM'))) == [3, 2]
+    assert ids(index.free_rooms(slot('Mon 11AM'))) == [1, 3, 2]
+    assert ids(index.free_rooms(slot('Mon 11AM'), min_capacity=50)) == [2]
+    assert ids(index.free_rooms(slot('Mon 11AM'), min_capacity=61)) == []
+
+
+def test_free_rooms_cover_every_hour(index):
+    # The lab holds room 1 Wed 10AM-12PM
+    assert 1 not in ids(index.free_rooms(slot('Wed 11AM')))
+    assert 1 not in ids(index.free_rooms(slot('Wed 9AM'), length=2))
+    assert 1 in ids(index.free_rooms(slot('Wed 12PM'), length=2))
+
+
+def test_free_teachers_are_available_and_idle(index):
+    # Teacher 1 teaches at Mon 9AM; teacher 3 has the default Mon-Fri 9AM-12PM window
+    assert ids(index.free_teachers(slot('Mon 9AM'))) == [3]
+    assert ids(index.free_teachers(slot('Mon 11AM'))) == [1, 3]
+    # Teacher 3's default window ends at noon
+    assert ids(index.free_teachers(slot('Mon 11AM'), length=2)) == [1]
+    assert ids(index.free_teachers(slot('Mon 11AM'), subject_id=5)) == [3]
+    assert ids(index.free_teachers(slot('Fri 9AM'))) == [3, 4]
+
+
+def test_lookups_by_group(instance):
+    subjects, teachers, classrooms, _, teacher_availability = instance
+    rows = [{'id': 1, 'subject_id': 1, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Mon 9AM',
+             'semester': 'Fall'}]
+    index = OccupancyIndex(rows, classrooms, teachers, teacher_availability, group_of=lambda row: row['semester'])
+    assert 1 not in ids(index.free_rooms(slot('Mon 9AM')))
+    assert 1 not in ids(index.free_rooms(slot('Mon 9AM'), group='Fall'))
+    assert 1 in ids(index.free_rooms(slot('Mon 9AM'), group='Spring'))
+    assert 1 in ids(index.free_teachers(slot('Mon 9AM'), group='Spring'))
+
+
+@pytest.mark.parametrize('label, length', [('Mon 11PM', 2), ('Mon 9AM', 0), (None, 1)])
+def test_lookups_outside_one_day_are_rejected(index, label, length):
+    with pytest.raises(ValueError):
+        index.free_rooms(slot(label) if label else None, length=length)
+
+
+def test_valid_move_is_accepted(index):
+    assert index.check_moves([(1, slot('Mon 11AM'), 1)]) == []
+
+
+def test_teacher_and_class_clashes_are_rejected(index):
+    problems = index.check_moves([(1, slot('Mon 10AM'), 1)])
+    assert any('teacher is already booked' in p for p in problems)
+    # Lecture 3 shares class 1 with lecture 1 but has another teacher
+    problems = index.check_moves([(3, slot('Mon 9AM'), 2)])
+    assert any('class is already booked' in p for p in problems)
+    assert not any('teacher' in p for p in problems)
+
+
+def test_room_clash_counts_every_hour_of_a_block(index):
+    # Room 1 is taken Wed 10-12 by the two-hour lab (lecture 4)
+    problems = index.check_moves([(5, slot('Wed 11AM'), 1)])
+    assert any('room is already booked' in p for p in problems)
+
+
+def test_swap_is_accepted(index):
+    assert index.check_moves([(1, slot('Mon 10AM'), 3), (2, slot('Mon 9AM'), 1)]) == []
+
+
+def test_two_moves_into_the_same_hour_are_rejected(index):
+    problems = index.check_moves([(1, slot('Tue 10AM'), 1), (2, slot('Tue 10AM'), 3)])
+    assert any('teacher is already booked' in p for p in problems)
+
+
+def test_capacity_availability_and_grid_are_checked(index):
+    assert any('too small' in p for p in index.check_moves([(5, slot('Wed 3PM'), 1)]))
+    assert any('not available' in p for p in index.check_moves([(1, slot('Wed 9AM'), 1)]))
+    # A two-hour block may not run past midnight
+    assert any('not on the timetable grid' in p for p in index.check_moves([(4, slot('Mon 9AM') + 14, 1)]))
+
+
+def test_apply_moves_updates_bookings(index):
+    index.apply_moves([(1, slot('Mon 10AM'), 3), (2, slot('Mon 9AM'), 1)])
+    # Class 1 left Mon 9AM for Mon 10AM
+    assert index.check_moves([(3, slot('Mon 9AM'), 2)]) == []
+    assert any('class is already booked' in p for p in index.check_moves([(3, slot('Mon 10AM'), 2)]))
+
+
+@pytest.fixture
+def lectures(db, admin, monkeypatch):
+    """Two published lectures of teacher 1 (Mon 9AM in room 1, Mon 10AM in room 2) and an admin client."""
+    monkeypatch.setattr(app, 'occupancy_index', InputCache())
+    db.execute('INSERT INTO teachers (id) VALUES (1)')
+    db.executemany("INSERT INTO classrooms (id, name, capacity) VALUES (?, 'R', 30)", [(1,), (2,)])
+    db.executemany("INSERT INTO classes (id, name) VALUES (?, 'C')", [(1,), (2,)])
+    db.executemany("INSERT INTO subjects (id, name, num_lectures) VALUES (?, 'S', 1)", [(1,), (2,)])
+    db.commit()
+    app.save_timetable(db, [
+        {'subject_id': 1, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Mon 9AM'},
+        {'subject_id': 2, 'teacher_id': 1, 'classroom_id': 2, 'class_id': 2, 'timeslot': 'Mon 10AM'},
+    ])
+    return [r['id'] for r in db.execute('SELECT id FROM timetable ORDER BY id')]
+
+
+def test_swap_endpoint_writes_both_lectures(db, admin, lectures):
+    a, b = lectures
+    response = admin.post('/timetable/swap', json={'a': a, 'b': b})
+    assert response.status_code == 200
+    assert [(r['timeslot'], r['classroom_id']) for r in db.execute('SELECT * FROM timetable ORDER BY id')] == [
+        ('Mon 10AM', 2), ('Mon 9AM', 1)
+    ]
+
+
+def test_move_endpoint_rejects_clashes_and_bad_bodies(db, admin, lectures):
+    a, b = lectures
+    response = admin.post(f'/timetable/{a}/move', json={'timeslot': 'Mon 10AM'})
+    assert response.status_code == 400
+    assert any('teacher is already booked' in c for c in response.get_json()['conflicts'])
+    assert admin.post(f'/timetable/{a}/move', json=['Mon 11AM']).status_code == 400
+    assert admin.post('/timetable/swap', json=[a, b]).status_code == 400
+    assert [r['timeslot'] for r in db.execute('SELECT * FROM timetable ORDER BY id')] == ['Mon 9AM', 'Mon 10AM']
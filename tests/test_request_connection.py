@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import app
+
+
+def count(conn):
+    return conn.execute('SELECT COUNT(*) FROM classes').fetchone()[0]
+
+
+def test_nested_connections_share_one_and_only_the_outermost_close_counts(db):
+    with app.app.test_request_context():
+        outer = app.get_db_connection()
+        inner = app.get_db_connection()
+        assert inner is outer
+        inner.execute("INSERT INTO classes (name) VALUES ('A')")
+        inner.close()
+        # The inner close() neither closed the connection nor dropped the insert
+        assert count(outer) == 1
+        outer.close()
+        assert count(outer) == 0
+        # A further close() does not go below zero or fail
+        outer.close()
+        again = app.get_db_connection()
+        assert again is outer
+        again.execute("INSERT INTO classes (name) VALUES ('B')")
+        again.commit()
+        again.close()
+    assert count(db) == 1
+
+
+def test_error_in_a_request_drops_uncommitted_work(db):
+    with pytest.raises(RuntimeError):
+        with app.app.test_request_context():
+            conn = app.get_db_connection()
+            try:
+                conn.execute("INSERT INTO classes (name) VALUES ('A')")
+                raise RuntimeError('boom')
+            finally:
+                conn.close()
+    assert count(db) == 0
+
+
+def test_connection_is_closed_when_the_request_ends(db):
+    with app.app.test_request_context():
+        conn = app.get_db_connection()
+        conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+
+
+def test_one_connection_per_request(db, admin, monkeypatch):
+    db.execute('INSERT INTO teachers (id) VALUES (1)')
+    db.commit()
+    opened = []
+    real_open = app.open_db_connection
+
+    def open_db_connection():
+        opened.append(1)
+        return real_open()
+
+    monkeypatch.setattr(app, 'open_db_connection', open_db_connection)
+    # Loading the user and the view each ask for a connection
+    assert admin.get('/teacher_availability/1').status_code == 200
+    assert admin.get('/teacher_availability/1').status_code == 200
+    assert len(opened) == 2
+
+
+def test_outside_a_request_each_call_opens_a_connection(db):
+    first, second = app.get_db_connection(), app.get_db_connection()
+    try:
+        assert isinstance(first, sqlite3.Connection)
+        assert first is not second
+    finally:
+        first.close()
+        second.close()
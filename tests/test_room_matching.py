@@ -0,0 +1,50 @@
+from scheduling.graph_coloring import generate_initial_schedule
+from scheduling.room_index import RoomIndex
+from scheduling.room_matching import hopcroft_karp, match_rooms, room_fits
+from scheduling.stats import SolverStats
+
+ROOMS = [{'id': 10, 'capacity': 30}, {'id': 20, 'capacity': 60}]
+
+
+def test_hopcroft_karp_finds_a_maximum_matching():
+    # Greedy in order would give right vertex 0 to left vertex 0 and strand vertex 1
+    matched = hopcroft_karp([[0, 1], [0]], 2)
+    assert sorted(matched) == [0, 1]
+    assert matched[1] == 0
+
+
+def test_match_rooms_puts_the_big_class_in_the_big_room():
+    rooms = RoomIndex(ROOMS)
+    # The small lecture currently sits in the big room
+    assert match_rooms(rooms, [30, 60], current=[20, None]) == [10, 20]
+    assert match_rooms(rooms, [60, 60]) is None
+    assert match_rooms(rooms, [30, 30], exclude=1 << rooms.position[10]) is None
+
+
+def test_room_fits_checks_halls_condition():
+    rooms = RoomIndex(ROOMS)
+    assert room_fits({}, 60, rooms)
+    assert room_fits({30: 1}, 60, rooms)
+    assert not room_fits({60: 1}, 60, rooms)
+    assert not room_fits({30: 1, 60: 1}, 30, rooms)
+    assert not room_fits({}, 30, rooms, exclude=(1 << rooms.position[10]) | (1 << rooms.position[20]))
+
+
+def test_greedy_rematches_rooms_instead_of_giving_up():
+    teachers = [{'id': 1}, {'id': 2}]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+    ]
+    # The small class comes first and gets the big room, which the large class then needs
+    subjects = [
+        {'id': 1, 'name': 'Small', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 1, 'num_students': 25},
+        {'id': 2, 'name': 'Large', 'teacher_id': 2, 'class_id': 2, 'num_lectures': 1, 'num_students': 55},
+    ]
+    stats = SolverStats()
+    schedule, shortages = generate_initial_schedule(
+        subjects, teachers, list(reversed(ROOMS)), [{'id': 1}, {'id': 2}], availability, stats=stats
+    )
+    assert shortages == []
+    assert {e['subject_id']: e['classroom_id'] for e in schedule} == {1: 10, 2: 20}
+    assert stats.as_dict()['counters']['room_rematches'] == 1
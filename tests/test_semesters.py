@@ -0,0 +1,42 @@
+from checks import clashes
+from scheduling.semesters import concurrency_key, generate_semester_schedules, parse_concurrent_semesters
+
+TEACHERS = [{'id': 1}]
+CLASSROOMS = [{'id': 1, 'capacity': 30}]
+CLASSES = [{'id': 1}, {'id': 2}]
+# One teacher and one room, for one hour a week, shared by a Fall and a Spring subject
+AVAILABILITY = [{'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10}]
+SUBJECTS = [
+    {'id': 1, 'name': 'Fall', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 1, 'num_students': 30,
+     'semester': 'Fall'},
+    {'id': 2, 'name': 'Spring', 'teacher_id': 1, 'class_id': 2, 'num_lectures': 1, 'num_students': 30,
+     'semester': 'Spring'},
+]
+
+
+def generate(concurrent):
+    return generate_semester_schedules(SUBJECTS, TEACHERS, CLASSROOMS, CLASSES, AVAILABILITY, ['Fall', 'Spring'],
+                                       concurrent=concurrent, workers=1, repair_budget=0.1, optimiser_budget=0.1)
+
+
+def test_semesters_are_concurrent_unless_configured():
+    assert concurrency_key('Fall') == concurrency_key('Spring') == ''
+    groups = parse_concurrent_semesters('Fall, Summer; Spring')
+    assert groups == [{'Fall', 'Summer'}, {'Spring'}]
+    assert concurrency_key('Summer', groups) == concurrency_key('Fall', groups) == 'Fall,Summer'
+    assert concurrency_key('Spring', groups) == 'Spring'
+    # Not listed anywhere: one more group of its own
+    assert concurrency_key('Winter', groups) == ''
+
+
+def test_default_never_double_books_across_semesters():
+    schedule, shortages = generate(())
+    assert len(schedule) == len(shortages) == 1
+    assert clashes(schedule) == []
+
+
+def test_separate_groups_may_share_teachers_and_rooms():
+    schedule, shortages = generate(parse_concurrent_semesters('Fall;Spring'))
+    assert shortages == []
+    # Each group is placed on its own, so both take the one hour
+    assert [e['timeslot'] for e in schedule] == ['Mon 9AM', 'Mon 9AM']
@@ -0,0 +1,55 @@
+import pytest
+
+from checks import check_schedule, clashes
+from scheduling.graph_coloring import generate_dsatur_schedule
+from scheduling.stats import SolverStats
+from scheduling.strategies import STRATEGIES
+
+
+@pytest.mark.parametrize('strategy', sorted(STRATEGIES))
+def test_strategy_places_without_clashes(strategy, instance):
+    schedule, shortages = STRATEGIES[strategy](*instance)
+    check_schedule(schedule, shortages, instance)
+    assert schedule
+
+
+@pytest.mark.parametrize('strategy', sorted(STRATEGIES))
+def test_strategy_works_around_reserved(strategy, instance):
+    reserved = [
+        {'subject_id': 99, 'teacher_id': 1, 'classroom_id': 2, 'class_id': 1, 'timeslot': 'Mon 9AM', 'duration': 2},
+        {'subject_id': 98, 'teacher_id': 4, 'classroom_id': 1, 'class_id': 3, 'timeslot': 'Fri 9AM', 'duration': 1},
+    ]
+    schedule, shortages = STRATEGIES[strategy](*instance, reserved=reserved)
+    check_schedule(schedule, shortages, instance)
+    assert clashes(schedule + reserved) == []
+
+
+@pytest.mark.parametrize('strategy', sorted(STRATEGIES))
+def test_strategy_reports_progress(strategy, instance):
+    seen = []
+    STRATEGIES[strategy](*instance, progress=seen.append)
+    assert seen and all(0.0 <= f <= 1.0 for f in seen)
+
+
+def test_dsatur_keeps_saturation_keys_current(instance):
+    stats = SolverStats()
+    schedule, shortages = generate_dsatur_schedule(*instance, stats=stats)
+    check_schedule(schedule, shortages, instance)
+    assert stats.as_dict()['counters']['stale_saturation'] == 0
+
+
+def test_dsatur_colours_the_most_constrained_lecture_first():
+    # Subject 2's teacher has one free hour; first-fit in row order would give it to subject 1
+    subjects = [
+        {'id': 1, 'name': 'A', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 1, 'num_students': 30},
+        {'id': 2, 'name': 'B', 'teacher_id': 2, 'class_id': 1, 'num_lectures': 1, 'num_students': 30},
+    ]
+    availability = [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 12},
+        {'teacher_id': 2, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10},
+    ]
+    schedule, shortages = generate_dsatur_schedule(
+        subjects, [{'id': 1}, {'id': 2}], [{'id': 1, 'capacity': 30}], [{'id': 1}], availability
+    )
+    assert shortages == []
+    assert {e['subject_id']: e['timeslot'] for e in schedule}[2] == 'Mon 9AM'
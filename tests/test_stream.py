@@ -0,0 +1,43 @@
+import app
+
+
+def lecture(teacher_id, timeslot, room_id, subject_id=1):
+    return {'subject_id': subject_id, 'teacher_id': teacher_id, 'classroom_id': room_id, 'class_id': teacher_id,
+            'timeslot': timeslot, 'duration': 1}
+
+
+def rows(conn, table):
+    return [(r['teacher_id'], r['timeslot'], r['classroom_id'])
+            for r in conn.execute(f'SELECT * FROM {table} ORDER BY id')]
+
+
+def test_batches_land_in_staging_and_moves_are_patched(db, monkeypatch):
+    monkeypatch.setattr(app, 'TIMETABLE_BATCH_SIZE', 2)
+    app.save_timetable(db, [lecture(9, 'Fri 9AM', 1)])
+    events = [
+        ('placed', 0, lecture(1, 'Mon 9AM', 1)),
+        ('placed', 1, lecture(2, 'Mon 9AM', 2)),
+        ('placed', 2, lecture(3, 'Mon 9AM', 3)),
+        # Row 0 is already written: found by teacher and slot
+        ('moved', 0, lecture(1, 'Mon 9AM', 4)),
+        # Row 2 is still in the batch
+        ('moved', 2, lecture(3, 'Mon 9AM', 5)),
+        ('shortage', 3, {'subject_id': 2, 'needed': 1, 'assigned': 0}),
+    ]
+    committed = []
+
+    def progress(placed):
+        # What another connection sees after each batch
+        other = app.open_db_connection()
+        try:
+            committed.append((placed, len(rows(other, 'timetable_staging'))))
+        finally:
+            other.close()
+
+    placed, shortages = app.write_schedule_stream(db, iter(events), progress)
+    assert placed == 3
+    assert shortages == [{'subject_id': 2, 'needed': 1, 'assigned': 0}]
+    assert committed == [(2, 2), (3, 3)]
+    assert rows(db, 'timetable_staging') == [(1, 'Mon 9AM', 4), (2, 'Mon 9AM', 2), (3, 'Mon 9AM', 5)]
+    # The live timetable waits for the publish
+    assert rows(db, 'timetable') == [(9, 'Fri 9AM', 1)]
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+import app
+
+FIRST = [
+    {'subject_id': 1, 'teacher_id': 1, 'classroom_id': 1, 'class_id': 1, 'timeslot': 'Mon 9AM', 'duration': 1},
+    {'subject_id': 2, 'teacher_id': 2, 'classroom_id': 2, 'class_id': 2, 'timeslot': 'Tue 10AM', 'duration': 2},
+]
+SECOND = [
+    {'subject_id': 1, 'teacher_id': 1, 'classroom_id': 2, 'class_id': 1, 'timeslot': 'Wed 11AM', 'duration': 1},
+]
+
+
+class FinishedJob:
+    def __init__(self, conn, strategy):
+        self.params = {'strategy': strategy}
+        self.id = conn.execute(
+            "INSERT INTO generation_jobs (status, params) VALUES ('done', ?)", (json.dumps(self.params),)
+        ).lastrowid
+        conn.commit()
+
+
+def timetable(conn):
+    return [
+        (r['subject_id'], r['teacher_id'], r['classroom_id'], r['class_id'], r['timeslot'], r['duration'])
+        for r in conn.execute('SELECT * FROM timetable ORDER BY id')
+    ]
+
+
+def expected(schedule):
+    return [(e['subject_id'], e['teacher_id'], e['classroom_id'], e['class_id'], e['timeslot'], e['duration'])
+            for e in schedule]
+
+
+def publish(conn, schedule, input_hash):
+    app.save_timetable(conn, schedule, input_hash)
+    return app.record_generation(FinishedJob(conn, 'greedy'), {'strategy': 'greedy', 'placed': len(schedule)})
+
+
+def test_publish_replaces_the_timetable(db):
+    version = int(app.get_setting(db, 'inputs_version'))
+    app.save_timetable(db, FIRST, 'hash-1')
+    assert timetable(db) == expected(FIRST)
+    assert app.get_setting(db, 'timetable_input_hash') == 'hash-1'
+    assert int(app.get_setting(db, 'inputs_version')) > version
+    assert not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'timetable_staging'").fetchone()
+
+
+def test_publish_keeps_indexes_triggers_and_ids(db):
+    before = db.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'timetable' AND type IN ('index', 'trigger') ORDER BY name"
+    ).fetchall()
+    app.save_timetable(db, FIRST)
+    first_ids = [r['id'] for r in db.execute('SELECT id FROM timetable')]
+    app.save_timetable(db, SECOND)
+    after = db.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'timetable' AND type IN ('index', 'trigger') ORDER BY name"
+    ).fetchall()
+    assert [tuple(r) for r in after] == [tuple(r) for r in before]
+    assert min(r['id'] for r in db.execute('SELECT id FROM timetable')) > max(first_ids)
+
+
+def test_failed_publish_keeps_the_old_timetable(db, monkeypatch):
+    app.save_timetable(db, FIRST, 'hash-1')
+
+    def fail(conn, key, value):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(app, 'set_setting', fail)
+    with pytest.raises(RuntimeError):
+        app.save_timetable(db, SECOND, 'hash-2')
+    monkeypatch.undo()
+    assert timetable(db) == expected(FIRST)
+    assert app.get_setting(db, 'timetable_input_hash') == 'hash-1'
+
+
+def test_activate_generation_round_trips(db):
+    first = publish(db, FIRST, 'hash-1')
+    second = publish(db, SECOND, 'hash-2')
+    assert timetable(db) == expected(SECOND)
+    assert app.get_setting(db, 'active_generation') == str(second)
+
+    generation = db.execute('SELECT * FROM generations WHERE id = ?', (first,)).fetchone()
+    app.activate_generation(db, generation)
+    assert timetable(db) == expected(FIRST)
+    assert app.get_setting(db, 'active_generation') == str(first)
+    assert app.get_setting(db, 'timetable_input_hash') == 'hash-1'
+
+    generation = db.execute('SELECT * FROM generations WHERE id = ?', (second,)).fetchone()
+    app.activate_generation(db, generation)
+    assert timetable(db) == expected(SECOND)
+
+
+def test_only_the_newest_generations_are_kept(db, monkeypatch):
+    monkeypatch.setattr(app, 'GENERATIONS_KEPT', 2)
+    ids = [publish(db, schedule, None) for schedule in (FIRST, SECOND, FIRST)]
+    assert [r['id'] for r in db.execute('SELECT id FROM generations ORDER BY id')] == ids[1:]
+    assert not db.execute('SELECT 1 FROM generation_entries WHERE generation_id = ?', (ids[0],)).fetchone()
+
+
+def test_generation_endpoints(db, admin):
+    first = publish(db, FIRST, 'hash-1')
+    second = publish(db, SECOND, 'hash-2')
+    listed = admin.get('/generations').get_json()
+    assert listed['active'] == second
+    assert [g['id'] for g in listed['generations']] == [second, first]
+
+    diff = admin.get(f'/generations/diff?from={first}').get_json()
+    assert diff['to'] == second
+    assert diff['summary'] == {'unchanged': 0, 'moved': 1, 'added': 0, 'removed': 1}
+
+    assert admin.post(f'/generations/{first}/activate').status_code == 200
+    assert timetable(db) == expected(FIRST)
+    assert admin.get('/generations').get_json()['active'] == first
+    assert admin.post('/generations/999/activate').status_code == 404
@@ -0,0 +1,125 @@
+import pytest
+
+import app
+from scheduling.slot_grid import build_availability_masks, hour_range_mask
+from scheduling.whatif import InputCache, apply_overrides, diff_timetables, solve_whatif
+
+
+def test_overrides_apply_to_a_copy(instance):
+    subjects, teachers, classrooms, classes, availability = instance
+    new_subjects, _, new_rooms, _, _ = apply_overrides(*instance, {
+        'close_rooms': [1], 'room_capacity': {'2': 80}, 'num_lectures': {'5': 1}
+    })
+    assert [(c['id'], c['capacity']) for c in new_rooms] == [(2, 80), (3, 40)]
+    assert [s['num_lectures'] for s in new_subjects if s['id'] == 5] == [1]
+    # The cached originals are untouched
+    assert [c['capacity'] for c in classrooms] == [30, 60, 40]
+    assert [s['num_lectures'] for s in subjects if s['id'] == 5] == [3]
+
+
+def test_teacher_unavailable_removes_hours(instance):
+    *_, availability = apply_overrides(*instance, {'teacher_unavailable': [
+        {'teacher_id': 1, 'day': 'Mon', 'start_hour': 10, 'end_hour': 12},
+        {'teacher_id': 2, 'day': 'Thu'},
+        {'teacher_id': 4},
+    ]})
+    masks = build_availability_masks(availability, instance[1])
+    assert masks[1] == (hour_range_mask('Mon', 9, 10) | hour_range_mask('Mon', 12, 13)
+                        | hour_range_mask('Tue', 9, 13))
+    assert masks[2] == hour_range_mask('Wed', 10, 16)
+    # No hours left must not fall back to the default window
+    assert masks[4] == 0
+    # Teacher 3 has no rows and keeps the default window
+    assert all(a['teacher_id'] != 3 for a in availability)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'close_rooms': [9]},
+    {'room_capacity': {'1': 'many'}},
+    {'num_lectures': {'99': 2}},
+    {'num_lectures': {'1': -1}},
+    {'teacher_unavailable': [{'day': 'Mon'}]},
+    {'teacher_unavailable': [{'teacher_id': 9}]},
+    {'teacher_unavailable': [{'teacher_id': 1, 'day': 'Sun'}]},
+    {'close_rooms': 'R1'},
+])
+def test_bad_overrides_raise(instance, overrides):
+    with pytest.raises(ValueError):
+        apply_overrides(*instance, overrides)
+
+
+def lecture(subject_id, timeslot, room_id, teacher_id=1, class_id=1):
+    return {'subject_id': subject_id, 'teacher_id': teacher_id, 'class_id': class_id, 'timeslot': timeslot,
+            'classroom_id': room_id}
+
+
+def test_diff_pairs_moved_lectures_in_slot_order():
+    live = [lecture(1, 'Mon 9AM', 1), lecture(1, 'Mon 10AM', 1), lecture(1, 'Tue 9AM', 1), lecture(2, 'Wed 9AM', 2)]
+    proposed = [lecture(1, 'Tue 9AM', 1), lecture(1, 'Mon 11AM', 1), lecture(1, 'Mon 9AM', 2),
+                lecture(3, 'Fri 9AM', 1)]
+    diff = diff_timetables(live, proposed)
+    assert diff['unchanged'] == 1
+    assert [(m['timeslot'], m['classroom_id'], m['to']) for m in diff['moved']] == [
+        ('Mon 9AM', 1, {'timeslot': 'Mon 9AM', 'classroom_id': 2}),
+        ('Mon 10AM', 1, {'timeslot': 'Mon 11AM', 'classroom_id': 1}),
+    ]
+    assert [a['subject_id'] for a in diff['added']] == [3]
+    assert [r['subject_id'] for r in diff['removed']] == [2]
+
+
+def test_identical_timetables_have_an_empty_diff():
+    live = [lecture(1, 'Mon 9AM', 1), lecture(1, 'Mon 9AM', 1, class_id=2)]
+    assert diff_timetables(live, list(reversed(live))) == {'unchanged': 2, 'moved': [], 'added': [], 'removed': []}
+
+
+def semester_instance():
+    """One teacher with one free hour, teaching a Fall and a Spring subject."""
+    subjects = [
+        {'id': 1, 'name': 'Fall', 'teacher_id': 1, 'class_id': 1, 'num_lectures': 1, 'semester': 'Fall'},
+        {'id': 2, 'name': 'Spring', 'teacher_id': 1, 'class_id': 2, 'num_lectures': 1, 'semester': 'Spring'},
+    ]
+    availability = [{'teacher_id': 1, 'day': 'Mon', 'start_hour': 9, 'end_hour': 10}]
+    return subjects, [{'id': 1}], [{'id': 1, 'capacity': 30}], [{'id': 1}, {'id': 2}], availability
+
+
+def test_full_mode_groups_semesters_like_generation():
+    instance = semester_instance()
+    _, shortages = solve_whatif(*instance, [], mode='full', time_budget=0.1)
+    assert len(shortages) == 1
+    schedule, shortages = solve_whatif(*instance, [], mode='full', time_budget=0.1,
+                                       concurrent=[{'Fall'}, {'Spring'}])
+    assert shortages == []
+    assert [e['timeslot'] for e in schedule] == ['Mon 9AM', 'Mon 9AM']
+
+
+@pytest.fixture
+def whatif(db, admin, monkeypatch):
+    """POST /whatif against the db fixture's database, with a fresh input cache."""
+    monkeypatch.setattr(app, 'whatif_inputs', InputCache())
+    monkeypatch.setattr(app, 'WHATIF_TIME_BUDGET', 0.1)
+    subjects, _, _, _, availability = semester_instance()
+    db.execute('INSERT INTO teachers (id) VALUES (1)')
+    db.execute("INSERT INTO classrooms (id, name, capacity) VALUES (1, 'R1', 30)")
+    db.executemany("INSERT INTO classes (id, name) VALUES (?, 'C')", [(1,), (2,)])
+    for s in subjects:
+        db.execute('INSERT INTO subjects (id, name, num_lectures, semester) VALUES (?, ?, ?, ?)',
+                   (s['id'], s['name'], s['num_lectures'], s['semester']))
+        db.execute('INSERT INTO teacher_subject_class (teacher_id, subject_id, class_id) VALUES (?, ?, ?)',
+                   (s['teacher_id'], s['id'], s['class_id']))
+    db.execute("INSERT INTO teacher_availability (teacher_id, day, start_hour, end_hour) VALUES (1, 'Mon', 9, 10)")
+    db.commit()
+    return lambda body: admin.post('/whatif', json=body)
+
+
+@pytest.mark.parametrize('body', [[], [{'close_rooms': [1]}], 'full', {'mode': 'partial'}, {'close_rooms': [7]}])
+def test_whatif_rejects_bad_bodies(whatif, body):
+    response = whatif(body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_whatif_full_mode_uses_the_configured_groups(whatif, monkeypatch):
+    assert whatif({'mode': 'full'}).get_json()['summary']['unplaced'] == 1
+    monkeypatch.setattr(app, 'CONCURRENT_SEMESTERS', [{'Fall'}, {'Spring'}])
+    body = whatif({'mode': 'full'}).get_json()
+    assert body['summary'] == {'unchanged': 0, 'moved': 0, 'added': 2, 'removed': 0, 'unplaced': 0}